@@ -0,0 +1,289 @@
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from opencuts import RegisSalon, Transport
+from opencuts.fleet import SalonFleet
+from opencuts.models import Slot
+from opencuts.ranking import SlotRanker
+from opencuts.testing import FakeRegisServer
+
+""" Benchmarks for openCuts against the local FakeRegisServer.
+    - Per-method latency, full Zenoti booking and Regis check-in flows, multi-salon throughput and memory per salon
+    - Results are compared with benchmark_baseline.json, --save records a new baseline
+    - Exits with status 1 when a metric regressed by more than --tolerance
+"""
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json"
+)
+
+ZENOTI_SALON = "1000"
+REGIS_SALON = "2000"
+
+# Units where a larger value is better, every other metric should go down
+HIGHER_IS_BETTER = {"salons/s"}
+
+
+def measure(fn, iterations):
+    """Call fn iterations times and return the median and p95 latency in milliseconds."""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(0.95 * (len(samples) - 1))]
+
+
+def new_salon(server, salon_id, transport):
+    salon = server.configure(
+        RegisSalon(salon_id, "key", "booking_key", transport=transport)
+    )
+    salon.get_salon()
+    salon.get_salon_services()
+    salon.get_therapists_working()
+    return salon
+
+
+def method_latency(server, transport, iterations):
+    zenoti = new_salon(server, ZENOTI_SALON, transport)
+    regis = new_salon(server, REGIS_SALON, transport)
+    service = zenoti.find_service_by_name("Supercut")
+    stylist = zenoti.therapists[0]
+    booking = zenoti.create_service_booking(service, stylist)
+    guest = zenoti.create_account("Edward", "Hands", "5558675309")
+    regis_service = str(regis.find_service_by_name("Supercut").id)
+    methods = {
+        "get_salon": lambda: zenoti.get_salon(refresh=True),
+        "get_salon_services": lambda: zenoti.get_salon_services(refresh=True),
+        "get_therapists_working": lambda: zenoti.get_therapists_working(refresh=True),
+        "getsalondetails": lambda: regis.get_salon_services(refresh=True),
+        "create_service_booking": lambda: zenoti.create_service_booking(
+            service, stylist
+        ),
+        "get_booking_slot": lambda: zenoti.get_booking_slot(booking),
+        "retrive_guest_detail": lambda: zenoti.retrive_guest_detail(
+            "Edward", "Hands", "5558675309"
+        ),
+        "get_appointments": lambda: zenoti.get_appointments(guest["id"]),
+        "get_availability_of_salon": lambda: regis.get_availability_of_salon(
+            regis_service
+        ),
+        "add_check_in": lambda: regis.add_check_in(
+            "Edward",
+            "Hands",
+            "5558675309",
+            regis_service,
+            ["Supercut"],
+            "500",
+            "Stylist 0",
+            "0900",
+            "",
+        ),
+    }
+    metrics = {}
+    for name, fn in methods.items():
+        median, p95 = measure(fn, iterations)
+        metrics[f"{name} median"] = (median, "ms")
+        metrics[f"{name} p95"] = (p95, "ms")
+    return metrics
+
+
+def flow_latency(server, transport, iterations):
+    zenoti = new_salon(server, ZENOTI_SALON, transport)
+    regis = new_salon(server, REGIS_SALON, transport)
+    service = zenoti.find_service_by_name("Supercut")
+    regis_service = str(regis.find_service_by_name("Supercut").id)
+    people = iter(range(iterations * 2))
+
+    def new_guest_booking():
+        # A new phone number each time so the guest lookup is never cached
+        zenoti.book(service, None, "Edward", "Hands", f"555{next(people):07d}")
+
+    def known_guest_booking():
+        zenoti.book(service, None, "Edward", "Hands", "5558675309")
+
+    def check_in():
+        slot = regis.get_availability_of_salon(regis_service)[0]
+        regis.add_check_in(
+            "Edward",
+            "Hands",
+            "5558675309",
+            regis_service,
+            ["Supercut"],
+            slot.stylist_id,
+            slot.stylist_name,
+            slot.time,
+            "",
+        )
+
+    known_guest_booking()
+    return {
+        "book new guest median": (measure(new_guest_booking, iterations)[0], "ms"),
+        "book known guest median": (measure(known_guest_booking, iterations)[0], "ms"),
+        "check-in flow median": (measure(check_in, iterations)[0], "ms"),
+    }
+
+
+def fleet_throughput(server, salons):
+    salon_ids = [str(3000 + number) for number in range(salons)]
+    fleet = SalonFleet(salon_ids, "key", "booking_key", concurrency=16)
+    for salon in fleet.salons.values():
+        server.configure(salon)
+    start = time.perf_counter()
+    results = list(fleet.iter_availability("Supercut"))
+    elapsed = time.perf_counter() - start
+    failed = [result for result in results if result.error]
+    if failed:
+        raise RuntimeError(f"{len(failed)} salons failed: {failed[0].error}")
+    return {"fleet throughput": (salons / elapsed, "salons/s")}
+
+
+def memory_per_salon(server, salons):
+    transport = Transport()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    loaded = [
+        new_salon(server, str(4000 + number), transport) for number in range(salons)
+    ]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    used = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del loaded
+    return {"memory per salon": (used / salons / 1024, "KiB")}
+
+
+def ranking_latency(iterations):
+    """Top 10 slots out of 20000 (50 salons, 10 stylists each, 40 slots each)."""
+    rng = random.Random(0)
+    ranker = SlotRanker(
+        Slot("t", minute, stylist, f"Stylist {stylist}", str(5000 + salon))
+        for salon in range(50)
+        for stylist in range(10)
+        for minute in rng.sample(range(9 * 60, 20 * 60), 40)
+    )
+    return {
+        "rank top 10 median": (measure(lambda: ranker.rank(10), iterations)[0], "ms"),
+        "rank top 10 in window median": (
+            measure(
+                lambda: ranker.rank(10, after="14:00", before="17:00", duration=30),
+                iterations,
+            )[0],
+            "ms",
+        ),
+    }
+
+
+def run(args):
+    server = FakeRegisServer(
+        zenoti_salons=(ZENOTI_SALON,),
+        latency=args.latency,
+        services=args.services,
+        stylists=args.stylists,
+        slots=args.slots,
+    )
+    with server, Transport() as transport:
+        metrics = {}
+        metrics.update(method_latency(server, transport, args.iterations))
+        metrics.update(flow_latency(server, transport, args.iterations))
+        metrics.update(fleet_throughput(server, args.salons))
+        metrics.update(memory_per_salon(server, args.salons))
+        metrics.update(ranking_latency(args.iterations))
+    return metrics
+
+
+def compare(metrics, baseline, tolerance):
+    """Print every metric next to its baseline and return the names of the ones that regressed."""
+    regressions = []
+    for name, (value, unit) in metrics.items():
+        known = baseline.get(name)
+        if known is None:
+            print(f"{name:40} {value:10.2f} {unit:8} (new)")
+            continue
+        change = (value - known["value"]) / known["value"] if known["value"] else 0.0
+        if unit in HIGHER_IS_BETTER:
+            change = -change
+        regressed = change > tolerance
+        if regressed:
+            regressions.append(name)
+        flag = "REGRESSED" if regressed else ""
+        print(
+            f"{name:40} {value:10.2f} {unit:8} baseline {known['value']:10.2f} {change:+7.1%} {flag}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark openCuts against a local fake Regis/Zenoti server"
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.005,
+        help="seconds the fake server waits per request",
+    )
+    parser.add_argument(
+        "--services", type=int, default=50, help="services in every catalog"
+    )
+    parser.add_argument(
+        "--stylists", type=int, default=10, help="stylists working in every salon"
+    )
+    parser.add_argument("--slots", type=int, default=20, help="open slots per stylist")
+    parser.add_argument(
+        "--iterations", type=int, default=20, help="calls per latency measurement"
+    )
+    parser.add_argument(
+        "--salons", type=int, default=50, help="salons for throughput and memory"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed slowdown before failing, 0.25 is 25%%",
+    )
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument(
+        "--save", action="store_true", help="record the results as the new baseline"
+    )
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    # The library prints a line for empty guest searches, keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        metrics = run(args)
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(
+                {
+                    name: {"value": round(value, 3), "unit": unit}
+                    for name, (value, unit) in metrics.items()
+                },
+                f,
+                indent=2,
+            )
+            f.write("\n")
+        print(f"Saved {len(metrics)} metrics to {args.baseline}")
+        return 0
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(metrics, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} metrics regressed more than {args.tolerance:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
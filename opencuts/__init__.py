@@ -0,0 +1,22 @@
+from .models import (
+    BookingResult,
+    CheckIn,
+    Salon,
+    SalonSchedule,
+    SalonSnapshot,
+    Service,
+    Slot,
+    SlotChanges,
+    Stylist,
+)
+from .opencuts import RegisSalon
+from .transport import Transport
+
+
+def __getattr__(name):
+    # The asyncio client needs aiohttp, only import it when asked for
+    if name in ("AsyncRegisSalon", "AsyncTransport"):
+        from . import aio
+
+        return getattr(aio, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,846 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+from . import deadline
+from .breaker import Breakers, CircuitOpenError
+from .cache import AsyncSingleFlight
+from .deadline import Deadline
+from .instrumentation import Instrumentation
+from .retry import DEFAULT_RETRY_POLICY, retry_after
+from .models import BookingResult, CheckIn, SalonAvailability
+from .opencuts import (
+    CATALOG_PAGE_SIZE,
+    SALON_DETAILS_TTL,
+    SCAN_CONCURRENCY,
+    PageError,
+    SalonBase,
+    _as_date,
+    _booking_id,
+    _has_more,
+)
+from .transport import DEFAULT_TIMEOUT, ApiError
+from .watch import (
+    DEFAULT_INTERVAL,
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_MIN_INTERVAL,
+    PollSchedule,
+    SlotDiff,
+)
+
+""" asyncio counterpart of RegisSalon.
+    - AsyncTransport: one aiohttp connection pool with keep-alive per host and a cap on requests in flight
+    - AsyncRegisSalon: the RegisSalon API as coroutines, sharing its request building and parsing
+    - DiskCache reads run in the loop's executor, DiskCache and SalonStore writes on a background thread, sqlite never blocks the loop
+"""
+
+DEFAULT_LIMIT = 100
+DEFAULT_LIMIT_PER_HOST = 10
+DEFAULT_MAX_CONCURRENCY = 20
+
+# getsalondetails requests in flight, shared by every AsyncRegisSalon on the loop
+_salon_details_flights = AsyncSingleFlight()
+
+# DiskCache and SalonStore writes of every AsyncRegisSalon, applied in order on one worker thread
+_writes = ThreadPoolExecutor(max_workers=1, thread_name_prefix="opencuts-writes")
+
+
+def _write(write, args):
+    try:
+        write(*args)
+    except Exception as error:
+        logging.error("Error writing %s %s", getattr(write, "__name__", write), error)
+
+
+async def _timed(timings, stage, awaitable):
+    """Await and record how many seconds it took under timings[stage]."""
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+
+def _query(params):
+    """aiohttp refuses None query values, requests silently drops them. Do the same here."""
+    return {key: value for key, value in params.items() if value is not None}
+
+
+class AsyncTransport:
+    def __init__(
+        self,
+        limit=DEFAULT_LIMIT,
+        limit_per_host=DEFAULT_LIMIT_PER_HOST,
+        max_concurrency=DEFAULT_MAX_CONCURRENCY,
+        session=None,
+        rate_limiter=None,
+        retry=None,
+        breakers=None,
+        timeout=DEFAULT_TIMEOUT,
+        hedge=None,
+    ):
+        """
+        Create a pooled asyncio HTTP transport. The aiohttp session is opened on first use, inside the running loop.
+
+        Args:
+            limit (int): Maximum number of open connections across all hosts.
+            limit_per_host (int): Maximum number of open connections per host.
+            max_concurrency (int): Maximum number of requests in flight at once. Extra requests wait their turn.
+            session (aiohttp.ClientSession): An existing session to use instead of creating one. It is not closed by close().
+            rate_limiter (RateLimiter): Requests per second allowed for each host. Unlimited by default.
+            retry (RetryPolicy): When to retry transient failures, like Transport.
+            breakers (Breakers): Circuit breakers per endpoint, like Transport.
+            timeout (tuple): (connect, read) timeout in seconds, the current Deadline bounds the total.
+            hedge (HedgePolicy): Send a second copy of slow idempotent requests, the slower copy is cancelled.
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.max_concurrency = max_concurrency
+        self._session = session
+        self._owns_session = session is None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.instrumentation = Instrumentation()
+        self.rate_limiter = rate_limiter
+        self.retry = retry or DEFAULT_RETRY_POLICY
+        self.breakers = breakers if breakers is not None else Breakers()
+        self.timeout = timeout
+        self.hedge = hedge
+
+    @property
+    def session(self):
+        if self._session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit, limit_per_host=self.limit_per_host
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def prewarm(self, urls):
+        """Open a connection to each host so later calls reuse it. Returns the URLs that were reached."""
+
+        async def warm(url):
+            try:
+                async with self.session.head(url):
+                    return url
+            except aiohttp.ClientError as error:
+                logging.warning("Could not pre-warm %s %s", url, error)
+
+        warmed = await asyncio.gather(*(warm(url) for url in urls))
+        return [url for url in warmed if url]
+
+    async def send(self, api_request):
+        """Send an ApiRequest and return its decoded JSON body. Throttled, retried, broken and hedged like Transport.send."""
+        deadline.check(api_request.description)
+        breaker = self.breakers.get(api_request)
+        if not breaker.allow():
+            raise CircuitOpenError(api_request.endpoint, breaker.retry_in())
+        try:
+            if self.hedge is not None and self.hedge.applies(api_request):
+                response = await self._hedged(api_request)
+            else:
+                response = await self._send(api_request)
+        except Exception:
+            breaker.record(False)
+            raise
+        breaker.record(response.status < 500 and response.status != 429)
+        # The body was read by _attempt, json() decodes it from memory
+        if api_request.raise_errors and response.status >= 400:
+            try:
+                body = await response.json(content_type=None)
+            except ValueError:
+                body = None
+            raise ApiError(api_request.endpoint, response.status, body)
+        return await response.json(content_type=None)
+
+    async def _send(self, api_request):
+        kwargs = api_request.kwargs()
+        if "params" in kwargs:
+            kwargs["params"] = _query(kwargs["params"])
+        attempt = 1
+        while True:
+            if self.rate_limiter is not None:
+                wait = self.rate_limiter.reserve(api_request.url)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            try:
+                async with self._semaphore:
+                    response = await self._attempt(api_request, kwargs, attempt)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if not self.retry.should_retry(api_request, attempt):
+                    raise
+                delay = self.retry.delay(attempt)
+                if not deadline.fits(delay):
+                    raise
+            else:
+                status = response.status
+                if not self.retry.should_retry(api_request, attempt, status):
+                    return response
+                after = retry_after(response.headers)
+                delay = self.retry.delay(attempt, after)
+                if status == 429 and self.rate_limiter is not None:
+                    self.rate_limiter.pause(
+                        api_request.url, delay if after is None else after
+                    )
+                if delay is None or not deadline.fits(delay):
+                    return response
+            logging.warning(
+                "Retrying %s in %.2fs (attempt %s)",
+                api_request.description,
+                delay,
+                attempt,
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _timed_send(self, api_request):
+        start = time.monotonic()
+        response = await self._send(api_request)
+        self.hedge.observe(api_request.endpoint, time.monotonic() - start)
+        return response
+
+    async def _hedged(self, api_request):
+        delay = self.hedge.delay(api_request.endpoint)
+        if delay is None:
+            return await self._timed_send(api_request)
+        pending = {asyncio.ensure_future(self._timed_send(api_request))}
+        done, _ = await asyncio.wait(pending, timeout=delay)
+        if not done:
+            logging.info("Hedging %s after %.3fs", api_request.description, delay)
+            pending.add(asyncio.ensure_future(self._timed_send(api_request)))
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for loser in pending:
+                loser.cancel()
+
+    def _timeout(self):
+        connect, read = self.timeout
+        total = deadline.remaining()
+        return aiohttp.ClientTimeout(
+            total=None if total is None else max(total, 0.001),
+            sock_connect=connect,
+            sock_read=read,
+        )
+
+    async def _attempt(self, api_request, kwargs, attempt):
+        event = None
+        if self.instrumentation.observers:
+            event = self.instrumentation.start(api_request, attempt)
+        try:
+            async with self.session.request(
+                api_request.method, api_request.url, timeout=self._timeout(), **kwargs
+            ) as response:
+                body = await response.read()
+            if event is not None:
+                event.status = response.status
+                event.bytes_received = len(body)
+            return response
+        except Exception as error:
+            if event is not None:
+                event.error = error
+            raise
+        finally:
+            if event is not None:
+                self.instrumentation.finish(event)
+
+    async def close(self):
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class AsyncRegisSalon(SalonBase):
+    def __init__(
+        self,
+        salon_id,
+        regis_api_key,
+        regis_boking_api_key,
+        transport=None,
+        details_ttl=SALON_DETAILS_TTL,
+        cache=None,
+        store=None,
+        device_uuid=None,
+    ):
+        """
+        Initialize a new asyncio Salon instance. Takes the same arguments as RegisSalon.
+
+        Args:
+            transport (AsyncTransport): Shared async connection pool. Pass the same instance to many salons to share connections and the concurrency cap.
+
+        Every RegisSalon method is available here as a coroutine with the same arguments and return values.
+        """
+        super().__init__(
+            salon_id,
+            regis_api_key,
+            regis_boking_api_key,
+            details_ttl,
+            cache,
+            store,
+            device_uuid,
+        )
+        self.transport = transport or AsyncTransport()
+
+    @property
+    def instrumentation(self):
+        return self.transport.instrumentation
+
+    async def prewarm(self):
+        return await self.transport.prewarm(self.hosts)
+
+    def _persist(self, write, *args):
+        _writes.submit(_write, write, args)
+
+    async def flush(self):
+        """Wait until the DiskCache and SalonStore writes queued so far are applied."""
+        await asyncio.wrap_future(_writes.submit(lambda: None))
+
+    async def _off_loop(self, read, *args):
+        """Run a DiskCache read in the loop's executor, or right away without a DiskCache."""
+        if self.cache is None:
+            return read(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, read, *args)
+
+    async def _call(self, request, parse=None):
+        logging.info(request.description)
+        try:
+            data = await self.transport.send(request)
+            return self._remember_good(request, parse(data) if parse else data)
+        except Exception as error:
+            logging.error("Error %s %s", request.description, error)
+            stale = self._serve_stale(request)
+            if stale is not None and request.key() not in self._revalidating:
+                self._revalidating.add(request.key())
+                asyncio.ensure_future(self._probe(request, parse))
+            return stale
+
+    async def _probe(self, request, parse):
+        try:
+            await asyncio.sleep(self._breaker_retry_in(request))
+            data = await self.transport.send(request)
+            self._remember_good(request, parse(data) if parse else data)
+        except Exception as error:
+            logging.info(
+                "Background refresh of %s failed %s", request.description, error
+            )
+        finally:
+            self._revalidating.discard(request.key())
+
+    async def get_salon(self, refresh=False):
+        salon = None if refresh else await self._off_loop(self._cached_salon)
+        if salon is None:
+            salon = await self._call(self._salon_request(), self._parse_salon)
+            if salon is None:
+                return None
+            # Get some additonal info if this is a differnet POS system
+            if not salon.is_zenoti:
+                try:
+                    salon = salon.with_booking((await self._salon_details(refresh))[0])
+                except Exception as error:
+                    logging.error("Error Store Details %s", error)
+                    return None
+            self._save_salon(salon)
+        self.salon = salon
+        return self.zenoti_api_key, self.store_id, self.pos_type
+
+    async def get_salon_services(self, refresh=False):
+        if not refresh and await self._off_loop(self._cached_services) is not None:
+            return self.store_services
+        try:
+            if self.salon.is_zenoti:
+                return self._apply_services(
+                    [service async for service in self.iter_services()]
+                )
+            # Handle a non-zenoti type store
+            await self._salon_details(refresh)
+        except Exception as error:
+            logging.error("Error Geting Store Services %s", error)
+            return None
+        return self.store_services
+
+    async def iter_services(
+        self, page_size=CATALOG_PAGE_SIZE, fields=None, prefetch=True
+    ):
+        if not self.salon.is_zenoti:
+            for service in self.store_services or await self.get_salon_services() or []:
+                yield service if fields is None else service.project(fields)
+            return
+        async for service in self._pages("services", page_size, fields, prefetch):
+            yield service
+
+    async def iter_therapists(
+        self, page_size=CATALOG_PAGE_SIZE, fields=None, prefetch=True, date=None
+    ):
+        if not self.salon.is_zenoti:
+            for stylist in self.therapists or await self.get_therapists_working() or []:
+                yield stylist if fields is None else stylist.project(fields)
+            return
+        async for stylist in self._pages(
+            "therapists", page_size, fields, prefetch, date
+        ):
+            yield stylist
+
+    async def _pages(self, kind, page_size, fields, prefetch, date=None):
+        request, parse = self._catalog(kind, page_size, fields, date)
+        page = 1
+        data = await self._call(request(page))
+        pending = None
+        try:
+            while True:
+                items = self._page_items(kind, page, data)
+                following = None
+                if _has_more(data, page, page_size, len(items)):
+                    following = page + 1
+                    if prefetch:
+                        pending = asyncio.ensure_future(self._call(request(following)))
+                for item in items:
+                    yield parse(item)
+                if following is None:
+                    return
+                page = following
+                if pending is not None:
+                    data, pending = await pending, None
+                else:
+                    data = await self._call(request(page))
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    async def get_therapists_working(self, refresh=False):
+        if not refresh and await self._off_loop(self._cached_stylists) is not None:
+            return self.therapists
+        try:
+            if self.salon.is_zenoti:
+                return self._apply_therapists(
+                    [stylist async for stylist in self.iter_therapists()]
+                )
+            # Handle a non-zenoti type store
+            await self._salon_details(refresh)
+        except Exception as error:
+            logging.error("Error Geting Store Stylists %s", error)
+            return None
+        return self.therapists
+
+    async def _salon_details(self, refresh=False):
+        details = None if refresh else self._cached_salon_details()
+        if details is not None:
+            return details
+        try:
+            details = await _salon_details_flights.do(
+                self._salon_details_key(), self._fetch_salon_details
+            )
+        except Exception as error:
+            return self._serve_stale_details(error)
+        return self._apply_salon_details(details)
+
+    async def _fetch_salon_details(self):
+        request = self._salon_details_request()
+        logging.info(request.description)
+        return self._parse_salon_details(await self.transport.send(request))
+
+    async def get_attendance(self, name):
+        request = self._attendance_request(name)
+        if request is None:
+            return None
+        return await self._call(request, self._parse_attendance)
+
+    async def get_schedule(
+        self, start=None, days=1, concurrency=SCAN_CONCURRENCY, refresh=False
+    ):
+        if self.salon is None:
+            await self.get_salon()
+        if not self._can_schedule():
+            return None
+        if not self.therapists and await self.get_therapists_working() is None:
+            return None
+        first, last = self._schedule_range(start, days)
+        schedule = None if refresh else self._cached_schedule(first, last)
+        if schedule is not None:
+            return schedule
+        limit = asyncio.Semaphore(concurrency)
+
+        async def roster(day):
+            async with limit:
+                return day, await self._day_roster(day)
+
+        async def fetch(stylist):
+            async with limit:
+                return stylist, await self._call(
+                    self._stylist_attendance_request(stylist, first, last),
+                    self._parse_attendance_records,
+                )
+
+        rosters = await asyncio.gather(
+            *(roster(day) for day in self._roster_days(first, last))
+        )
+        attendance = await asyncio.gather(
+            *(fetch(stylist) for stylist in self._schedule_roster(first, last, rosters))
+        )
+        return self._finish_schedule(
+            self._new_schedule(first, last, rosters), first, last, attendance
+        )
+
+    async def _day_roster(self, day):
+        try:
+            return [
+                stylist
+                async for stylist in self.iter_therapists(prefetch=False, date=day)
+            ]
+        except PageError as error:
+            logging.error("Error Geting Store Stylists %s %s", day, error)
+            return None
+
+    async def create_service_booking(self, service, stylist, guest_id=None, date=None):
+        return self._check_guest_call(
+            guest_id,
+            await self._call(
+                self._create_booking_request(service, stylist, guest_id, date)
+            ),
+        )
+
+    async def book(
+        self,
+        service,
+        stylist=None,
+        first_name=None,
+        last_name=None,
+        phone=None,
+        choose=None,
+        dry_run=False,
+        deadline=None,
+    ):
+        if deadline is not None:
+            with Deadline(deadline):
+                return await self.book(
+                    service, stylist, first_name, last_name, phone, choose, dry_run
+                )
+        result = BookingResult()
+        timings = result.timings
+        start = time.perf_counter()
+        guest_id = await self._off_loop(
+            self._cached_guest_id, self._guest_cache_key(first_name, last_name, phone)
+        )
+        if guest_id is not None:
+            booking = await _timed(
+                timings,
+                "booking",
+                self.create_service_booking(service, stylist, guest_id),
+            )
+            slots = (
+                await _timed(timings, "slots", self.get_booking_slot(booking))
+                if _booking_id(booking)
+                else None
+            )
+        else:
+            (guest_id, booking), slots = await asyncio.gather(
+                self._guest_booking(
+                    timings, service, stylist, first_name, last_name, phone
+                ),
+                _timed(timings, "slots", self._discover_slots(service, stylist)),
+            )
+        if (
+            self._start_booking(result, guest_id, booking, slots, choose)
+            and not dry_run
+        ):
+            reserved = await _timed(
+                timings, "reserve", self.reserve_selected_slot(result.slot, booking)
+            )
+            confirmed = None
+            if (reserved or {}).get("is_reserved"):
+                confirmed = await _timed(
+                    timings, "confirm", self.confirm_selected_slot(booking)
+                )
+            self._finish_booking(result, reserved, confirmed)
+        timings["total"] = time.perf_counter() - start
+        return result
+
+    async def _guest_booking(
+        self, timings, service, stylist, first_name, last_name, phone
+    ):
+        guest_id = await _timed(
+            timings, "guest", self.resolve_guest(first_name, last_name, phone)
+        )
+        if guest_id is None:
+            return None, None
+        booking = await _timed(
+            timings, "booking", self.create_service_booking(service, stylist, guest_id)
+        )
+        return guest_id, booking
+
+    async def _discover_slots(self, service, stylist):
+        booking = await self.create_service_booking(service, stylist)
+        return await self.get_booking_slot(booking) if _booking_id(booking) else None
+
+    async def get_booking_slot(self, slot_id):
+        return await self._call(
+            self._booking_slots_request(slot_id), self._parse_booking_slots
+        )
+
+    async def reserve_selected_slot(self, selected_slot, booking_id):
+        return await self._call(self._reserve_slot_request(selected_slot, booking_id))
+
+    async def confirm_selected_slot(self, booking_id):
+        return await self._call(self._confirm_slot_request(booking_id))
+
+    async def retrive_guest_detail(self, first_name=None, last_name=None, phone=None):
+        return await self._call(
+            self._guest_search_request(first_name, last_name, phone),
+            self._parse_guest,
+        )
+
+    async def resolve_guest(
+        self, first_name, last_name, phone, create=True, refresh=False
+    ):
+        key = self._guest_cache_key(first_name, last_name, phone)
+        guest_id = None if refresh else await self._off_loop(self._cached_guest_id, key)
+        if guest_id is not None:
+            return guest_id
+        guest = await self.retrive_guest_detail(
+            first_name=first_name, last_name=last_name, phone=phone
+        )
+        # An empty result means no such guest, None means the search itself failed
+        if guest == {} and create:
+            logging.info("No guest record found, creating an account")
+            guest = await self.create_account(first_name, last_name, phone)
+        if not guest or not guest.get("id"):
+            return None
+        return self._remember_guest(key, guest["id"])
+
+    async def create_account(self, first_name, last_name, phone_number):
+        return await self._call(
+            self._create_account_request(first_name, last_name, phone_number)
+        )
+
+    async def get_appointments(self, guest_id, start_date=None, end_date=None):
+        return self._check_guest_call(
+            guest_id,
+            await self._call(
+                self._appointments_request(guest_id, start_date, end_date),
+                self._parse_appointments,
+            ),
+        )
+
+    async def cancel_appointment(self, invoice_id):
+        return await self._call(self._cancel_appointment_request(invoice_id))
+
+    async def get_availability_of_salon(self, serviceid: str, date=None):
+        return self._save_slots(
+            serviceid,
+            None,
+            _as_date(date),
+            await self._call(
+                self._availability_request(serviceid, date), self._parse_availability
+            ),
+        )
+
+    async def scan_availability(
+        self, services, start=None, days=7, stylist=None, refresh=False
+    ):
+        if self.salon is None:
+            await self.get_salon()
+        limit = asyncio.Semaphore(SCAN_CONCURRENCY)
+
+        async def scan(service, day):
+            async with limit:
+                return await self._scan_day(service, stylist, day, refresh)
+
+        jobs = self._scan_jobs(services, start, days)
+        return list(
+            await asyncio.gather(*(scan(service, day) for day, service in jobs))
+        )
+
+    async def day_availability(self, service, stylist=None, date=None):
+        if self.salon is None:
+            await self.get_salon()
+        return await self._scan_day(service, stylist, _as_date(date), True)
+
+    async def watch(
+        self,
+        service,
+        stylist=None,
+        date=None,
+        targets=(),
+        interval=DEFAULT_INTERVAL,
+        min_interval=DEFAULT_MIN_INTERVAL,
+        max_interval=DEFAULT_MAX_INTERVAL,
+        polls=None,
+        stop=None,
+    ):
+        """RegisSalon.watch as an async generator. stop is an asyncio.Event."""
+        if self.salon is None:
+            await self.get_salon()
+        zenoti = self.salon is not None and self.salon.is_zenoti
+        schedule = PollSchedule(
+            interval,
+            min_interval,
+            max_interval,
+            targets,
+            day=None if date is None else _as_date(date),
+        )
+        diff = SlotDiff(
+            self._parse_stylist_slots(stylist)
+            if zenoti
+            else self._parse_day_availability(stylist)
+        )
+        booking = booked_for = None
+        while polls is None or diff.polls < polls:
+            day = _as_date(date)
+            if zenoti:
+                if booking is None or booked_for != day:
+                    booking = await self.create_service_booking(
+                        service, stylist, date=day
+                    )
+                    booked_for = day
+                answer = (
+                    await self._call(self._booking_slots_request(booking))
+                    if _booking_id(booking)
+                    else None
+                )
+                if not isinstance(answer, dict) or "slots" not in answer:
+                    booking = answer = None
+            else:
+                answer = await self._call(
+                    self._availability_request(str(service.id), day)
+                )
+            changes = diff.update(answer)
+            if changes is not None:
+                self._save_slots(service, stylist, day, changes.slots)
+                yield changes
+            if polls is not None and diff.polls >= polls:
+                return
+            delay = schedule.next_delay(changes is not None)
+            if stop is None:
+                await asyncio.sleep(delay)
+                continue
+            try:
+                await asyncio.wait_for(stop.wait(), delay)
+                return
+            except asyncio.TimeoutError:
+                pass
+
+    async def find_slots(
+        self, service, stylists=None, date=None, concurrency=SCAN_CONCURRENCY
+    ):
+        day = _as_date(date)
+        if self.salon is None and await self.get_salon() is None:
+            return SalonAvailability(
+                self.salon_id, service, error="salon lookup failed"
+            )
+        if not self.therapists and await self.get_therapists_working() is None:
+            return SalonAvailability(
+                self.salon_id, service, error="stylists lookup failed"
+            )
+        # The first use of the matrix loads its exclusions from the DiskCache
+        await self._off_loop(lambda: self.eligibility)
+        if not self.salon.is_zenoti:
+            slots = await self._call(
+                self._availability_request(str(service.id), day),
+                self._parse_day_availability(None),
+            )
+            slots = self._eligible_slots(service, stylists, slots)
+            return self._found_slots(
+                service,
+                day,
+                [(None, slots)],
+                self._eligible_scope(service, stylists, slots),
+            )
+        limit = asyncio.Semaphore(concurrency)
+
+        async def fetch(stylist):
+            async with limit:
+                return stylist, await self._stylist_slots(service, stylist, day)
+
+        answers = await asyncio.gather(
+            *(
+                fetch(stylist)
+                for stylist in self.eligibility.eligible(service, stylists)
+            )
+        )
+        return self._found_slots(service, day, answers)
+
+    async def _stylist_slots(self, service, stylist, day):
+        request = self._stylist_booking_request(service, stylist, day)
+        logging.info(request.description)
+        try:
+            booking = await self.transport.send(request)
+        except Exception as error:
+            if self._refused(error, stylist, service):
+                return ()
+            logging.error("Error %s %s", request.description, error)
+            return None
+        if not _booking_id(booking):
+            return None
+        return await self._call(
+            self._booking_slots_request(booking), self._parse_stylist_slots(stylist)
+        )
+
+    async def _scan_day(self, service, stylist, day, refresh):
+        cached = None if refresh else self._cached_day(service, stylist, day)
+        if cached is not None:
+            return cached
+        if self.salon is not None and self.salon.is_zenoti:
+            booking = await self.create_service_booking(service, stylist, date=day)
+            slots = (
+                await self._call(
+                    self._booking_slots_request(booking),
+                    self._parse_stylist_slots(stylist),
+                )
+                if _booking_id(booking)
+                else None
+            )
+        else:
+            slots = await self._call(
+                self._availability_request(str(service.id), day),
+                self._parse_day_availability(stylist),
+            )
+        return self._fetched_day(service, stylist, day, slots)
+
+    async def add_check_in(
+        self,
+        firstname: str,
+        lastname: str,
+        phonenumber: str,
+        serviceid: str,
+        services: list,
+        stylistid: str,
+        stylistname: str,
+        time: str,
+        emailaddress: str,
+    ):
+        request = self._add_check_in_request(
+            firstname,
+            lastname,
+            phonenumber,
+            serviceid,
+            services,
+            stylistid,
+            stylistname,
+            time,
+            emailaddress,
+        )
+        return await self._call(request, CheckIn.from_add_check_in)
+
+    async def get_check_in_by_source(self):
+        return await self._call(
+            self._check_in_by_source_request(), self._parse_check_ins
+        )
+
+    async def cancel_checkin(self, checkinid):
+        return await self._call(self._cancel_checkin_request(checkinid))
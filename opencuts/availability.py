@@ -0,0 +1,193 @@
+from .models import _minute_of_day
+
+""" Bitmap index of open slots, for queries over thousands of salon and stylist pairs.
+    - Every stylist is a row: an int whose bit m is set when a slot starts m minutes after midnight
+    - Every minute is a column: an int whose bit r is set when the stylist of row r is free then
+    - "Who is free at 14:30", "first slot after 17:00" and "minutes free in every salon" are a few bitwise operations
+    - Filled from Slot models, raw getavailabilityofsalon (times.hours[].h / m[]) or raw Zenoti slots[].Time
+"""
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def _minute(value):
+    """Minutes after midnight from an int or a "HH:MM", "HHMM" or ISO time."""
+    return value if isinstance(value, int) else _minute_of_day(value)
+
+
+def _bits(bitmap):
+    """Positions of the set bits of bitmap, lowest first."""
+    while bitmap:
+        lowest = bitmap & -bitmap
+        yield lowest.bit_length() - 1
+        bitmap ^= lowest
+
+
+def label(minute):
+    """Minutes after midnight as HH:MM."""
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+class AvailabilityIndex:
+    def __init__(self):
+        """
+        Open slots of many salons and stylists, keyed by (salon_id, stylist_id).
+
+        Adding slots to a key that is already indexed merges them, use replace() to refresh a stylist.
+        """
+        self.names = {}
+        self._rows = []
+        self._keys = []
+        self._ordinals = {}
+        self._columns = [0] * MINUTES_PER_DAY
+        self._union = None
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._ordinals
+
+    def keys(self):
+        return list(self._keys)
+
+    def _ordinal(self, key, name):
+        ordinal = self._ordinals.get(key)
+        if ordinal is None:
+            ordinal = self._ordinals[key] = len(self._keys)
+            self._keys.append(key)
+            self._rows.append(0)
+        if name is not None:
+            self.names[key] = name
+        return ordinal
+
+    def _set_row(self, ordinal, bitmap):
+        changed = self._rows[ordinal] ^ bitmap
+        if not changed:
+            return
+        flag = 1 << ordinal
+        for minute in _bits(changed):
+            self._columns[minute] ^= flag
+        self._rows[ordinal] = bitmap
+        self._union = None
+
+    def add(self, salon_id, stylist_id, minutes, name=None):
+        """Mark minutes (ints or "HH:MM" / "HHMM" / ISO times) open for a stylist of a salon."""
+        ordinal = self._ordinal((salon_id, stylist_id), name)
+        bitmap = self._rows[ordinal]
+        for minute in minutes:
+            bitmap |= 1 << _minute(minute)
+        self._set_row(ordinal, bitmap)
+
+    def replace(self, salon_id, stylist_id, minutes, name=None):
+        """Make minutes the only open slots of a stylist, e.g. after refreshing its salon."""
+        ordinal = self._ordinal((salon_id, stylist_id), name)
+        bitmap = 0
+        for minute in minutes:
+            bitmap |= 1 << _minute(minute)
+        self._set_row(ordinal, bitmap)
+
+    def add_slots(self, slots):
+        """Index Slot models, Zenoti and Regis booking alike. Returns self."""
+        rows = {}
+        for slot in slots:
+            key = (slot.salon_id, slot.stylist_id)
+            rows.setdefault(key, [slot.stylist_name, 0])[1] |= 1 << slot.minute
+        for (salon_id, stylist_id), (name, bitmap) in rows.items():
+            ordinal = self._ordinal((salon_id, stylist_id), name)
+            self._set_row(ordinal, self._rows[ordinal] | bitmap)
+        return self
+
+    def add_regis(self, availability, salon_id):
+        """Index a raw getavailabilityofsalon answer without building Slot models. Returns self."""
+        for stylist in availability or []:
+            bitmap = 0
+            for hour_block in stylist["times"]["hours"]:
+                base = hour_block["h"] * 60
+                for minute in hour_block["m"]:
+                    bitmap |= 1 << (base + minute)
+            ordinal = self._ordinal(
+                (salon_id, stylist.get("employeeID")), stylist.get("name")
+            )
+            self._set_row(ordinal, self._rows[ordinal] | bitmap)
+        return self
+
+    def add_zenoti(self, data, salon_id, stylist=None):
+        """Index a raw Zenoti bookings/{id}/slots answer (slots[].Time) for a stylist, None for next available. Returns self."""
+        self.add(
+            salon_id,
+            stylist.id if stylist else None,
+            (slot["Time"] for slot in data["slots"]),
+            stylist.name if stylist else None,
+        )
+        return self
+
+    @classmethod
+    def from_slots(cls, slots):
+        return cls().add_slots(slots)
+
+    # Queries
+    def bitmap(self, key=None):
+        """The open minutes of one (salon_id, stylist_id) as a bitmap, of every stylist for None."""
+        if key is not None:
+            ordinal = self._ordinals.get(key)
+            return 0 if ordinal is None else self._rows[ordinal]
+        if self._union is None:
+            union = 0
+            for row in self._rows:
+                union |= row
+            self._union = union
+        return self._union
+
+    def minutes(self, key=None):
+        """The open minutes of one (salon_id, stylist_id), or of any stylist for None, in order."""
+        return list(_bits(self.bitmap(key)))
+
+    def is_free(self, key, minute):
+        return bool(self.bitmap(key) >> _minute(minute) & 1)
+
+    def free_at(self, minute):
+        """The (salon_id, stylist_id) keys with a slot starting at minute."""
+        return [
+            self._keys[ordinal] for ordinal in _bits(self._columns[_minute(minute)])
+        ]
+
+    def first_after(self, minute, key=None):
+        """
+        The first open minute at or after minute, for one key or across every stylist.
+
+        Returns:
+            tuple: (minute, keys free then), otherwise None when nothing is open later that day.
+        """
+        later = self.bitmap(key) >> _minute(minute) << _minute(minute)
+        if not later:
+            return None
+        first = (later & -later).bit_length() - 1
+        return first, [key] if key is not None else self.free_at(first)
+
+    def salon_bitmap(self, salon_id):
+        """The minutes any stylist of a salon is free, as a bitmap."""
+        bitmap = 0
+        for (salon, _), row in zip(self._keys, self._rows):
+            if salon == salon_id:
+                bitmap |= row
+        return bitmap
+
+    def common_minutes(self, salon_ids=None):
+        """
+        The minutes at which every salon (each with any stylist) has an open slot, in order.
+
+        Args:
+            salon_ids (iterable): The salons to intersect. Defaults to every indexed salon.
+        """
+        salons = {}
+        for (salon, _), row in zip(self._keys, self._rows):
+            salons[salon] = salons.get(salon, 0) | row
+        if salon_ids is not None:
+            salons = {salon: salons.get(salon, 0) for salon in salon_ids}
+        if not salons:
+            return []
+        common = -1
+        for bitmap in salons.values():
+            common &= bitmap
+        return list(_bits(common))
@@ -0,0 +1,125 @@
+import collections
+import threading
+import time
+from urllib.parse import urlsplit
+
+""" Circuit breakers for the transports.
+    - One CircuitBreaker per host and endpoint, opened when too many of its recent calls failed
+    - An open breaker fails calls at once with CircuitOpenError instead of waiting on a degraded API
+    - After reset_timeout one probe call goes through, its outcome closes or re-opens the breaker
+"""
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_FAILURE_RATE = 0.5
+DEFAULT_WINDOW = 20
+DEFAULT_MIN_CALLS = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request whose endpoint's breaker is open."""
+
+    def __init__(self, endpoint, retry_in):
+        super().__init__(f"circuit open for {endpoint}, retry in {retry_in:.1f}s")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_rate=DEFAULT_FAILURE_RATE,
+        window=DEFAULT_WINDOW,
+        min_calls=DEFAULT_MIN_CALLS,
+        reset_timeout=DEFAULT_RESET_TIMEOUT,
+    ):
+        """
+        Args:
+            failure_rate (float): Share of failed calls among the last window calls that opens the breaker.
+            window (int): Number of recent calls considered.
+            min_calls (int): Calls needed in the window before the breaker may open.
+            reset_timeout (float): Seconds an open breaker waits before letting a probe call through.
+        """
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self._outcomes = collections.deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def retry_in(self):
+        """Seconds until an open breaker lets a probe through, 0 when calls may go ahead."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self):
+        """Whether a call may be sent now. Once reset_timeout passed, a single probe is let through."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.retry_in() > 0:
+                return False
+            if self._probing:
+                return False
+            self.state = HALF_OPEN
+            self._probing = True
+            return True
+
+    def record(self, success):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+                if success:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if (
+                len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.failure_rate
+            ):
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+
+
+class Breakers:
+    def __init__(self, **settings):
+        """
+        The circuit breakers of a transport, one per host and endpoint, created on first use.
+
+        Args:
+            settings: CircuitBreaker arguments used for every breaker (failure_rate, window, min_calls, reset_timeout).
+        """
+        self.settings = settings
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, api_request):
+        parts = urlsplit(api_request.url)
+        key = (parts.netloc, api_request.endpoint)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(key)
+                if breaker is None:
+                    breaker = self._breakers[key] = CircuitBreaker(**self.settings)
+        return breaker
+
+    def states(self):
+        """host and endpoint -> breaker state, for dashboards."""
+        return {
+            f"{host}/{endpoint}": breaker.state
+            for (host, endpoint), breaker in self._breakers.items()
+        }
@@ -0,0 +1,319 @@
+import collections
+import contextlib
+import datetime
+import json
+import os
+import threading
+import time
+
+""" Caching helpers shared by RegisSalon instances.
+    - SingleFlight: concurrent callers asking for the same key share one in-flight call
+    - AsyncSingleFlight: the same for coroutines
+    - DiskCache: persistent metadata cache with a TTL per kind of data and LRU size limits, also holds resolved guest ids
+      and the stylist / service pairs the API refused
+    - DayCache: in-memory cache of per-day data (open slots), emptied when the date rolls over at midnight
+    - asyncio and sqlite3 are imported on first use, so importing opencuts stays cheap
+"""
+
+DEFAULT_CACHE_PATH = "opencuts_cache.db"
+
+# The cache holds the Zenoti API key of every salon, only its owner may read it
+DEFAULT_CACHE_MODE = 0o600
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# How long each kind of data stays fresh (seconds)
+DEFAULT_TTLS = {
+    "salon": 7 * DAY,
+    "services": 6 * HOUR,
+    "stylists": DAY,
+    "guest": 30 * DAY,
+    "eligibility": DAY,
+}
+
+# How many entries of each kind are kept, least recently used ones go first
+DEFAULT_MAX_ENTRIES = 1000
+
+# Open slots change as people book, scans reuse a day's slots for this long (seconds)
+AVAILABILITY_TTL = 60
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time, handing its result to every caller that asked meanwhile."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Call fn() unless a call for key is already running, in which case wait for that one.
+
+        Returns:
+            The result of fn(). If fn raised, every waiting caller gets the same exception.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines: concurrent awaiters of the same key share one task."""
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key, fn):
+        """Await fn() unless a call for key is already running, in which case await that one."""
+        import asyncio
+
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        # Shielded so one cancelled awaiter does not cancel the call for everyone else
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+
+class DayCache:
+    def __init__(
+        self, ttl=AVAILABILITY_TTL, max_entries=DEFAULT_MAX_ENTRIES, today=None
+    ):
+        """
+        Thread-safe in-memory cache of values that belong to a calendar day, e.g. the open slots of a salon on a date.
+
+        Everything is dropped when the local date changes, and days before today are never served or stored.
+
+        Args:
+            ttl (float): Seconds an entry stays fresh.
+            max_entries (int): Entries kept, the least recently used ones are evicted first.
+            today (callable): Returns the current datetime.date. Defaults to datetime.date.today.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.today = today or datetime.date.today
+        self._entries = collections.OrderedDict()
+        self._day = None
+        self._lock = threading.Lock()
+
+    def _roll(self):
+        today = self.today()
+        if today != self._day:
+            self._entries.clear()
+            self._day = today
+        return today
+
+    def get(self, key, day):
+        """The value stored for key on day (a datetime.date), otherwise None if it is missing or expired."""
+        with self._lock:
+            if day < self._roll():
+                return None
+            entry = self._entries.get((key, day))
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._entries[(key, day)]
+                return None
+            self._entries.move_to_end((key, day))
+            return value
+
+    def set(self, key, day, value):
+        with self._lock:
+            if day < self._roll():
+                return
+            self._entries[(key, day)] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end((key, day))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskCache:
+    def __init__(
+        self,
+        path=DEFAULT_CACHE_PATH,
+        ttls=None,
+        max_entries=DEFAULT_MAX_ENTRIES,
+        bypass=False,
+        lock_timeout=10,
+        mode=DEFAULT_CACHE_MODE,
+    ):
+        """
+        A JSON value cache stored in an SQLite file, safe to share between threads and processes.
+
+        The cached salon metadata includes each Zenoti salon's API key, a credential. Keep the file somewhere
+        only its users can read: it is created with mode's permissions, and path can point anywhere.
+
+        SQLite locks the file for every write, so several processes (CLI runs, workers) can use the same path.
+        Reads do not take the write lock, and only record their use for the LRU eviction when nobody else is writing.
+
+        Args:
+            path (str): The cache file.
+            ttls (dict): Seconds each kind of entry stays fresh, merged over DEFAULT_TTLS. Kinds without a TTL never expire.
+            max_entries (int or dict): Maximum entries kept per kind. The least recently used entries are evicted first.
+            bypass (bool): Ignore cached entries on reads. Writes still happen, so bypassing refreshes the cache.
+            lock_timeout (float): Seconds to wait for another process holding the lock.
+            mode (int): Permissions of a new cache file (SQLite gives its journal files the same). Existing files are left as they are.
+        """
+        # Created before sqlite3 opens it, sqlite3 would use the umask's permissions
+        os.close(os.open(path, os.O_CREAT | os.O_RDWR, mode))
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_entries = max_entries
+        self.bypass = bypass
+        self.lock_timeout = lock_timeout
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "kind TEXT, key TEXT, value TEXT, expires REAL, used REAL, "
+                "PRIMARY KEY (kind, key))"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS entries_used ON entries (kind, used)"
+            )
+        with self._read() as db:
+            # Readers do not wait for a writer, and a writer does not wait for readers
+            db.execute("PRAGMA journal_mode=WAL")
+
+    def _open(self, timeout):
+        import sqlite3
+
+        # One short-lived connection per operation keeps this safe across threads and forks
+        return sqlite3.connect(self.path, timeout=timeout, isolation_level=None)
+
+    def _connect(self):
+        return _Transaction(self._open(self.lock_timeout))
+
+    def _read(self):
+        return contextlib.closing(self._open(self.lock_timeout))
+
+    def _limit(self, kind):
+        if isinstance(self.max_entries, dict):
+            return self.max_entries.get(kind, DEFAULT_MAX_ENTRIES)
+        return self.max_entries
+
+    def get(self, kind, key):
+        """Return the fresh value stored for (kind, key), otherwise None."""
+        if self.bypass:
+            return None
+        now = time.time()
+        with self._read() as db:
+            row = db.execute(
+                "SELECT value, expires FROM entries WHERE kind = ? AND key = ?",
+                (kind, str(key)),
+            ).fetchone()
+        # Expired entries are left for set() to replace or the LRU eviction to drop
+        if row is None or (row[1] is not None and row[1] <= now):
+            return None
+        self._touch(kind, key, now)
+        return json.loads(row[0])
+
+    def _touch(self, kind, key, now):
+        """Record a read for the LRU eviction. Only a hint, skipped rather than waiting while another writer holds the lock."""
+        import sqlite3
+
+        db = self._open(0)
+        try:
+            db.execute(
+                "UPDATE entries SET used = ? WHERE kind = ? AND key = ?",
+                (now, kind, str(key)),
+            )
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            db.close()
+
+    def set(self, kind, key, value, ttl=None):
+        """Store a JSON-serializable value, then evict the least recently used entries of that kind over the limit."""
+        ttl = self.ttls.get(kind) if ttl is None else ttl
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (
+                    kind,
+                    str(key),
+                    json.dumps(value),
+                    None if ttl is None else now + ttl,
+                    now,
+                ),
+            )
+            db.execute(
+                "DELETE FROM entries WHERE kind = ? AND key NOT IN "
+                "(SELECT key FROM entries WHERE kind = ? ORDER BY used DESC LIMIT ?)",
+                (kind, kind, self._limit(kind)),
+            )
+
+    def delete(self, kind, key):
+        with self._connect() as db:
+            db.execute(
+                "DELETE FROM entries WHERE kind = ? AND key = ?", (kind, str(key))
+            )
+
+    def clear(self, kind=None):
+        with self._connect() as db:
+            if kind is None:
+                db.execute("DELETE FROM entries")
+            else:
+                db.execute("DELETE FROM entries WHERE kind = ?", (kind,))
+
+    def __len__(self):
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+class _Transaction:
+    """Run the statements of a with block in one write-locked transaction, then close the connection."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        # IMMEDIATE takes the file's write lock up front so concurrent processes queue instead of failing
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, *exc_info):
+        try:
+            self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.db.close()
@@ -0,0 +1,79 @@
+import contextvars
+import time
+
+""" Time budgets for calls and whole operations.
+    - `with Deadline(seconds):` bounds every request sent inside the block, in this thread or task
+    - Nested deadlines never extend the outer one, so a booking flow's budget carries through each step
+    - Transports shorten their timeouts to the time left and skip retries that would not fit
+"""
+
+_current = contextvars.ContextVar("opencuts_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised instead of sending a request once the current deadline has passed."""
+
+
+class Deadline:
+    def __init__(self, seconds):
+        """
+        A budget of seconds from now. Use it as a context manager to apply it to the requests in the block.
+
+        Worker threads do not inherit it on their own, submit work with contextvars.copy_context().run.
+        """
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+        self._token = None
+
+    def remaining(self):
+        return self.expires - time.monotonic()
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def __enter__(self):
+        outer = _current.get()
+        if outer is not None and outer.expires < self.expires:
+            self.expires = outer.expires
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _current.reset(self._token)
+
+
+def current_deadline():
+    """The innermost Deadline in effect, otherwise None."""
+    return _current.get()
+
+
+def remaining():
+    """Seconds left of the current deadline, otherwise None if there is no deadline."""
+    deadline = _current.get()
+    return None if deadline is None else deadline.remaining()
+
+
+def check(description):
+    """Raise DeadlineExceeded if the current deadline has passed."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"deadline exceeded before {description}")
+
+
+def fits(seconds):
+    """Whether waiting seconds still leaves time before the current deadline."""
+    left = remaining()
+    return left is None or seconds < left
+
+
+def clamp(timeout):
+    """Shorten a timeout (seconds or a (connect, read) tuple) to the time left before the current deadline."""
+    left = remaining()
+    if left is None:
+        return timeout
+    # Never 0, requests treats that as "no timeout" for some adapters
+    left = max(left, 0.001)
+    if isinstance(timeout, tuple):
+        return tuple(left if part is None else min(part, left) for part in timeout)
+    return left if timeout is None else min(timeout, left)
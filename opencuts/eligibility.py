@@ -0,0 +1,102 @@
+"""Which stylists can perform which services, so slot searches skip the ones that cannot.
+- EligibilityMatrix keeps one bitmap per stylist with a bit per service of the catalog
+- It starts from the therapists and services a salon fetched, every pair eligible
+- Pairs the API refuses (a booking answered with an error) are excluded and remembered for the day
+- Exclusions can also be seeded by hand, e.g. from a salon's own skills list
+"""
+
+
+def _id(value):
+    """The id of a Stylist or Service as a string, from the model or the id itself."""
+    return str(getattr(value, "id", value))
+
+
+class EligibilityMatrix:
+    def __init__(self, stylists=(), services=(), excluded=()):
+        """
+        A stylist x service matrix.
+
+        Args:
+            stylists (iterable): Stylist models, the rows.
+            services (iterable): Service models, the columns.
+            excluded (iterable): (stylist_id, service_id) pairs that are not eligible.
+        """
+        self.stylists = {_id(stylist): stylist for stylist in stylists}
+        self.services = {_id(service): service for service in services}
+        self._bits = {
+            service_id: 1 << bit for bit, service_id in enumerate(self.services)
+        }
+        everything = (1 << len(self._bits)) - 1
+        self._rows = dict.fromkeys(self.stylists, everything)
+        # Exclusions of stylists or services outside the catalog are kept for a later rebuild
+        self._excluded = set()
+        for stylist_id, service_id in excluded:
+            self.exclude(stylist_id, service_id)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def can(self, stylist, service):
+        """Whether stylist may perform service. Stylists or services outside the matrix are given the benefit of the doubt."""
+        stylist_id, service_id = _id(stylist), _id(service)
+        row = self._rows.get(stylist_id)
+        bit = self._bits.get(service_id)
+        if row is None or bit is None:
+            return (stylist_id, service_id) not in self._excluded
+        return bool(row & bit)
+
+    def eligible(self, service, stylists=None):
+        """
+        The stylists that may perform service, in catalog order.
+
+        Args:
+            stylists (iterable): Only consider these Stylist models. Defaults to every stylist of the matrix.
+        """
+        if stylists is None:
+            bit = self._bits.get(_id(service))
+            if bit is None:
+                return [
+                    stylist
+                    for stylist in self.stylists.values()
+                    if self.can(stylist, service)
+                ]
+            return [
+                self.stylists[stylist_id]
+                for stylist_id, row in self._rows.items()
+                if row & bit
+            ]
+        return [stylist for stylist in stylists if self.can(stylist, service)]
+
+    def services_of(self, stylist):
+        """The services stylist may perform, in catalog order."""
+        row = self._rows.get(_id(stylist))
+        if row is None:
+            return [
+                service
+                for service in self.services.values()
+                if self.can(stylist, service)
+            ]
+        return [
+            self.services[service_id]
+            for service_id, bit in self._bits.items()
+            if row & bit
+        ]
+
+    def exclude(self, stylist, service):
+        """Mark stylist as unable to perform service."""
+        stylist_id, service_id = _id(stylist), _id(service)
+        self._excluded.add((stylist_id, service_id))
+        if stylist_id in self._rows and service_id in self._bits:
+            self._rows[stylist_id] &= ~self._bits[service_id]
+
+    def allow(self, stylist, service):
+        """Undo exclude(), e.g. when a stylist learned a service."""
+        stylist_id, service_id = _id(stylist), _id(service)
+        self._excluded.discard((stylist_id, service_id))
+        if stylist_id in self._rows and service_id in self._bits:
+            self._rows[stylist_id] |= self._bits[service_id]
+
+    @property
+    def excluded(self):
+        """Every excluded (stylist_id, service_id) pair, sorted, as stored in the DiskCache."""
+        return sorted(self._excluded)
@@ -0,0 +1,152 @@
+import contextvars
+import heapq
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .availability import AvailabilityIndex
+from .models import SalonAvailability
+from .opencuts import RegisSalon
+from .transport import Transport
+
+""" Availability across many salons at once.
+    - SalonFleet asks every salon for the open slots of a service concurrently, Zenoti and Regis booking alike
+    - Results are yielded as each salon answers, merged into one earliest-first list, or indexed as bitmaps
+"""
+
+DEFAULT_CONCURRENCY = 8
+
+
+class SalonFleet:
+    def __init__(
+        self,
+        salon_ids,
+        regis_api_key,
+        regis_boking_api_key,
+        concurrency=DEFAULT_CONCURRENCY,
+        transport=None,
+        store=None,
+    ):
+        """
+        Create a RegisSalon for every salon id, all sharing one pooled Transport.
+
+        Args:
+            salon_ids (list): The salons to query.
+            concurrency (int): Maximum number of salons queried at the same time.
+            transport (Transport): Shared transport. Defaults to one with a keep-alive pool large enough for concurrency.
+            store (SalonStore): Records every salon's catalogs and the slots it answers.
+        """
+        self.concurrency = concurrency
+        self.transport = transport or Transport(pool_maxsize=concurrency)
+        self.salons = {
+            salon_id: RegisSalon(
+                salon_id,
+                regis_api_key,
+                regis_boking_api_key,
+                transport=self.transport,
+                store=store,
+            )
+            for salon_id in salon_ids
+        }
+
+    def salon_availability(self, salon, service_name, stylist_name=None):
+        """
+        Fetch today's open slots of one salon for a service.
+
+        Salon metadata and catalogs are only fetched the first time a salon is asked.
+
+        Returns:
+            SalonAvailability: The slots, or the error that prevented fetching them.
+        """
+        if salon.salon is None and salon.get_salon() is None:
+            return SalonAvailability(salon.salon_id, error="salon lookup failed")
+        if salon.store_services is None and salon.get_salon_services() is None:
+            return SalonAvailability(salon.salon_id, error="services lookup failed")
+        service = salon.find_service_by_name(service_name)
+        if service is None:
+            return SalonAvailability(
+                salon.salon_id, error=f"service {service_name} not offered"
+            )
+        if salon.salon.is_zenoti:
+            stylist = None
+            if stylist_name:
+                if not salon.therapists and salon.get_therapists_working() is None:
+                    return SalonAvailability(
+                        salon.salon_id, service, error="stylists lookup failed"
+                    )
+                stylist = salon.find_stylist_by_name(stylist_name)
+                if stylist is None:
+                    return SalonAvailability(
+                        salon.salon_id,
+                        service,
+                        error=f"stylist {stylist_name} not found",
+                    )
+            # The booking's slots carry their stylist and are recorded in the salon's store
+            return salon.day_availability(service, stylist)
+        # Every stylist's slots are recorded, the filter only applies to the result
+        slots = salon.get_availability_of_salon(str(service.id))
+        if slots and stylist_name:
+            slots = [
+                slot
+                for slot in slots
+                if (slot.stylist_name or "").lower() == stylist_name.lower()
+            ]
+        if slots is None:
+            return SalonAvailability(
+                salon.salon_id, service, error="availability lookup failed"
+            )
+        return SalonAvailability(salon.salon_id, service, slots)
+
+    def iter_availability(self, service_name, stylist_name=None):
+        """
+        Query every salon concurrently and yield each SalonAvailability as soon as its salon answers.
+
+        At most `concurrency` salons are in flight at once.
+        """
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {
+                executor.submit(
+                    contextvars.copy_context().run,
+                    self.salon_availability,
+                    salon,
+                    service_name,
+                    stylist_name,
+                ): salon_id
+                for salon_id, salon in self.salons.items()
+            }
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except Exception as error:
+                    logging.error("Error Getting availability %s", error)
+                    yield SalonAvailability(futures[future], error=str(error))
+
+    def earliest(self, service_name, stylist_name=None, limit=None):
+        """
+        Query every salon and merge their slots into one list, earliest first.
+
+        Args:
+            limit (int): Only return this many slots.
+
+        Returns:
+            list[Slot]: Slots from every salon, each carrying its salon_id.
+        """
+        per_salon = [
+            sorted(result.slots, key=lambda slot: slot.minute)
+            for result in self.iter_availability(service_name, stylist_name)
+        ]
+        merged = heapq.merge(*per_salon, key=lambda slot: slot.minute)
+        if limit is None:
+            return list(merged)
+        return [slot for slot, _ in zip(merged, range(limit))]
+
+    def index(self, service_name, stylist_name=None):
+        """
+        Query every salon and index their slots, for questions like "who is free at 14:30" across the fleet.
+
+        Returns:
+            AvailabilityIndex: The open slots of every salon and stylist that answered.
+        """
+        index = AvailabilityIndex()
+        for result in self.iter_availability(service_name, stylist_name):
+            index.add_slots(result.slots)
+        return index
@@ -0,0 +1,223 @@
+import json
+import math
+import threading
+import time
+
+""" Request instrumentation for RegisSalon and AsyncRegisSalon.
+    - Observers receive an event when every request starts and when it ends, with its status, duration and sizes
+    - Metrics is an observer keeping per-endpoint latency histograms, byte and error counters, with a snapshot() to scrape
+    - Nothing is measured until an observer is attached, the transports skip the whole path when there is none
+"""
+
+# Histogram buckets grow by 2 ** (1 / BUCKETS_PER_DOUBLING), about 19% apart
+BUCKETS_PER_DOUBLING = 4
+# Bucket 0 holds everything up to 1 ms, the last one everything above about 65 seconds
+MAX_BUCKET = 16 * BUCKETS_PER_DOUBLING
+
+
+class RequestEvent:
+    """One request as seen by the observers. Filled in as the request goes, complete when request_finished is called."""
+
+    __slots__ = (
+        "endpoint",
+        "method",
+        "url",
+        "started",
+        "seconds",
+        "status",
+        "bytes_sent",
+        "bytes_received",
+        "error",
+        "attempt",
+    )
+
+    def __init__(self, endpoint, method, url, bytes_sent=0, attempt=1):
+        self.endpoint = endpoint
+        self.method = method
+        self.url = url
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.status = None
+        self.bytes_sent = bytes_sent
+        self.bytes_received = 0
+        self.error = None
+        # 1 for the first try, higher for retries
+        self.attempt = attempt
+
+    @property
+    def failed(self):
+        return self.error is not None or (self.status or 0) >= 400
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"RequestEvent({fields})"
+
+
+class Observer:
+    """Base class for observers, override the events you need."""
+
+    def request_started(self, event):
+        pass
+
+    def request_finished(self, event):
+        pass
+
+
+class Instrumentation:
+    """The observers attached to a transport. Every salon sharing the transport reports to them."""
+
+    def __init__(self):
+        self.observers = ()
+
+    def attach(self, observer):
+        # A new tuple each time, so a request in flight keeps iterating the observers it started with
+        self.observers = self.observers + (observer,)
+        return observer
+
+    def detach(self, observer):
+        self.observers = tuple(
+            known for known in self.observers if known is not observer
+        )
+
+    def start(self, api_request, attempt=1):
+        body = api_request.json
+        event = RequestEvent(
+            api_request.endpoint,
+            api_request.method,
+            api_request.url,
+            len(json.dumps(body).encode()) if body is not None else 0,
+            attempt,
+        )
+        for observer in self.observers:
+            observer.request_started(event)
+        return event
+
+    def finish(self, event):
+        event.seconds = time.perf_counter() - event.started
+        for observer in self.observers:
+            observer.request_finished(event)
+
+
+class Histogram:
+    """Latency histogram with logarithmic buckets. Percentiles are accurate to the bucket, about 19%."""
+
+    __slots__ = ("buckets", "count", "total", "max")
+
+    def __init__(self):
+        self.buckets = [0] * (MAX_BUCKET + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @staticmethod
+    def bucket(milliseconds):
+        if milliseconds <= 1:
+            return 0
+        index = math.ceil(math.log2(milliseconds) * BUCKETS_PER_DOUBLING)
+        return min(index, MAX_BUCKET)
+
+    @staticmethod
+    def upper_bound(bucket):
+        return 2 ** (bucket / BUCKETS_PER_DOUBLING)
+
+    def add(self, milliseconds):
+        self.buckets[self.bucket(milliseconds)] += 1
+        self.count += 1
+        self.total += milliseconds
+        self.max = max(self.max, milliseconds)
+
+    def percentile(self, fraction):
+        """The upper bound of the bucket holding the given fraction (0.99 for p99) of samples, in milliseconds."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for bucket, samples in enumerate(self.buckets):
+            seen += samples
+            if seen >= rank:
+                return min(self.upper_bound(bucket), self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+        }
+
+
+class EndpointStats:
+    __slots__ = (
+        "latency",
+        "requests",
+        "errors",
+        "retries",
+        "bytes_sent",
+        "bytes_received",
+        "statuses",
+    )
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.statuses = {}
+
+    def snapshot(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "statuses": dict(self.statuses),
+            "latency_ms": self.latency.snapshot(),
+        }
+
+
+class Metrics(Observer):
+    def __init__(self):
+        """
+        Per-endpoint request metrics, thread-safe. Attach it with salon.instrumentation.attach(Metrics()).
+
+        Endpoints are the ApiRequest endpoint names ("guests/search", "bookings/slots", ...), not URLs,
+        so ids in the path do not split the statistics.
+        """
+        self._lock = threading.Lock()
+        self.endpoints = {}
+
+    def request_finished(self, event):
+        with self._lock:
+            stats = self.endpoints.get(event.endpoint)
+            if stats is None:
+                stats = self.endpoints[event.endpoint] = EndpointStats()
+            stats.requests += 1
+            stats.errors += event.failed
+            stats.retries += event.attempt > 1
+            stats.bytes_sent += event.bytes_sent
+            stats.bytes_received += event.bytes_received
+            stats.statuses[event.status] = stats.statuses.get(event.status, 0) + 1
+            stats.latency.add(event.seconds * 1000)
+
+    def snapshot(self):
+        """
+        A copy of every counter, safe to serialize as JSON.
+
+        Returns:
+            dict: endpoint -> requests, errors, retries, bytes_sent, bytes_received, statuses and latency_ms (count, mean, p50, p90, p99, max).
+        """
+        with self._lock:
+            return {
+                endpoint: stats.snapshot()
+                for endpoint, stats in sorted(self.endpoints.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self.endpoints = {}
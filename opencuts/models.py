@@ -0,0 +1,460 @@
+"""Compact models for the data openCuts reads from the Regis and Zenoti APIs.
+- Every model uses __slots__ so holding thousands of salons stays cheap
+- Each model normalizes both the Zenoti and the Regis booking (Supersalon/opensalonpro) shapes
+- Only the fields the library uses are kept, the raw payload is dropped after parsing
+"""
+
+
+class _Model:
+    __slots__ = ()
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, name) for name in self.__slots__))
+
+    def as_dict(self):
+        """The model's fields as a JSON-friendly dict, the inverse of from_dict."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def project(self, fields):
+        """A copy keeping only fields (id is always kept), every other field set to None."""
+        return type(self)(
+            **{
+                name: getattr(self, name) if name == "id" or name in fields else None
+                for name in self.__slots__
+            }
+        )
+
+
+def _minute_of_day(time):
+    """Convert "HH:MM", "HHMM" or an ISO "YYYY-MM-DDTHH:MM:SS" time to minutes after midnight."""
+    if "T" in time:
+        time = time.split("T", 1)[1]
+    time = time.replace(":", "")
+    return int(time[:2]) * 60 + int(time[2:4])
+
+
+class Salon(_Model):
+    __slots__ = (
+        "salon_id",
+        "name",
+        "address",
+        "phone",
+        "pos_type",
+        "zenoti_id",
+        "zenoti_api_key",
+    )
+
+    def __init__(
+        self,
+        salon_id,
+        name=None,
+        address=None,
+        phone=None,
+        pos_type=None,
+        zenoti_id=None,
+        zenoti_api_key=None,
+    ):
+        self.salon_id = salon_id
+        self.name = name
+        self.address = address
+        self.phone = phone
+        self.pos_type = pos_type
+        self.zenoti_id = zenoti_id
+        self.zenoti_api_key = zenoti_api_key
+
+    @property
+    def is_zenoti(self):
+        return (self.pos_type or "").lower() == "zenoti"
+
+    @classmethod
+    def from_sis(cls, salon_id, data):
+        """Build a salon from the api.regiscorp.com /sis/api/salon response."""
+        return cls(
+            salon_id,
+            name=data.get("name", None),
+            address=data.get("address2", None),
+            phone=data.get("phone_number", None),
+            pos_type=data.get("pos_type", None),
+            zenoti_id=data.get("zenoti_id", None),
+            zenoti_api_key=data.get("zenoti_api_key", None),
+        )
+
+    def update_from_booking(self, data):
+        """Overlay the store details from a getsalondetails "Salon" object."""
+        self.address = data["address"]
+        self.name = data["name"]
+        self.phone = data["phonenumber"].replace("-", "")
+
+    def with_booking(self, data):
+        """A copy with the store details of a getsalondetails "Salon" object, leaving this salon untouched."""
+        salon = Salon.from_dict(self.as_dict())
+        salon.update_from_booking(data)
+        return salon
+
+
+class Service(_Model):
+    __slots__ = ("id", "name", "category", "duration", "price")
+
+    def __init__(self, id, name, category=None, duration=None, price=None):
+        self.id = id
+        self.name = name
+        self.category = category
+        self.duration = duration
+        self.price = price
+
+    @classmethod
+    def from_zenoti(cls, data):
+        catalog_info = data.get("catalog_info") or {}
+        price_info = data.get("price_info") or {}
+        return cls(
+            data["id"],
+            catalog_info.get("display_name") or data.get("name"),
+            category=(data.get("category") or {}).get("name"),
+            duration=data.get("duration"),
+            price=price_info.get("sale_price"),
+        )
+
+    @classmethod
+    def from_regis(cls, data, category=None):
+        return cls(
+            data["id"],
+            data["service"],
+            category=category,
+            duration=data.get("duration"),
+            price=data.get("price"),
+        )
+
+
+def services_from_regis(categories):
+    """Flatten the getsalondetails "Services" categories into a list of services."""
+    return [
+        Service.from_regis(service, category.get("category"))
+        for category in categories or []
+        for service in category["services"]
+    ]
+
+
+class Stylist(_Model):
+    __slots__ = ("id", "name", "first_name", "last_name", "gender")
+
+    def __init__(self, id, name, first_name=None, last_name=None, gender="0"):
+        self.id = id
+        self.name = name
+        self.first_name = first_name
+        self.last_name = last_name
+        self.gender = gender
+
+    @classmethod
+    def from_zenoti(cls, data):
+        personal_info = data["personal_info"]
+        return cls(
+            data["id"],
+            personal_info.get("name"),
+            first_name=personal_info.get("first_name"),
+            last_name=personal_info.get("last_name"),
+            gender=personal_info.get("gender", "0"),
+        )
+
+    @classmethod
+    def from_regis(cls, data):
+        name = data["name"]
+        return cls(
+            data.get("id", data.get("employeeID")),
+            name,
+            first_name=name.split(" ", 1)[0],
+        )
+
+
+class Slot(_Model):
+    __slots__ = ("time", "minute", "stylist_id", "stylist_name", "salon_id")
+
+    def __init__(self, time, minute, stylist_id=None, stylist_name=None, salon_id=None):
+        # time is kept in the format the API expects back when booking
+        self.time = time
+        self.minute = minute
+        self.stylist_id = stylist_id
+        self.stylist_name = stylist_name
+        self.salon_id = salon_id
+
+    @property
+    def label(self):
+        """The slot time as HH:MM."""
+        return f"{self.minute // 60:02d}:{self.minute % 60:02d}"
+
+    @classmethod
+    def from_zenoti(cls, data, stylist=None, salon_id=None):
+        time = data["Time"]
+        return cls(
+            time,
+            _minute_of_day(time),
+            stylist_id=stylist.id if stylist else None,
+            stylist_name=stylist.name if stylist else None,
+            salon_id=salon_id,
+        )
+
+
+def slots_from_regis_availability(availability, salon_id=None):
+    """Flatten getavailabilityofsalon stylists (times.hours[].h / m[]) into slots."""
+    slots = []
+    for stylist in availability or []:
+        stylist_id = stylist.get("employeeID")
+        stylist_name = stylist.get("name")
+        for hour_block in stylist["times"]["hours"]:
+            hour = hour_block["h"]
+            for minute in hour_block["m"]:
+                slots.append(
+                    Slot(
+                        f"{hour:02d}{minute:02d}",
+                        hour * 60 + minute,
+                        stylist_id=stylist_id,
+                        stylist_name=stylist_name,
+                        salon_id=salon_id,
+                    )
+                )
+    return slots
+
+
+class CheckIn(_Model):
+    __slots__ = ("id", "result", "date", "time", "services", "stylist_name")
+
+    def __init__(
+        self, id, result=None, date=None, time=None, services=(), stylist_name=None
+    ):
+        self.id = id
+        self.result = result
+        self.date = date
+        self.time = time
+        self.services = tuple(services)
+        self.stylist_name = stylist_name
+
+    @classmethod
+    def from_add_check_in(cls, data):
+        return cls(data.get("checkinId", None), result=data.get("apiResult", None))
+
+    @classmethod
+    def from_regis(cls, data):
+        """Build a check-in from one getcheckinbysource entry."""
+        return cls(
+            data.get("checkinId"),
+            date=data.get("date"),
+            time=data.get("time"),
+            services=data.get("services") or (),
+            stylist_name=data.get("stylistName"),
+        )
+
+
+def normalize_name(name):
+    """Case- and whitespace-normalized key used by the name indexes."""
+    return " ".join((name or "").split()).casefold()
+
+
+class ModelIndex:
+    """id -> model and normalized name -> model lookups over a list of services or stylists."""
+
+    __slots__ = ("by_id", "by_name")
+
+    def __init__(self, items=(), names=lambda item: (item.name,)):
+        self.by_id = {}
+        self.by_name = {}
+        for item in items or ():
+            self.by_id.setdefault(str(item.id), item)
+            for name in names(item):
+                key = normalize_name(name)
+                # The first model with a name wins, like the old linear scans
+                if key:
+                    self.by_name.setdefault(key, item)
+
+    def find_by_id(self, id):
+        return self.by_id.get(str(id))
+
+    def find_by_name(self, name):
+        return self.by_name.get(normalize_name(name))
+
+
+class SalonSnapshot:
+    """
+    A salon, its services and its stylists with their lookup indexes, as one RegisSalon knew them at a moment.
+
+    A snapshot is never changed: a refresh builds a new one and swaps it in, so readers on other threads
+    always see a salon, services and stylists that belong together.
+    """
+
+    __slots__ = ("salon", "services", "stylists", "service_index", "stylist_index")
+
+    def __init__(
+        self,
+        salon=None,
+        services=None,
+        stylists=(),
+        service_index=None,
+        stylist_index=None,
+    ):
+        services = None if services is None else tuple(services)
+        stylists = tuple(stylists or ())
+        if service_index is None:
+            service_index = ModelIndex(services, service_names)
+        if stylist_index is None:
+            stylist_index = ModelIndex(stylists, stylist_names)
+        set_field = object.__setattr__
+        set_field(self, "salon", salon)
+        set_field(self, "services", services)
+        set_field(self, "stylists", stylists)
+        set_field(self, "service_index", service_index)
+        set_field(self, "stylist_index", stylist_index)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable, use replace()")
+
+    def __repr__(self):
+        services = None if self.services is None else len(self.services)
+        return f"SalonSnapshot(salon={self.salon!r}, services={services}, stylists={len(self.stylists)})"
+
+    def replace(self, **changes):
+        """A new snapshot with changes (salon, services or stylists), the indexes of unchanged lists are reused."""
+        return SalonSnapshot(
+            changes.get("salon", self.salon),
+            changes.get("services", self.services),
+            changes.get("stylists", self.stylists),
+            None if "services" in changes else self.service_index,
+            None if "stylists" in changes else self.stylist_index,
+        )
+
+
+def service_names(service):
+    return (service.name,)
+
+
+def stylist_names(stylist):
+    return (stylist.first_name, stylist.name)
+
+
+class SalonAvailability(_Model):
+    """The open slots of one salon for a service on a day, or the reason they could not be fetched."""
+
+    __slots__ = ("salon_id", "service", "slots", "error", "date")
+
+    def __init__(self, salon_id, service=None, slots=(), error=None, date=None):
+        self.salon_id = salon_id
+        self.service = service
+        self.slots = tuple(slots)
+        self.error = error
+        # YYYY-MM-DD for the days of a scan_availability, None for today
+        self.date = date
+
+    @property
+    def earliest(self):
+        return min(self.slots, key=lambda slot: slot.minute, default=None)
+
+
+def _record_day(record):
+    """The YYYY-MM-DD an attendance record belongs to."""
+    for field in ("date", "check_in_time", "start_time"):
+        value = record.get(field)
+        if value:
+            return value[:10]
+    return None
+
+
+class SalonSchedule(_Model):
+    """The attendance of every therapist of a Zenoti salon over a range of days, from RegisSalon.get_schedule()."""
+
+    __slots__ = ("salon_id", "start_date", "end_date", "shifts", "names", "errors")
+
+    def __init__(
+        self, salon_id, start_date, end_date, shifts=None, names=None, errors=None
+    ):
+        self.salon_id = salon_id
+        self.start_date = start_date
+        self.end_date = end_date
+        # stylist id -> YYYY-MM-DD -> attendance records of that day, as the API returned them
+        self.shifts = shifts if shifts is not None else {}
+        # stylist id -> name
+        self.names = names if names is not None else {}
+        # stylist id -> why their attendance could not be fetched
+        self.errors = errors if errors is not None else {}
+
+    def add(self, stylist, records):
+        days = self.shifts.setdefault(stylist.id, {})
+        self.names[stylist.id] = stylist.name
+        for record in records:
+            days.setdefault(_record_day(record), []).append(record)
+
+    def working_on(self, day):
+        """Ids of the stylists with attendance on day (YYYY-MM-DD)."""
+        return [stylist_id for stylist_id, days in self.shifts.items() if day in days]
+
+    def days(self, stylist_id):
+        """The days (YYYY-MM-DD) a stylist has attendance, in order."""
+        return sorted(day for day in self.shifts.get(stylist_id, {}) if day)
+
+
+class SlotChanges(_Model):
+    """What changed between two polls of RegisSalon.watch(). The first poll lists every open slot as added."""
+
+    __slots__ = ("added", "removed", "slots", "polls")
+
+    def __init__(self, added=(), removed=(), slots=(), polls=0):
+        self.added = tuple(added)
+        self.removed = tuple(removed)
+        # Every slot open after this poll
+        self.slots = tuple(slots)
+        self.polls = polls
+
+
+class BookingResult(_Model):
+    """The outcome of RegisSalon.book(), with the seconds each stage took."""
+
+    __slots__ = (
+        "guest_id",
+        "booking_id",
+        "slots",
+        "slot",
+        "reserved",
+        "confirmed",
+        "invoice_id",
+        "error",
+        "timings",
+    )
+
+    def __init__(
+        self,
+        guest_id=None,
+        booking_id=None,
+        slots=(),
+        slot=None,
+        reserved=False,
+        confirmed=False,
+        invoice_id=None,
+        error=None,
+        timings=None,
+    ):
+        self.guest_id = guest_id
+        self.booking_id = booking_id
+        self.slots = tuple(slots)
+        self.slot = slot
+        self.reserved = reserved
+        self.confirmed = confirmed
+        self.invoice_id = invoice_id
+        self.error = error
+        # stage -> seconds: guest, booking, slots, reserve, confirm and total
+        self.timings = timings if timings is not None else {}
+
+    @property
+    def slot_to_confirm(self):
+        """Seconds from reserving the chosen slot to its confirmation, the window in which it can be lost."""
+        return self.timings.get("reserve", 0.0) + self.timings.get("confirm", 0.0)
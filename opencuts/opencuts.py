@@ -1,11 +1,42 @@
+import collections
+import functools
 import logging
 import sys
-from datetime import datetime
-import requests
+import threading
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 import uuid
-import os
 
-""" openCuts - an opensource library for interacting with Regis Properties Salons. 
+from .cache import DayCache, SingleFlight
+from .deadline import Deadline
+from .eligibility import EligibilityMatrix
+from .models import (
+    BookingResult,
+    CheckIn,
+    Salon,
+    SalonAvailability,
+    SalonSchedule,
+    SalonSnapshot,
+    Service,
+    Slot,
+    Stylist,
+    normalize_name,
+    services_from_regis,
+    slots_from_regis_availability,
+)
+from .transport import ApiError, ApiRequest, Transport
+from .watch import (
+    DEFAULT_INTERVAL,
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_MIN_INTERVAL,
+    PollSchedule,
+    SlotDiff,
+    sleep,
+)
+
+""" openCuts - an opensource library for interacting with Regis Properties Salons.
     - User is expected to include the regis_api_key, regis_booking_api_key and salon_id
     - Features:
         - Get Salon Services
@@ -19,10 +50,6 @@ import os
         - see upcoming appointments for user
         - Support for all regis pos_types
 """
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
-
 POS_TYPES = [
     "Zenoti",
     "Supersalon",
@@ -34,230 +61,793 @@ BASE_REGIS_API_URL = "https://api.regiscorp.com"
 BASE_REGIS_BOOKING_API_URL = "https://api-booking.regiscorp.com/v1/"
 ZENOTI_API_URL = "https://api.zenoti.com/v1/"
 
+# How long a getsalondetails result is reused by the non-Zenoti accessors (seconds)
+SALON_DETAILS_TTL = 300
 
-class RegisSalon:
-    def __init__(self, salon_id, regis_api_key, regis_boking_api_key):
-        """
-        Initialize a new Salon instance with specific salon ID and Regis API key.
+# How many last good responses each salon keeps to serve while their endpoint is failing
+STALE_ENTRIES = 256
 
-        Args:
-            salon_id (str): The unique identifier for a specific salon.
-            regis_api_key (str): API key used for authorization with Regis properties' services.
+# Days fetched at once by RegisSalon.scan_availability, therapists by RegisSalon.get_schedule
+SCAN_CONCURRENCY = 8
 
-        This method initializes the Salon instance with the provided salon ID and Regis API key. It also sets default values for various instance properties such as API URLs, store ID, POS type, available services, and the current date.
-        """
+# How long a SalonSchedule is reused (seconds)
+SCHEDULE_TTL = 15 * 60
+
+# Services or therapists per Zenoti catalog page
+CATALOG_PAGE_SIZE = 100
+
+# Statuses of a booking refused for what was asked, e.g. a therapist outside their skills.
+# Throttling (429), server errors and auth failures say nothing about the stylist.
+REFUSAL_STATUSES = frozenset({400, 422})
+
+
+class PageError(Exception):
+    """Raised by the catalog iterators when a page could not be fetched, rather than silently ending early."""
+
+
+# getsalondetails requests in flight, shared by every RegisSalon in the process
+_salon_details_flights = SingleFlight()
+_revalidate_lock = threading.Lock()
+
+# The device id sent with check-ins, read from (or first written to) the device_uuid file once per process
+_device_uuid = None
+_device_uuid_lock = threading.Lock()
+
+
+def _read_device_uuid(path="device_uuid"):
+    """The id in path, generating and storing one if the file does not exist yet."""
+    global _device_uuid
+    with _device_uuid_lock:
+        if _device_uuid is None:
+            try:
+                # Exclusive create, a process that loses the race reads the winner's id
+                with open(path, "x") as f:
+                    f.write(str(uuid.uuid4()))
+            except FileExistsError:
+                pass
+            with open(path, "r") as f:
+                _device_uuid = f.read()
+        return _device_uuid
+
+
+def _timed(timings, stage, fn, *args):
+    """Call fn(*args) and record how many seconds it took under timings[stage]."""
+    start = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+
+def _earliest_slot(slots):
+    return min(slots, key=lambda slot: slot.minute)
+
+
+def _booking_id(booking):
+    """The id of a create_service_booking answer, None when it failed or answered an error."""
+    return booking.get("id") if isinstance(booking, dict) else None
+
+
+def _has_more(data, page, size, count):
+    """Whether a catalog page is followed by another, from its page_info total or from it being full."""
+    page_info = data.get("page_info") or data.get("page_Info") or {}
+    total = page_info.get("total")
+    if total is not None:
+        return page * size < total
+    return count >= size
+
+
+def _as_date(value):
+    """A datetime.date from a date, a datetime or a YYYY-MM-DD string. None is today."""
+    if value is None:
+        return date.today()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+
+class SalonBase:
+    """
+    State, request building and response parsing shared by RegisSalon and AsyncRegisSalon.
+
+    Subclasses only add the I/O: each public method builds an ApiRequest with one of the
+    _*_request methods, sends it and hands the decoded body to the matching parser.
+    """
+
+    def __init__(
+        self,
+        salon_id,
+        regis_api_key,
+        regis_boking_api_key,
+        details_ttl=SALON_DETAILS_TTL,
+        cache=None,
+        store=None,
+        device_uuid=None,
+    ):
         self.salon_id = salon_id
         self.regis_api_key = regis_api_key
         self.regis_api_booking_key = regis_boking_api_key
         self.base_regis_api_url = BASE_REGIS_API_URL
         self.base_regis_booking_api_url = BASE_REGIS_BOOKING_API_URL
         self.zenoti_api_url = ZENOTI_API_URL
-        self.store_id = None
-        self.pos_type = None
-        self.store_services = None
-        self.today_date = datetime.now().strftime("%Y-%m-%d")
-        self.therapists = []
-        self.storeaddress = None
-        self.storename = None
-        self.storephone = None
-
-        # UUID Logic
-        # Generate and store UUID only once
-        if not os.path.exists("device_uuid"):
-            with open("device_uuid", "w") as f:
-                device_uuid = uuid.uuid4()
-                self.device_uuid_str = str(
-                    device_uuid
-                )  # Convert the UUID object to a string
-                f.write(self.device_uuid_str)
-        f = open("device_uuid", "r")
-        self.device_uuid_str = str(f.read())
-        f.close()
-
-    def get_salon(self):
-        """
-        Retrieve salon information using its unique identifier and set essential details.
+        # The salon, services and stylists are swapped as one immutable SalonSnapshot so many threads can share a salon
+        self._snapshot = SalonSnapshot()
+        self._lock = threading.RLock()
+        self.details_ttl = details_ttl
+        # (getsalondetails result, monotonic expiry, wall clock fetch time), replaced as a whole
+        self._details = (None, 0, None)
+        self.cache = cache
+        # SalonStore that keeps a queryable copy of everything fetched
+        self.store = store
+        self._guests = {}
+        self._attendance = (None, None)
+        # Last good response of every read request, served (and listed in stale) while its endpoint fails
+        self._last_good = collections.OrderedDict()
+        self._revalidating = set()
+        self.stale = {}
+        # Open slots per (salon, service, stylist) and day, filled by scan_availability. Replace it to share one between salons.
+        self.availability_cache = DayCache()
+        self._schedules = DayCache(SCHEDULE_TTL)
+        # (snapshot, EligibilityMatrix built from its stylists and services)
+        self._eligibility = None
+        # The device_uuid file is only read (or created) when no device id is given
+        self.device_uuid_str = device_uuid or _read_device_uuid()
 
-        This method makes an API request to retrieve salon information, including the Zenoti API key, store ID, and POS type, using the salon's unique identifier.
+    @property
+    def today_date(self):
+        """Today as YYYY-MM-DD, read from the clock on every use so a long-running process rolls over at midnight."""
+        return date.today().isoformat()
 
-        Returns:
-            tuple: A tuple containing the Zenoti API key, store ID, and POS type if the request is successful, otherwise None.
+    @property
+    def hosts(self):
+        """Base URLs of every API this salon talks to."""
+        return [
+            self.base_regis_api_url,
+            self.base_regis_booking_api_url,
+            self.zenoti_api_url,
+        ]
+
+    @property
+    def snapshot(self):
+        """The current SalonSnapshot. Read several fields from one snapshot rather than from the salon to get a consistent view."""
+        return self._snapshot
+
+    def _swap(self, **changes):
+        """Replace the snapshot with a copy carrying changes, rebuilding only the indexes of changed lists."""
+        with self._lock:
+            self._snapshot = self._snapshot.replace(**changes)
+            return self._snapshot
+
+    # Assigning the salon, services or stylists swaps in a new snapshot, so their lookup indexes never go stale
+    @property
+    def salon(self):
+        return self._snapshot.salon
+
+    @salon.setter
+    def salon(self, salon):
+        self._swap(salon=salon)
+
+    @property
+    def store_services(self):
+        return self._snapshot.services
+
+    @store_services.setter
+    def store_services(self, services):
+        self._swap(services=services)
+
+    @property
+    def therapists(self):
+        return self._snapshot.stylists
+
+    @therapists.setter
+    def therapists(self, stylists):
+        self._swap(stylists=stylists)
+
+    # Shortcuts to the fields of the parsed Salon
+    def _salon_field(self, name):
+        salon = self._snapshot.salon
+        return getattr(salon, name) if salon else None
+
+    @property
+    def zenoti_api_key(self):
+        return self._salon_field("zenoti_api_key")
+
+    @property
+    def store_id(self):
+        return self._salon_field("zenoti_id")
+
+    @property
+    def pos_type(self):
+        return self._salon_field("pos_type")
+
+    @property
+    def storeaddress(self):
+        return self._salon_field("address")
+
+    @property
+    def storename(self):
+        return self._salon_field("name")
+
+    @property
+    def storephone(self):
+        return self._salon_field("phone")
+
+    # The last get_stylist_attendance answer
+    @property
+    def attendance(self):
+        return self._attendance[0]
+
+    @property
+    def attendance_total(self):
+        return self._attendance[1]
+
+    def find_stylist_by_name(self, stylist_name):
+        """Find a stylist by first or full name, ignoring case. Returns None if no stylist has that name."""
+        return self._snapshot.stylist_index.find_by_name(stylist_name)
+
+    def find_stylist_by_id(self, stylist_id):
+        return self._snapshot.stylist_index.find_by_id(stylist_id)
+
+    def find_service_by_name(self, service_name):
+        """Find a service by name, ignoring case. Returns None if no service has that name."""
+        return self._snapshot.service_index.find_by_name(service_name)
+
+    def find_service_by_id(self, service_id):
+        return self._snapshot.service_index.find_by_id(service_id)
+
+    # Persistent cache (DiskCache) of the salon metadata, services and stylists
+    def _stylists_cache_key(self):
+        return f"{self.salon_id}:{self.today_date}"
+
+    def _load_cached(self, kind, key, load):
+        if self.cache is None:
+            return None
+        data = self.cache.get(kind, key)
+        return None if data is None else load(data)
+
+    def _save_cached(self, kind, key, value):
+        if self.cache is not None:
+            self._persist(self.cache.set, kind, key, value)
+
+    def _persist(self, write, *args):
+        """Run a DiskCache or SalonStore write. AsyncRegisSalon queues it on a worker thread instead, sqlite would block the loop."""
+        write(*args)
+
+    def _cached_salon(self):
+        return self._load_cached("salon", self.salon_id, Salon.from_dict)
+
+    def _cached_services(self):
+        services = self._load_cached(
+            "services",
+            self.salon_id,
+            lambda data: [Service.from_dict(service) for service in data],
+        )
+        if services is not None:
+            self.store_services = services
+        return services
+
+    def _cached_stylists(self):
+        stylists = self._load_cached(
+            "stylists",
+            self._stylists_cache_key(),
+            lambda data: [Stylist.from_dict(stylist) for stylist in data],
+        )
+        if stylists is not None:
+            self.therapists = stylists
+        return stylists
+
+    def _save_salon(self, salon):
+        # Unlike the SalonStore the DiskCache keeps the Zenoti API key, a restart needs it to skip the salon lookup.
+        # The cache file is private to its owner, see DiskCache's mode.
+        self._save_cached("salon", self.salon_id, salon.as_dict())
+        if self.store is not None:
+            self._persist(self.store.save_salon, salon)
+
+    def _save_services(self):
+        services = self.store_services
+        self._save_cached(
+            "services",
+            self.salon_id,
+            [service.as_dict() for service in services],
+        )
+        if self.store is not None:
+            self._persist(self.store.save_services, self.salon_id, services)
+
+    def _save_stylists(self):
+        stylists = self.therapists
+        self._save_cached(
+            "stylists",
+            self._stylists_cache_key(),
+            [stylist.as_dict() for stylist in stylists],
+        )
+        if self.store is not None:
+            self._persist(self.store.save_stylists, self.salon_id, stylists)
+
+    def _save_availability(self, result, stylists=None):
+        """Record result in the store, if there is one. stylists are the ids it covers, see SalonStore.save_availability."""
+        if self.store is not None and result.error is None:
+            self._persist(self.store.save_availability, result, stylists)
+        return result
+
+    def _save_slots(self, service, stylist, day, slots):
+        """Record one day's slots of service (and stylist) in the store, if there is one, and return them."""
+        if self.store is not None and slots is not None:
+            if not isinstance(service, Service):
+                service = self.find_service_by_id(service) or Service(service)
+            self._save_availability(
+                SalonAvailability(self.salon_id, service, slots, date=day.isoformat()),
+                self._day_scope(stylist, slots),
+            )
+        return slots
+
+    def _day_scope(self, stylist, slots):
+        """The stylist ids one day's slots of stylist cover: a Zenoti booking answers for one stylist (or next available), Regis for every stylist unless filtered."""
+        if self.salon is not None and self.salon.is_zenoti:
+            return [stylist.id if stylist else None]
+        if stylist is None:
+            return None
+        return [stylist.id, *(slot.stylist_id for slot in slots)]
+
+    # Guest identity cache: (center, phone, name) -> Zenoti guest id, in memory and in the DiskCache
+    def _guest_cache_key(self, first_name, last_name, phone):
+        digits = "".join(char for char in phone or "" if char.isdigit())
+        name = normalize_name(f"{first_name or ''} {last_name or ''}")
+        return f"{self.store_id}:{digits}:{name}"
+
+    def _cached_guest_id(self, key):
+        guest_id = self._guests.get(key)
+        if guest_id is None:
+            guest_id = self._load_cached("guest", key, str)
+            if guest_id is not None:
+                self._guests[key] = guest_id
+        return guest_id
+
+    def _remember_guest(self, key, guest_id):
+        self._guests[key] = guest_id
+        self._save_cached("guest", key, guest_id)
+        return guest_id
+
+    def forget_guest(self, guest_id):
+        """Drop a guest id from the identity cache so the next resolve_guest searches again."""
+        for key, cached in list(self._guests.items()):
+            if cached == guest_id:
+                del self._guests[key]
+                if self.cache is not None:
+                    self._persist(self.cache.delete, "guest", key)
+
+    def _check_guest_call(self, guest_id, result):
+        """Forget a cached guest id when a call made with it failed, the id may be stale."""
+        failed = result is None or (isinstance(result, dict) and result.get("error"))
+        if guest_id and failed:
+            logging.info("Call with guest %s failed, forgetting it", guest_id)
+            self.forget_guest(guest_id)
+        return result
+
+    # Availability scans over a date range, shared by RegisSalon.scan_availability and AsyncRegisSalon.scan_availability
+    @staticmethod
+    def _scan_jobs(services, start, days):
+        if isinstance(services, Service):
+            services = [services]
+        first = _as_date(start)
+        return [
+            (first + timedelta(days=offset), service)
+            for offset in range(days)
+            for service in services
+        ]
+
+    def _availability_key(self, service, stylist):
+        return (self.salon_id, service.id, stylist.id if stylist else None)
+
+    def _cached_day(self, service, stylist, day):
+        slots = self.availability_cache.get(
+            self._availability_key(service, stylist), day
+        )
+        if slots is None:
+            return None
+        return SalonAvailability(self.salon_id, service, slots, date=day.isoformat())
+
+    def _fetched_day(self, service, stylist, day, slots):
+        if slots is None:
+            return SalonAvailability(
+                self.salon_id,
+                service,
+                error="availability lookup failed",
+                date=day.isoformat(),
+            )
+        slots = tuple(slots)
+        self.availability_cache.set(
+            self._availability_key(service, stylist), day, slots
+        )
+        return self._save_availability(
+            SalonAvailability(self.salon_id, service, slots, date=day.isoformat()),
+            self._day_scope(stylist, slots),
+        )
+
+    def _parse_day_availability(self, stylist):
+        """Parser of a getavailabilityofsalon answer that keeps the slots of stylist only, all of them for None."""
+
+        def parse(data):
+            slots = slots_from_regis_availability(data, self.salon_id)
+            if stylist is None:
+                return slots
+            return [
+                slot
+                for slot in slots
+                if slot.stylist_id == stylist.id
+                or (slot.stylist_name or "").lower() == (stylist.name or "").lower()
+            ]
+
+        return parse
+
+    # Attendance of every therapist, shared by RegisSalon.get_schedule and AsyncRegisSalon.get_schedule
+    def _schedule_range(self, start, days):
+        first = _as_date(start)
+        return first, first + timedelta(days=days - 1)
+
+    def _can_schedule(self):
+        salon = self.salon
+        if salon is None or not salon.is_zenoti:
+            logging.error("Attendance is only available for Zenoti salons")
+            return False
+        return True
+
+    def _cached_schedule(self, first, last):
+        return self._schedules.get((self.salon_id, last), first)
+
+    def _roster_days(self, first, last):
+        """The days of a schedule other than today, their therapists come from their own centers/therapists list."""
+        today = _as_date(self.today_date)
+        days = (
+            first + timedelta(days=offset) for offset in range((last - first).days + 1)
+        )
+        return [day for day in days if day != today]
+
+    def _schedule_roster(self, first, last, rosters):
+        """Everyone working on a day of the schedule, once each: today's therapists, then those of the (day, stylists) rosters."""
+        today = first <= _as_date(self.today_date) <= last
+        everyone = {}
+        for stylist in [
+            *(self.therapists if today else ()),
+            *(stylist for _, stylists in rosters for stylist in stylists or ()),
+        ]:
+            everyone.setdefault(stylist.id, stylist)
+        return list(everyone.values())
+
+    def _new_schedule(self, first, last, rosters=()):
+        schedule = SalonSchedule(self.salon_id, first.isoformat(), last.isoformat())
+        for day, stylists in rosters:
+            if stylists is None:
+                # Whoever works only that day is missing, like a therapist whose attendance failed
+                schedule.errors[day.isoformat()] = "therapists lookup failed"
+        return schedule
+
+    def _finish_schedule(self, schedule, first, last, attendance):
+        """Merge every therapist's records into schedule, and cache it if nobody failed."""
+        for stylist, records in attendance:
+            if records is None:
+                schedule.errors[stylist.id] = "attendance lookup failed"
+            else:
+                schedule.add(stylist, records)
+        if not schedule.errors:
+            self._schedules.set((self.salon_id, last), first, schedule)
+        return schedule
+
+    # Stylist x service eligibility, shared by RegisSalon.find_slots and AsyncRegisSalon.find_slots
+    @property
+    def eligibility(self):
+        """The EligibilityMatrix of the current stylists and services, rebuilt (keeping its exclusions) when either is refreshed."""
+        snapshot = self._snapshot
+        with self._lock:
+            built = self._eligibility
+            if built is None or built[0] is not snapshot:
+                excluded = {
+                    tuple(pair)
+                    for pair in self._load_cached(
+                        "eligibility", self._stylists_cache_key(), list
+                    )
+                    or ()
+                }
+                if built is not None:
+                    excluded.update(built[1].excluded)
+                matrix = EligibilityMatrix(
+                    snapshot.stylists, snapshot.services or (), excluded
+                )
+                built = self._eligibility = (snapshot, matrix)
+            return built[1]
+
+    def _refused(self, error, stylist, service):
         """
-        headers = {
-            "Authorization": self.regis_api_key,
-        }
-        params = {"salon-number": self.salon_id}
-        logging.info("Getting Zenoti API Key")
-        request_url = self.base_regis_api_url + "/sis/api/salon?" + self.salon_id
-        try:
-            response = requests.get(request_url, headers=headers, params=params)
-            self.zenoti_api_key = response.json().get("zenoti_api_key", None)
-            self.store_id = response.json().get("zenoti_id", None)
-            self.pos_type = response.json().get("pos_type", None)
-            self.storeaddress = response.json().get("address2", None)
-            self.storename = response.json().get("name", None)
-            self.storephone = response.json().get("phone_number", None)
-        except Exception as error:
-            logging.error("Error getting Zenoti API Key %s", error)
+        Whether error is the API refusing a booking of stylist for service, excluding the pair from then on.
+
+        Only an ApiError with a refusal status and an error body counts: a throttled, failed or unreachable
+        request says nothing about what the stylist can do.
+        """
+        if (
+            not isinstance(error, ApiError)
+            or error.status not in REFUSAL_STATUSES
+            or not isinstance(error.body, dict)
+            or not error.body.get("error")
+            or error.body.get("id")
+        ):
+            return False
+        logging.info("%s cannot perform %s, skipping them", stylist.name, service.name)
+        matrix = self.eligibility
+        with self._lock:
+            matrix.exclude(stylist, service)
+            excluded = matrix.excluded
+        self._save_cached("eligibility", self._stylists_cache_key(), excluded)
+        return True
+
+    def _stylist_booking_request(self, service, stylist, day):
+        """The booking of stylist for service that find_slots sends, answering an ApiError rather than an error body."""
+        request = self._create_booking_request(service, stylist, date=day)
+        request.raise_errors = True
+        return request
+
+    def _parse_stylist_slots(self, stylist):
+        """Parser of a bookings/{id}/slots answer for a booking with stylist."""
+
+        def parse(data):
+            return tuple(
+                Slot.from_zenoti(slot, stylist, self.salon_id) for slot in data["slots"]
+            )
+
+        return parse
+
+    def _eligible_slots(self, service, stylists, slots):
+        """Keep the getavailabilityofsalon slots of the eligible stylists (among stylists, if given)."""
+        if slots is None:
             return None
-        # Get some additonal info if this is a differnet POS system
-        if self.pos_type.lower() != "zenoti":
-            headers = {
-                "x-api-key": self.regis_api_booking_key,
-            }
-            payload = {
-                "salonId": self.salon_id,
-                "siteId": "1",
-            }
-            logging.info("Getting Store Details")
-            request_url = self.base_regis_booking_api_url + "getsalondetails"
-            try:
-                response = requests.post(request_url, headers=headers, json=payload)
-                response = response.json()
-                self.storeaddress = response["Salon"]["address"]
-                self.storename = response["Salon"]["name"]
-                self.storephone = response["Salon"]["phonenumber"]
-                self.storephone = self.storephone.replace("-", "")
-            except Exception as error:
-                logging.error("Error Store Details %s", error)
-                return None
+        wanted = None if stylists is None else {str(stylist.id) for stylist in stylists}
+        matrix = self.eligibility
+        return [
+            slot
+            for slot in slots
+            if (wanted is None or str(slot.stylist_id) in wanted)
+            and matrix.can(slot.stylist_id, service)
+        ]
+
+    def _eligible_scope(self, service, stylists, slots):
+        """The stylist ids covered by the getavailabilityofsalon slots _eligible_slots kept."""
+        if slots is None:
+            return None
+        eligible = self.eligibility.eligible(service, stylists)
+        return [stylist.id for stylist in eligible] + [
+            slot.stylist_id for slot in slots
+        ]
 
-    def get_salon_services(self):
+    def _found_slots(self, service, day, answers, covered=None):
         """
-        Retrieve salon services
+        One SalonAvailability from the (stylist, slots) answers of find_slots, earliest first.
 
+        covered are the stylist ids the answers stand for in the store, by default the stylists that answered.
         """
-        if self.pos_type.lower() == "zenoti":
-            headers = {
-                "Authorization": "apikey " + self.zenoti_api_key,
-            }
-            logging.info("Getting Salon Services")
-            request_url = (
-                self.zenoti_api_url
-                + f"centers/{self.store_id}/services?catalog_enabled=true&expand=additional_info&expand=catalog_info&size=100&0=us"
+        date = day.isoformat()
+        if not answers:
+            return SalonAvailability(
+                self.salon_id, service, error="no eligible stylist", date=date
             )
-            try:
-                response = requests.get(request_url, headers=headers)
-                self.store_services = response.json().get("services", None)
-            except Exception as error:
-                logging.error("Error Geting Store Services %s", error)
+        if all(slots is None for _, slots in answers):
+            return SalonAvailability(
+                self.salon_id, service, error="availability lookup failed", date=date
+            )
+        slots = sorted(
+            (slot for _, found in answers for slot in found or ()),
+            key=lambda slot: slot.minute,
+        )
+        if covered is None:
+            covered = [stylist.id for stylist, found in answers if found is not None]
+        return self._save_availability(
+            SalonAvailability(self.salon_id, service, slots, date=date), covered
+        )
+
+    # Booking pipeline steps without I/O, shared by RegisSalon.book and AsyncRegisSalon.book
+    @staticmethod
+    def _start_booking(result, guest_id, booking, slots, choose):
+        """Fill a BookingResult from the guest, booking and slot stages and pick the slot to book."""
+        result.guest_id = guest_id
+        result.booking_id = _booking_id(booking)
+        result.slots = tuple(slots or ())
+        if guest_id is None:
+            result.error = "guest lookup failed"
+        elif result.booking_id is None or booking.get("error"):
+            result.error = "booking failed"
+        elif slots is None:
+            result.error = "slot lookup failed"
+        elif not slots:
+            result.error = "no open slots"
+        else:
+            result.slot = (choose or _earliest_slot)(result.slots)
+            if result.slot is None:
+                result.error = "no slot chosen"
+        return result.error is None
+
+    @staticmethod
+    def _finish_booking(result, reserved, confirmed=None):
+        result.reserved = bool((reserved or {}).get("is_reserved"))
+        if not result.reserved:
+            result.error = "reserve failed"
+            return result
+        result.confirmed = bool((confirmed or {}).get("is_confirmed"))
+        result.invoice_id = ((confirmed or {}).get("invoice") or {}).get("id")
+        if not result.confirmed:
+            result.error = "confirm failed"
+        return result
+
+    # Stale-while-revalidate for read requests
+    def _remember_good(self, request, result):
+        if not request.idempotent or result is None:
+            return result
+        key = request.key()
+        with self._lock:
+            self._last_good[key] = (result, time.time())
+            self._last_good.move_to_end(key)
+            if len(self._last_good) > STALE_ENTRIES:
+                self._last_good.popitem(last=False)
+            self.stale.pop(request.endpoint, None)
+        return result
+
+    def _serve_stale(self, request):
+        """The last good response to request, recording its endpoint in stale, otherwise None."""
+        if not request.idempotent:
+            return None
+        with self._lock:
+            entry = self._last_good.get(request.key())
+            if entry is None:
                 return None
-            return self.store_services
-        # Handle a non-zenoti type store
-        headers = {
-            "x-api-key": self.regis_api_booking_key,
+            result, fetched = entry
+            self.stale[request.endpoint] = fetched
+        logging.warning(
+            "Serving stale %s from %s",
+            request.description,
+            datetime.fromtimestamp(fetched).strftime("%H:%M:%S"),
+        )
+        return result
+
+    def _serve_stale_details(self, error):
+        details, _, fetched = self._details
+        if details is None:
+            raise error
+        self.stale["getsalondetails"] = fetched
+        logging.warning("Serving stale Store Details %s", error)
+        return details
+
+    def _breaker_retry_in(self, request):
+        return self.transport.breakers.get(request).retry_in()
+
+    def _cached_salon_details(self):
+        """The getsalondetails result if it has not expired yet, otherwise None."""
+        details, expires, _ = self._details
+        if details is not None and time.monotonic() < expires:
+            return details
+        return None
+
+    def _salon_details_key(self):
+        return (self.base_regis_booking_api_url, self.salon_id)
+
+    def _apply_salon_details(self, details):
+        """Keep a getsalondetails result and fill services and stylists from it."""
+        self._details = (details, time.monotonic() + self.details_ttl, time.time())
+        self.stale.pop("getsalondetails", None)
+        self._swap(services=details[1], stylists=details[2])
+        self._save_services()
+        self._save_stylists()
+        return details
+
+    def _zenoti_headers(self):
+        return {
+            "Authorization": "apikey " + self.zenoti_api_key,
         }
-        payload = {"salonId": self.salon_id, "siteId": 1}
-        logging.info("Getting Salon Services")
-        request_url = self.base_regis_booking_api_url + "getsalondetails"
-        try:
-            response = requests.post(request_url, json=payload, headers=headers)
-            self.store_services = response.json().get("Services", None)
-        except Exception as error:
-            logging.error("Error Geting Store Services %s", error)
-            return None
-        return self.store_services
 
-    def get_therapists_working(self):
-        if self.pos_type.lower() == "zenoti":
-            params = {"date": self.today_date}
-            headers = {
-                "Authorization": "apikey " + self.zenoti_api_key,
-            }
-            logging.info("Getting Salon Therapists")
-            request_url = self.zenoti_api_url + f"centers/{self.store_id}/therapists"
-            try:
-                response = requests.get(request_url, headers=headers, params=params)
-                self.therapists = response.json().get("therapists", None)
-            except Exception as error:
-                logging.error("Error Geting Store therapists %s", error)
-                return None
-            return self.therapists
-        # Handle a non-zenoti type store
-        headers = {
+    def _booking_headers(self):
+        return {
             "x-api-key": self.regis_api_booking_key,
         }
-        payload = {"salonId": self.salon_id, "siteId": 1}
-        logging.info("Getting Salon Stylists")
-        request_url = self.base_regis_booking_api_url + "getsalondetails"
-        try:
-            response = requests.post(request_url, json=payload, headers=headers)
-            self.therapists = response.json().get("Stylists", None)
-        except Exception as error:
-            logging.error("Error Geting Store Stylists %s", error)
-            return None
-        return self.therapists
 
-    def get_attendance(self, name):
-        for person in self.therapists:
-            # check if the name key is present
-            if person["personal_info"]["name"].lower() == name.lower():
-                employee_id = person["id"]
-        params = {
-            "center_id": self.store_id,
-            "start_date": self.today_date,
-            "end_date": self.today_date,
-        }
-        headers = {
-            "Authorization": "apikey " + self.zenoti_api_key,
-        }
-        logging.info("Getting Therapist Attendance")
-        request_url = self.zenoti_api_url + f"employees/{employee_id}/attendance"
-        try:
-            response = requests.get(request_url, headers=headers, params=params)
-            self.attendance = response.json().get("attendance", None)
-            self.attendance_total = response.json().get("total_records", None)
-        except Exception as error:
-            logging.error("Error Geting Store Therapist Attendance %s", error)
-            return None
-        return self.attendance, self.attendance_total
+    # Requests
+    def _salon_request(self):
+        return ApiRequest(
+            "salon",
+            "Getting Zenoti API Key",
+            "GET",
+            self.base_regis_api_url + "/sis/api/salon?" + self.salon_id,
+            headers={
+                "Authorization": self.regis_api_key,
+            },
+            params={"salon-number": self.salon_id},
+        )
 
-    def find_stylist_by_name(self, stylist_name):
-        for stylist in self.therapists:
-            if "personal_info" in stylist:
-                if (
-                    stylist["personal_info"]["first_name"].lower()
-                    == stylist_name.lower()
-                ):
-                    return stylist
-            else:
-                stylist["name"].lower() == stylist_name.lower()
-                return stylist
-        return None  # If no stylist found with that name
+    def _salon_details_request(self):
+        return ApiRequest(
+            "getsalondetails",
+            "Getting Store Details",
+            "POST",
+            self.base_regis_booking_api_url + "getsalondetails",
+            headers=self._booking_headers(),
+            json={
+                "salonId": self.salon_id,
+                "siteId": "1",
+            },
+            idempotent=True,
+        )
 
-    def find_service_by_name(self, service_name):
-        for service in self.store_services:
-            if "catalog_info" in service:
-                if (
-                    service["catalog_info"]["display_name"].lower()
-                    == service_name.lower()
-                ):
-                    return service
-            else:
-                for category in self.store_services:
-                    for service in category["services"]:
-                        if service["service"] == service_name:
-                            return service["id"]
-                return None
-        return None  # If no service found with that name
+    def _services_request(self, page=1, size=CATALOG_PAGE_SIZE, fields=None):
+        # catalog_info carries the display name, additional_info is never read so it is not expanded
+        expand = "&expand=catalog_info" if fields is None or "name" in fields else ""
+        return ApiRequest(
+            "centers/services",
+            "Getting Salon Services",
+            "GET",
+            self.zenoti_api_url
+            + f"centers/{self.store_id}/services?catalog_enabled=true{expand}&0=us",
+            headers=self._zenoti_headers(),
+            params={"page": page, "size": size},
+        )
 
-    # https://docs.zenoti.com/reference/create-a-service-booking
-    def create_service_booking(self, service, stylist, guest_id=None):
-        """This method expects a service and stylist object.
-        It will return a unique service ID that can be passed to get_booking_slot
-        to get an object containing available booking slots for the combination of an service, stylist, and location.
-        """
+    def _therapists_request(self, page=1, size=CATALOG_PAGE_SIZE, date=None):
+        day = self.today_date if date is None else _as_date(date).isoformat()
+        return ApiRequest(
+            "centers/therapists",
+            "Getting Salon Therapists",
+            "GET",
+            self.zenoti_api_url + f"centers/{self.store_id}/therapists",
+            headers=self._zenoti_headers(),
+            params={"date": day, "page": page, "size": size},
+        )
+
+    # Catalog pages, shared by the iter_services and iter_therapists of both clients
+    def _catalog(self, kind, page_size, fields, date=None):
+        """The request builder, the item list key and the item parser of a catalog. date only applies to therapists."""
+        if kind == "services":
+            request = functools.partial(
+                self._services_request, size=page_size, fields=fields
+            )
+            parse = Service.from_zenoti
+        else:
+            request = functools.partial(
+                self._therapists_request, size=page_size, date=date
+            )
+            parse = Stylist.from_zenoti
+        if fields is None:
+            return request, parse
+        return request, lambda item: parse(item).project(fields)
+
+    @staticmethod
+    def _page_items(kind, page, data):
+        if not isinstance(data, dict) or not isinstance(data.get(kind), list):
+            raise PageError(f"{kind} page {page} could not be fetched")
+        return data[kind]
+
+    def _attendance_request(self, name):
+        person = self.find_stylist_by_name(name)
+        if person is None:
+            logging.error("No therapist named %s", name)
+            return None
+        return self._stylist_attendance_request(person)
+
+    def _stylist_attendance_request(self, stylist, start_date=None, end_date=None):
+        return ApiRequest(
+            "employees/attendance",
+            "Getting Therapist Attendance",
+            "GET",
+            self.zenoti_api_url + f"employees/{stylist.id}/attendance",
+            headers=self._zenoti_headers(),
+            params={
+                "center_id": self.store_id,
+                "start_date": _as_date(start_date).isoformat(),
+                "end_date": _as_date(end_date).isoformat(),
+            },
+            idempotent=True,
+        )
+
+    def _create_booking_request(self, service, stylist, guest_id=None, date=None):
         # This defaults to "next available" if no stylist is defined.
         if not stylist:
-            stylist = {}
-            stylist["personal_info"] = {}
-            stylist["personal_info"]["gender"] = "0"
-            stylist["id"] = ""
-        headers = {
-            "Authorization": "apikey " + self.zenoti_api_key,
-        }
+            stylist = Stylist("", None)
         payload = {
-            "date": self.today_date,
+            "date": _as_date(date).isoformat(),
             "is_only_catalog_employes": True,
             "center_id": self.store_id,
             "guests": [
@@ -266,113 +856,73 @@ class RegisSalon:
                     "id": guest_id,
                     "items": [
                         {
-                            "item": {"id": service["id"]},
+                            "item": {"id": service.id},
                             "therapist": {
-                                "id": stylist["id"],
-                                "Gender": stylist["personal_info"]["gender"],
+                                "id": stylist.id,
+                                "Gender": stylist.gender,
                             },
                         }
                     ],
                 }
             ],
         }
-        logging.info("Getting Service booking_id")
-        request_url = self.zenoti_api_url + "bookings"
-        try:
-            response = requests.post(request_url, json=payload, headers=headers)
-            booking_id = response.json()
-        except Exception as error:
-            logging.error("Error Getting service_id %s", error)
-            return None
-        return booking_id
+        return ApiRequest(
+            "bookings",
+            "Getting Service booking_id",
+            "POST",
+            self.zenoti_api_url + "bookings",
+            headers=self._zenoti_headers(),
+            json=payload,
+        )
 
-    # Take your {booking_id} and GET  https: //api.zenoti.com/v1/bookings/{slot_id}/slots?0=us
-    def get_booking_slot(self, slot_id):
-        slot_id = slot_id["id"]
-        headers = {
-            "Authorization": "apikey " + self.zenoti_api_key,
-        }
-        logging.info("Getting Booking Slot")
-        request_url = self.zenoti_api_url + f"bookings/{slot_id}/slots"
-        try:
-            response = requests.get(request_url, headers=headers)
-            booking_slots = response.json()
-            if len(booking_slots["slots"]) < 1:
-                print("No Booking slots available for the time and stylist requested")
-                booking_slots = 0
-                return {}
-            return booking_slots
-        except Exception as error:
-            logging.error("Error Getting booking_slots %s", error)
-            return None
+    def _booking_slots_request(self, booking_id):
+        return ApiRequest(
+            "bookings/slots",
+            "Getting Booking Slot",
+            "GET",
+            self.zenoti_api_url + f"bookings/{booking_id['id']}/slots",
+            headers=self._zenoti_headers(),
+        )
 
-    # reserve a slot
-    def reserve_selected_slot(self, selected_slot, booking_id):
-        headers = {
-            "Authorization": "apikey " + self.zenoti_api_key,
-        }
-        payload = {"slot_time": selected_slot["Time"]}
-        request_url = self.zenoti_api_url + f"bookings/{booking_id['id']}/slots/reserve"
-        logging.info("Trying to reserve your slot")
-        try:
-            response = requests.post(request_url, json=payload, headers=headers)
-            response = response.json()
-        except Exception as error:
-            logging.error("Error Reserving Slot %s", error)
-            return None
-        return response
+    def _reserve_slot_request(self, selected_slot, booking_id):
+        return ApiRequest(
+            "bookings/slots/reserve",
+            "Trying to reserve your slot",
+            "POST",
+            self.zenoti_api_url + f"bookings/{booking_id['id']}/slots/reserve",
+            headers=self._zenoti_headers(),
+            json={"slot_time": selected_slot.time},
+        )
 
-    # Confirm your slot
-    def confirm_selected_slot(self, booking_id):
-        headers = {
-            "Authorization": "apikey " + self.zenoti_api_key,
-        }
-        payload = {
-            "notes": "",
-            "group_name": "",
-        }
-        request_url = self.zenoti_api_url + f"bookings/{booking_id['id']}/slots/confirm"
-        logging.info("Trying to confirm your slot")
-        try:
-            response = requests.post(request_url, json=payload, headers=headers)
-            response = response.json()
-        except Exception as error:
-            logging.error("Error Confirming Slot %s", error)
-            return None
-        return response
+    def _confirm_slot_request(self, booking_id):
+        return ApiRequest(
+            "bookings/slots/confirm",
+            "Trying to confirm your slot",
+            "POST",
+            self.zenoti_api_url + f"bookings/{booking_id['id']}/slots/confirm",
+            headers=self._zenoti_headers(),
+            json={
+                "notes": "",
+                "group_name": "",
+            },
+        )
 
-    # retrive guest details to get a guest ID or create a new one
-    # https://docs.zenoti.com/reference/search-for-a-guest
-    def retrive_guest_detail(self, first_name=None, last_name=None, phone=None):
-        params = {
-            "center_id": self.store_id,
-            "first_name": first_name,
-            "last_name": last_name,
-            "phone": phone,
-        }
-        headers = {
-            "Authorization": "apikey " + self.zenoti_api_key,
-        }
-        logging.info("Retriving Guest Detail")
-        request_url = self.zenoti_api_url + "guests/search"
-        try:
-            response = requests.get(request_url, headers=headers, params=params)
-            guest = response.json()
-            if len(guest["guests"]) < 1:
-                print("No guest records returned")
-                return {}
-            return guest["guests"][
-                -1
-            ]  # Sometimes guests have multiple records so just return the latest one
-        except Exception as error:
-            logging.error("Error Getting Guest Detail %s", error)
-            return None
+    def _guest_search_request(self, first_name=None, last_name=None, phone=None):
+        return ApiRequest(
+            "guests/search",
+            "Retriving Guest Detail",
+            "GET",
+            self.zenoti_api_url + "guests/search",
+            headers=self._zenoti_headers(),
+            params={
+                "center_id": self.store_id,
+                "first_name": first_name,
+                "last_name": last_name,
+                "phone": phone,
+            },
+        )
 
-    # Create a user account
-    def create_account(self, first_name, last_name, phone_number):
-        headers = {
-            "Authorization": "apikey " + self.zenoti_api_key,
-        }
+    def _create_account_request(self, first_name, last_name, phone_number):
         payload = {
             "center_id": self.store_id,
             "personal_info": {
@@ -392,81 +942,957 @@ class RegisSalon:
                 "receive_marketing_sms": False,  # more spam
             },
         }
-        request_url = self.zenoti_api_url + "guests"
-        logging.info("Trying to Create an account")
-        try:
-            response = requests.post(request_url, json=payload, headers=headers)
-            account = response.json()
-        except Exception as error:
-            logging.error("Creating Account %s", error)
-            return None
-        return account
+        return ApiRequest(
+            "guests",
+            "Trying to Create an account",
+            "POST",
+            self.zenoti_api_url + "guests",
+            headers=self._zenoti_headers(),
+            json=payload,
+        )
 
-    # Check appointments for user
-    def get_appointments(self, guest_id, start_date=None, end_date=None):
+    def _appointments_request(self, guest_id, start_date=None, end_date=None):
         if start_date is None:
             start_date = self.today_date
         if end_date is None:
             end_date = self.today_date
-        params = {
-            "start_date": start_date,
-            "end_date": end_date,
-        }
-        headers = {
-            "Authorization": "apikey " + self.zenoti_api_key,
-        }
-        logging.info("Retriving Guest Appointments")
-        request_url = self.zenoti_api_url + f"guests/{guest_id}/appointments"
-        try:
-            response = requests.get(request_url, headers=headers, params=params)
-            appointments = response.json()
-            if len(appointments["appointments"]) < 1:
-                # print("No guest appointments returned")
-                return {}
-            return appointments["appointments"]
-        except Exception as error:
-            logging.error("Error Getting Guest Appointments %s", error)
-            return None
+        return ApiRequest(
+            "guests/appointments",
+            "Retriving Guest Appointments",
+            "GET",
+            self.zenoti_api_url + f"guests/{guest_id}/appointments",
+            headers=self._zenoti_headers(),
+            params={
+                "start_date": start_date,
+                "end_date": end_date,
+            },
+        )
 
-    # cancel appointsments for user
-    def cancel_appointment(self, invoice_id):
-        headers = {
-            "Authorization": "apikey " + self.zenoti_api_key,
-        }
-        payload = {
-            "comments": "Cannot Attend",
-        }
-        logging.info("Cancelling Appointment")
-        request_url = self.zenoti_api_url + f"invoices/{invoice_id}/cancel"
-        try:
-            response = requests.put(request_url, headers=headers, json=payload)
-            response = response.json()
-            return response
-        except Exception as error:
-            logging.error("Error Cancelling Appointment %s", error)
-            return None
+    def _cancel_appointment_request(self, invoice_id):
+        return ApiRequest(
+            "invoices/cancel",
+            "Cancelling Appointment",
+            "PUT",
+            self.zenoti_api_url + f"invoices/{invoice_id}/cancel",
+            headers=self._zenoti_headers(),
+            json={
+                "comments": "Cannot Attend",
+            },
+        )
 
-    # for the service you want, who's availble?
-    def get_availability_of_salon(self, serviceid: str):
-        # Handle a non-zenoti type store
-        headers = {
-            "x-api-key": self.regis_api_booking_key,
-        }
+    def _availability_request(self, serviceid, date=None):
+        return ApiRequest(
+            "getavailabilityofsalon",
+            "Getting Salon Availability",
+            "POST",
+            self.base_regis_booking_api_url + "getavailabilityofsalon",
+            headers=self._booking_headers(),
+            json={
+                "salonId": self.salon_id,
+                "serviceIds": serviceid,
+                "siteId": "1",
+                "date": _as_date(date).strftime("%Y%m%d"),
+            },
+            idempotent=True,
+        )
+
+    def _add_check_in_request(
+        self,
+        firstname,
+        lastname,
+        phonenumber,
+        serviceid,
+        services,
+        stylistid,
+        stylistname,
+        time,
+        emailaddress,
+    ):
+        device_uuid = "SC-W-" + self.device_uuid_str
         payload = {
-            "salonId": self.salon_id,
-            "serviceIds": serviceid,
+            "firstName": firstname,
+            "lastName": lastname,
+            "phoneNumber": phonenumber,
+            "salonId": int(self.salon_id),
+            "serviceId": serviceid,
+            "services": services,
             "siteId": "1",
-            "date": datetime.now().strftime("%Y%m%d"),
+            "source": "SCWEB",
+            "sourceId": device_uuid,
+            "storeAddress": self.storeaddress,
+            "storeName": self.storename,
+            "storePhone": self.storephone,
+            "stylistId": str(stylistid),
+            "stylistName": stylistname,
+            "time": time,
+            "date": int(date.today().strftime("%Y%m%d")),
+            "profileId": None,
+            "emailAddress": emailaddress,
+            "gender": 0,
         }
-        logging.info("Getting Salon Availability")
-        request_url = self.base_regis_booking_api_url + "getavailabilityofsalon"
+        return ApiRequest(
+            "addcheckin",
+            "Checking in",
+            "POST",
+            self.base_regis_booking_api_url + "addcheckin",
+            headers=self._booking_headers(),
+            json=payload,
+        )
+
+    def _check_in_by_source_request(self):
+        return ApiRequest(
+            "getcheckinbysource",
+            "Getting Checkins",
+            "POST",
+            self.base_regis_booking_api_url + "getcheckinbysource",
+            headers=self._booking_headers(),
+            json={
+                "sourceId": "SC-W-" + self.device_uuid_str,
+                "profileId": None,
+            },
+            idempotent=True,
+        )
+
+    def _cancel_checkin_request(self, checkinid):
+        return ApiRequest(
+            "cancelcheckin",
+            "Cancelling checkin",
+            "POST",
+            self.base_regis_booking_api_url + "cancelcheckin",
+            headers=self._booking_headers(),
+            json={
+                "checkinId": checkinid,
+            },
+        )
+
+    # Parsers, each one is handed the decoded body of its request
+    def _parse_salon(self, data):
+        return Salon.from_sis(self.salon_id, data)
+
+    @staticmethod
+    def _parse_salon_details(details):
+        return (
+            details["Salon"],
+            services_from_regis(details.get("Services", None)),
+            [Stylist.from_regis(stylist) for stylist in details.get("Stylists") or []],
+        )
+
+    def _apply_services(self, services):
+        services = self._swap(services=services).services
+        self._save_services()
+        return services
+
+    def _apply_therapists(self, stylists):
+        stylists = self._swap(stylists=stylists).stylists
+        self._save_stylists()
+        return stylists
+
+    def _parse_attendance(self, data):
+        attendance = data.get("attendance", None)
+        if attendance is not None:
+            attendance = tuple(attendance)
+        # The last answer is kept as one tuple so a reader never pairs records with another answer's total
+        self._attendance = (attendance, data.get("total_records", None))
+        return self._attendance
+
+    @staticmethod
+    def _parse_attendance_records(data):
+        # An error answer has no attendance at all, let it fail the lookup
+        return data["attendance"] or []
+
+    def _parse_booking_slots(self, data):
+        booking_slots = tuple(
+            Slot.from_zenoti(slot, salon_id=self.salon_id) for slot in data["slots"]
+        )
+        if len(booking_slots) < 1:
+            print("No Booking slots available for the time and stylist requested")
+        return booking_slots
+
+    @staticmethod
+    def _parse_guest(data):
+        if len(data["guests"]) < 1:
+            print("No guest records returned")
+            return {}
+        # Sometimes guests have multiple records so just return the latest one
+        return data["guests"][-1]
+
+    @staticmethod
+    def _parse_appointments(data):
+        if len(data["appointments"]) < 1:
+            # print("No guest appointments returned")
+            return {}
+        return data["appointments"]
+
+    def _parse_availability(self, data):
+        self.availability = tuple(slots_from_regis_availability(data, self.salon_id))
+        return self.availability
+
+    @staticmethod
+    def _parse_check_ins(data):
+        return [CheckIn.from_regis(checkin) for checkin in data]
+
+
+class RegisSalon(SalonBase):
+    def __init__(
+        self,
+        salon_id,
+        regis_api_key,
+        regis_boking_api_key,
+        transport=None,
+        prewarm=False,
+        details_ttl=SALON_DETAILS_TTL,
+        cache=None,
+        store=None,
+        device_uuid=None,
+    ):
+        """
+        Initialize a new Salon instance with specific salon ID and Regis API key.
+
+        Args:
+            salon_id (str): The unique identifier for a specific salon.
+            regis_api_key (str): API key used for authorization with Regis properties' services.
+            regis_boking_api_key (str): API key used for the api-booking Regis service.
+            transport (Transport): Pooled HTTP transport. Pass the same instance to many salons to share keep-alive connections.
+            prewarm (bool): Open connections to the Regis and Zenoti hosts up front.
+            details_ttl (int): Seconds a getsalondetails result is reused for non-Zenoti salons.
+            cache (DiskCache): Persistent cache for the salon metadata (Zenoti API key included), services and stylists. Share one between salons and processes.
+            store (SalonStore): Keeps a queryable SQLite copy of the salon, its catalogs and the slots scanned or found.
+            device_uuid (str): The device id check-ins are sent with. Defaults to the one in the device_uuid file, created in the working directory if missing.
+
+        This method initializes the Salon instance with the provided salon ID and Regis API key. It also sets default values for various instance properties such as API URLs, store ID, POS type, available services, and the current date.
+        """
+        super().__init__(
+            salon_id,
+            regis_api_key,
+            regis_boking_api_key,
+            details_ttl,
+            cache,
+            store,
+            device_uuid,
+        )
+        self.transport = transport or Transport()
+        for url in self.hosts:
+            self.transport.mount(url)
+        if prewarm:
+            self.transport.prewarm(self.hosts)
+
+    @property
+    def instrumentation(self):
+        """
+        The Instrumentation of this salon's transport. Attach observers (e.g. instrumentation.Metrics) to it.
+
+        Every salon sharing the transport reports to the same observers.
+        """
+        return self.transport.instrumentation
+
+    def _call(self, request, parse=None):
+        """
+        Send a request and return its parsed body.
+
+        When a read request fails (or its circuit breaker is open) the last good response is returned instead,
+        its endpoint is listed in self.stale with the time it was fetched, and a background probe refreshes it.
+
+        Returns:
+            The parsed body (the decoded JSON if there is no parser), otherwise None if the request or the parsing failed.
+        """
+        logging.info(request.description)
+        try:
+            data = self.transport.send(request)
+            return self._remember_good(request, parse(data) if parse else data)
+        except Exception as error:
+            logging.error("Error %s %s", request.description, error)
+            stale = self._serve_stale(request)
+            if stale is not None:
+                self._revalidate(request, parse)
+            return stale
+
+    def _revalidate(self, request, parse):
+        """Refresh a stale response in a background thread, once the endpoint's breaker lets a probe through."""
+        key = request.key()
+        with _revalidate_lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+        threading.Thread(
+            target=self._probe, args=(request, parse, key), daemon=True
+        ).start()
+
+    def _probe(self, request, parse, key):
         try:
-            response = requests.post(request_url, json=payload, headers=headers)
-            self.availability = response.json()
+            time.sleep(self._breaker_retry_in(request))
+            data = self.transport.send(request)
+            self._remember_good(request, parse(data) if parse else data)
         except Exception as error:
-            logging.error("Error Geting Store availability %s", error)
+            logging.info(
+                "Background refresh of %s failed %s", request.description, error
+            )
+        finally:
+            with _revalidate_lock:
+                self._revalidating.discard(key)
+
+    def get_salon(self, refresh=False):
+        """
+        Retrieve salon information using its unique identifier and set essential details.
+
+        This method makes an API request to retrieve salon information, including the Zenoti API key, store ID, and POS type, using the salon's unique identifier.
+        With a cache, the request is skipped while the cached salon is fresh.
+
+        Args:
+            refresh (bool): Ignore the cache and fetch the salon again.
+
+        Returns:
+            tuple: A tuple containing the Zenoti API key, store ID, and POS type if the request is successful, otherwise None.
+        """
+        salon = None if refresh else self._cached_salon()
+        if salon is None:
+            salon = self._call(self._salon_request(), self._parse_salon)
+            if salon is None:
+                return None
+            # Get some additonal info if this is a differnet POS system
+            if not salon.is_zenoti:
+                try:
+                    salon = salon.with_booking(self._salon_details(refresh)[0])
+                except Exception as error:
+                    logging.error("Error Store Details %s", error)
+                    return None
+            self._save_salon(salon)
+        self.salon = salon
+        return self.zenoti_api_key, self.store_id, self.pos_type
+
+    def get_salon_services(self, refresh=False):
+        """
+        Retrieve salon services
+
+        Args:
+            refresh (bool): Ignore the cache and fetch the services again.
+
+        Returns:
+            list[Service]: The services the salon offers, otherwise None.
+        """
+        if not refresh and self._cached_services() is not None:
+            return self.store_services
+        try:
+            if self.salon.is_zenoti:
+                return self._apply_services(list(self.iter_services()))
+            # Handle a non-zenoti type store
+            self._salon_details(refresh)
+        except Exception as error:
+            logging.error("Error Geting Store Services %s", error)
             return None
-        return self.availability
+        return self.store_services
+
+    def iter_services(self, page_size=CATALOG_PAGE_SIZE, fields=None, prefetch=True):
+        """
+        Yield the salon's services page by page, fetching the next page in the background while one is consumed.
+
+        Only one page of the raw catalog is held at a time. Non-Zenoti salons have a single catalog, it is yielded as is.
+
+        Args:
+            page_size (int): Services per request.
+            fields (iterable): Only keep these Service fields, e.g. ("name", "duration"). The others are None and
+                the expansions they need are not requested.
+            prefetch (bool): Request the next page before the current one is consumed.
+
+        Raises:
+            PageError: A page could not be fetched, so the catalog would be incomplete.
+        """
+        if not self.salon.is_zenoti:
+            for service in self.store_services or self.get_salon_services() or []:
+                yield service if fields is None else service.project(fields)
+            return
+        yield from self._pages("services", page_size, fields, prefetch)
+
+    def iter_therapists(
+        self, page_size=CATALOG_PAGE_SIZE, fields=None, prefetch=True, date=None
+    ):
+        """
+        Yield the stylists working today page by page, like iter_services.
+
+        date (a datetime.date or YYYY-MM-DD) asks for another day's Zenoti therapists. Non-Zenoti salons have one list.
+        """
+        if not self.salon.is_zenoti:
+            for stylist in self.therapists or self.get_therapists_working() or []:
+                yield stylist if fields is None else stylist.project(fields)
+            return
+        yield from self._pages("therapists", page_size, fields, prefetch, date)
+
+    def _pages(self, kind, page_size, fields, prefetch, date=None):
+        request, parse = self._catalog(kind, page_size, fields, date)
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        try:
+            page = 1
+            data = self._call(request(page))
+            while True:
+                items = self._page_items(kind, page, data)
+                following = None
+                if _has_more(data, page, page_size, len(items)):
+                    following = page + 1
+                    if executor is not None:
+                        data = executor.submit(
+                            contextvars.copy_context().run,
+                            self._call,
+                            request(following),
+                        )
+                for item in items:
+                    yield parse(item)
+                if following is None:
+                    return
+                page = following
+                data = (
+                    data.result() if executor is not None else self._call(request(page))
+                )
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_therapists_working(self, refresh=False):
+        """
+        Retrieve the stylists working at the salon today
+
+        Args:
+            refresh (bool): Ignore the cache and fetch the stylists again.
+
+        Returns:
+            list[Stylist]: The stylists working today, otherwise None.
+        """
+        if not refresh and self._cached_stylists() is not None:
+            return self.therapists
+        try:
+            if self.salon.is_zenoti:
+                return self._apply_therapists(list(self.iter_therapists()))
+            # Handle a non-zenoti type store
+            self._salon_details(refresh)
+        except Exception as error:
+            logging.error("Error Geting Store Stylists %s", error)
+            return None
+        return self.therapists
+
+    def _salon_details(self, refresh=False):
+        """
+        Return the getsalondetails result of a non-Zenoti salon, fetching it at most once per details_ttl.
+
+        A fetch fills store_services and therapists together, so get_salon, get_salon_services and
+        get_therapists_working share one round trip. Concurrent fetches for the same salon (from any
+        RegisSalon instance) share one in-flight request.
+
+        Returns:
+            tuple: The getsalondetails "Salon" object, the services and the stylists.
+        """
+        details = None if refresh else self._cached_salon_details()
+        if details is not None:
+            return details
+        try:
+            details = _salon_details_flights.do(
+                self._salon_details_key(), self._fetch_salon_details
+            )
+        except Exception as error:
+            return self._serve_stale_details(error)
+        return self._apply_salon_details(details)
+
+    def _fetch_salon_details(self):
+        request = self._salon_details_request()
+        logging.info(request.description)
+        return self._parse_salon_details(self.transport.send(request))
+
+    def get_attendance(self, name):
+        request = self._attendance_request(name)
+        if request is None:
+            return None
+        return self._call(request, self._parse_attendance)
+
+    def get_schedule(
+        self, start=None, days=1, concurrency=SCAN_CONCURRENCY, refresh=False
+    ):
+        """
+        Fetch the attendance of every therapist of a Zenoti salon over a range of days, concurrently.
+
+        The therapists are those working on any day of the range: today's, plus the centers/therapists list of
+        every other day. Schedules without failed lookups are cached for SCHEDULE_TTL seconds, until the date rolls over.
+
+        Args:
+            start (date or str): The first day, a datetime.date or YYYY-MM-DD. Defaults to today.
+            days (int): Number of days from start.
+            concurrency (int): Maximum attendance requests in flight.
+            refresh (bool): Ignore a cached schedule.
+
+        Returns:
+            SalonSchedule: Every therapist's records per day. errors lists the therapists whose attendance lookup
+                failed, and the days (YYYY-MM-DD) whose therapists could not be fetched.
+                None for non-Zenoti salons or when today's therapists could not be fetched.
+        """
+        if self.salon is None:
+            self.get_salon()
+        if not self._can_schedule():
+            return None
+        if not self.therapists and self.get_therapists_working() is None:
+            return None
+        first, last = self._schedule_range(start, days)
+        schedule = None if refresh else self._cached_schedule(first, last)
+        if schedule is not None:
+            return schedule
+        days = self._roster_days(first, last)
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._day_roster, day)
+                for day in days
+            ]
+            rosters = [(day, future.result()) for day, future in zip(days, futures)]
+            stylists = self._schedule_roster(first, last, rosters)
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run,
+                    self._call,
+                    self._stylist_attendance_request(stylist, first, last),
+                    self._parse_attendance_records,
+                )
+                for stylist in stylists
+            ]
+            attendance = [
+                (stylist, future.result()) for stylist, future in zip(stylists, futures)
+            ]
+        return self._finish_schedule(
+            self._new_schedule(first, last, rosters), first, last, attendance
+        )
+
+    def _day_roster(self, day):
+        """The therapists working on day, otherwise None if a page could not be fetched."""
+        try:
+            return list(self.iter_therapists(prefetch=False, date=day))
+        except PageError as error:
+            logging.error("Error Geting Store Stylists %s %s", day, error)
+            return None
+
+    # https://docs.zenoti.com/reference/create-a-service-booking
+    def create_service_booking(self, service, stylist, guest_id=None, date=None):
+        """This method expects a Service and Stylist object.
+        It will return a unique service ID that can be passed to get_booking_slot
+        to get an object containing available booking slots for the combination of an service, stylist, and location.
+        The booking is for today unless date (a datetime.date or YYYY-MM-DD) is given.
+        """
+        return self._check_guest_call(
+            guest_id,
+            self._call(self._create_booking_request(service, stylist, guest_id, date)),
+        )
+
+    # Take your {booking_id} and GET  https: //api.zenoti.com/v1/bookings/{slot_id}/slots?0=us
+    def get_booking_slot(self, slot_id):
+        """
+        Returns the open slots (list[Slot]) for a booking created by create_service_booking.
+
+        These are not recorded in the store, a booking id does not say which service, stylist and day it is for.
+        scan_availability, find_slots and watch record theirs.
+        """
+        return self._call(
+            self._booking_slots_request(slot_id), self._parse_booking_slots
+        )
+
+    # reserve a slot
+    def reserve_selected_slot(self, selected_slot, booking_id):
+        return self._call(self._reserve_slot_request(selected_slot, booking_id))
+
+    # Confirm your slot
+    def confirm_selected_slot(self, booking_id):
+        return self._call(self._confirm_slot_request(booking_id))
+
+    def book(
+        self,
+        service,
+        stylist=None,
+        first_name=None,
+        last_name=None,
+        phone=None,
+        choose=None,
+        dry_run=False,
+        deadline=None,
+    ):
+        """
+        Book a Zenoti appointment in one call: resolve the guest, find the open slots, reserve and confirm one.
+
+        With a cached guest id a single booking carries the guest from the start and is reused for the slots,
+        the reservation and the confirmation. Otherwise the guest lookup and its booking run alongside slot
+        discovery on a guestless booking, and the slot is reserved on the guest's booking.
+
+        Args:
+            service (Service): The service to book.
+            stylist (Stylist): The stylist, None for the next available one.
+            choose (callable): Picks the Slot to book from the open slots, or returns None to stop. Defaults to the earliest slot.
+            dry_run (bool): Stop once the slot is chosen, without reserving it.
+            deadline (float): Seconds the whole booking may take. Requests that would start later fail with DeadlineExceeded.
+
+        Returns:
+            BookingResult: What was booked or the stage that failed, with the seconds each stage took in timings.
+        """
+        if deadline is not None:
+            with Deadline(deadline):
+                return self.book(
+                    service, stylist, first_name, last_name, phone, choose, dry_run
+                )
+        result = BookingResult()
+        timings = result.timings
+        start = time.perf_counter()
+        guest_id = self._cached_guest_id(
+            self._guest_cache_key(first_name, last_name, phone)
+        )
+        if guest_id is not None:
+            booking = _timed(
+                timings,
+                "booking",
+                self.create_service_booking,
+                service,
+                stylist,
+                guest_id,
+            )
+            slots = (
+                _timed(timings, "slots", self.get_booking_slot, booking)
+                if _booking_id(booking)
+                else None
+            )
+        else:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                # The worker inherits the caller's Deadline through its context
+                guest = executor.submit(
+                    contextvars.copy_context().run,
+                    self._guest_booking,
+                    timings,
+                    service,
+                    stylist,
+                    first_name,
+                    last_name,
+                    phone,
+                )
+                slots = _timed(timings, "slots", self._discover_slots, service, stylist)
+                guest_id, booking = guest.result()
+        if (
+            self._start_booking(result, guest_id, booking, slots, choose)
+            and not dry_run
+        ):
+            reserved = _timed(
+                timings, "reserve", self.reserve_selected_slot, result.slot, booking
+            )
+            confirmed = None
+            if (reserved or {}).get("is_reserved"):
+                confirmed = _timed(
+                    timings, "confirm", self.confirm_selected_slot, booking
+                )
+            self._finish_booking(result, reserved, confirmed)
+        timings["total"] = time.perf_counter() - start
+        return result
+
+    def _guest_booking(self, timings, service, stylist, first_name, last_name, phone):
+        guest_id = _timed(
+            timings, "guest", self.resolve_guest, first_name, last_name, phone
+        )
+        if guest_id is None:
+            return None, None
+        return guest_id, _timed(
+            timings, "booking", self.create_service_booking, service, stylist, guest_id
+        )
+
+    def _discover_slots(self, service, stylist):
+        booking = self.create_service_booking(service, stylist)
+        return self.get_booking_slot(booking) if _booking_id(booking) else None
+
+    # retrive guest details to get a guest ID or create a new one
+    # https://docs.zenoti.com/reference/search-for-a-guest
+    def retrive_guest_detail(self, first_name=None, last_name=None, phone=None):
+        return self._call(
+            self._guest_search_request(first_name, last_name, phone),
+            self._parse_guest,
+        )
+
+    def resolve_guest(self, first_name, last_name, phone, create=True, refresh=False):
+        """
+        Return the Zenoti guest id of a person, searching for it (and creating the account) only the first time.
+
+        Resolved ids are kept per center, phone number and name, in memory and in the DiskCache if there is one.
+        An id is forgotten when a booking or appointment lookup made with it fails.
+
+        Args:
+            create (bool): Create an account when the search finds no guest.
+            refresh (bool): Ignore the cached id and search again.
+
+        Returns:
+            str: The guest id, otherwise None if the search (or the account creation) failed.
+        """
+        key = self._guest_cache_key(first_name, last_name, phone)
+        guest_id = None if refresh else self._cached_guest_id(key)
+        if guest_id is not None:
+            return guest_id
+        guest = self.retrive_guest_detail(
+            first_name=first_name, last_name=last_name, phone=phone
+        )
+        # An empty result means no such guest, None means the search itself failed
+        if guest == {} and create:
+            logging.info("No guest record found, creating an account")
+            guest = self.create_account(first_name, last_name, phone)
+        if not guest or not guest.get("id"):
+            return None
+        return self._remember_guest(key, guest["id"])
+
+    # Create a user account
+    def create_account(self, first_name, last_name, phone_number):
+        return self._call(
+            self._create_account_request(first_name, last_name, phone_number)
+        )
+
+    # Check appointments for user
+    def get_appointments(self, guest_id, start_date=None, end_date=None):
+        return self._check_guest_call(
+            guest_id,
+            self._call(
+                self._appointments_request(guest_id, start_date, end_date),
+                self._parse_appointments,
+            ),
+        )
+
+    # cancel appointsments for user
+    def cancel_appointment(self, invoice_id):
+        return self._call(self._cancel_appointment_request(invoice_id))
+
+    # for the service you want, who's availble?
+    def get_availability_of_salon(self, serviceid: str, date=None):
+        """Returns the open slots (list[Slot]) for every stylist of a non-Zenoti salon, today unless date is given."""
+        # Handle a non-zenoti type store
+        return self._save_slots(
+            serviceid,
+            None,
+            _as_date(date),
+            self._call(
+                self._availability_request(serviceid, date), self._parse_availability
+            ),
+        )
+
+    def scan_availability(
+        self, services, start=None, days=7, stylist=None, refresh=False
+    ):
+        """
+        Open slots of one or more services over a range of days, every day fetched concurrently.
+
+        Each day's slots are cached per salon, service, stylist and date (see availability_cache) for
+        cache.AVAILABILITY_TTL seconds, and the whole cache is dropped when the date rolls over.
+
+        Args:
+            services (Service or list[Service]): The services to look up.
+            start (date or str): The first day, a datetime.date or YYYY-MM-DD. Defaults to today.
+            days (int): Number of days from start.
+            stylist (Stylist): Only this stylist's slots, None for every stylist.
+            refresh (bool): Ignore cached days.
+
+        Returns:
+            list[SalonAvailability]: One per day and service, ordered by day then service, with date set to YYYY-MM-DD.
+                A day that could not be fetched has an error and no slots.
+        """
+        if self.salon is None:
+            self.get_salon()
+        results = {}
+        missing = []
+        for day, service in self._scan_jobs(services, start, days):
+            cached = None if refresh else self._cached_day(service, stylist, day)
+            results[(day, service.id)] = cached
+            if cached is None:
+                missing.append((day, service))
+        if missing:
+            with ThreadPoolExecutor(
+                max_workers=min(SCAN_CONCURRENCY, len(missing))
+            ) as executor:
+                futures = {
+                    (day, service.id): executor.submit(
+                        contextvars.copy_context().run,
+                        self._scan_day,
+                        service,
+                        stylist,
+                        day,
+                    )
+                    for day, service in missing
+                }
+                for key, future in futures.items():
+                    results[key] = future.result()
+        return list(results.values())
+
+    def day_availability(self, service, stylist=None, date=None):
+        """
+        Open slots of a service on one day, always fetched and then cached for scan_availability.
+
+        Args:
+            service (Service): The service to look up.
+            stylist (Stylist): Only this stylist's slots, None for every stylist.
+            date (date or str): The day, a datetime.date or YYYY-MM-DD. Defaults to today.
+
+        Returns:
+            SalonAvailability: The day's slots with date set to YYYY-MM-DD, or an error and no slots.
+        """
+        if self.salon is None:
+            self.get_salon()
+        return self._scan_day(service, stylist, _as_date(date))
+
+    def watch(
+        self,
+        service,
+        stylist=None,
+        date=None,
+        targets=(),
+        interval=DEFAULT_INTERVAL,
+        min_interval=DEFAULT_MIN_INTERVAL,
+        max_interval=DEFAULT_MAX_INTERVAL,
+        polls=None,
+        stop=None,
+    ):
+        """
+        Poll the open slots of a service and yield only what changed, e.g. to catch a cancellation.
+
+        Polling is fastest within an hour before a target time, and backs off towards max_interval while nothing
+        changes. An answer identical to the previous one is not parsed. Zenoti salons reuse one booking for
+        every poll and only create a new one when it fails or the date rolls over.
+
+        Args:
+            service (Service): The service to watch.
+            stylist (Stylist): Only this stylist's slots, None for every stylist.
+            date (date or str): The day to watch, today (following midnight) if None.
+            targets (iterable): Times of day you hope to book, "HH:MM".
+            interval (float): Seconds between polls after a change.
+            min_interval (float): Seconds between polls near a target time.
+            max_interval (float): Longest wait between polls.
+            polls (int): Stop after this many polls, None to poll until stop is set or the generator is closed.
+            stop (threading.Event): Stops the watch, waking it up from its wait.
+
+        Yields:
+            SlotChanges: The added and removed slots, the first one lists every open slot as added.
+        """
+        if self.salon is None:
+            self.get_salon()
+        zenoti = self.salon is not None and self.salon.is_zenoti
+        schedule = PollSchedule(
+            interval,
+            min_interval,
+            max_interval,
+            targets,
+            day=None if date is None else _as_date(date),
+        )
+        diff = SlotDiff(
+            self._parse_stylist_slots(stylist)
+            if zenoti
+            else self._parse_day_availability(stylist)
+        )
+        booking = booked_for = None
+        while polls is None or diff.polls < polls:
+            day = _as_date(date)
+            if zenoti:
+                if booking is None or booked_for != day:
+                    booking = self.create_service_booking(service, stylist, date=day)
+                    booked_for = day
+                answer = (
+                    self._call(self._booking_slots_request(booking))
+                    if _booking_id(booking)
+                    else None
+                )
+                if not isinstance(answer, dict) or "slots" not in answer:
+                    booking = answer = None
+            else:
+                answer = self._call(self._availability_request(str(service.id), day))
+            changes = diff.update(answer)
+            if changes is not None:
+                self._save_slots(service, stylist, day, changes.slots)
+                yield changes
+            if polls is not None and diff.polls >= polls:
+                return
+            if sleep(schedule.next_delay(changes is not None), stop):
+                return
+
+    def find_slots(
+        self, service, stylists=None, date=None, concurrency=SCAN_CONCURRENCY
+    ):
+        """
+        Open slots of a service with every stylist able to perform it, one stylist per booking, concurrently.
+
+        Stylists the eligibility matrix rules out are never asked. A stylist the API refuses for the service
+        is excluded from the matrix, and remembered for the day in the DiskCache. Regis booking salons
+        answer for every stylist with a single getavailabilityofsalon request.
+
+        Args:
+            service (Service): The service to look up.
+            stylists (list[Stylist]): The stylists to consider. Defaults to every therapist working.
+            date (date or str): The day, a datetime.date or YYYY-MM-DD. Defaults to today.
+            concurrency (int): Maximum stylists asked at the same time.
+
+        Returns:
+            SalonAvailability: The slots of every eligible stylist earliest first, each Slot carrying its stylist.
+        """
+        day = _as_date(date)
+        if self.salon is None and self.get_salon() is None:
+            return SalonAvailability(
+                self.salon_id, service, error="salon lookup failed"
+            )
+        if not self.therapists and self.get_therapists_working() is None:
+            return SalonAvailability(
+                self.salon_id, service, error="stylists lookup failed"
+            )
+        if not self.salon.is_zenoti:
+            slots = self._call(
+                self._availability_request(str(service.id), day),
+                self._parse_day_availability(None),
+            )
+            slots = self._eligible_slots(service, stylists, slots)
+            return self._found_slots(
+                service,
+                day,
+                [(None, slots)],
+                self._eligible_scope(service, stylists, slots),
+            )
+        candidates = self.eligibility.eligible(service, stylists)
+        if not candidates:
+            return self._found_slots(service, day, [])
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(concurrency, len(candidates)))
+        ) as executor:
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run,
+                    self._stylist_slots,
+                    service,
+                    stylist,
+                    day,
+                )
+                for stylist in candidates
+            ]
+            answers = [
+                (stylist, future.result())
+                for stylist, future in zip(candidates, futures)
+            ]
+        return self._found_slots(service, day, answers)
+
+    def _stylist_slots(self, service, stylist, day):
+        request = self._stylist_booking_request(service, stylist, day)
+        logging.info(request.description)
+        try:
+            booking = self.transport.send(request)
+        except Exception as error:
+            if self._refused(error, stylist, service):
+                return ()
+            logging.error("Error %s %s", request.description, error)
+            return None
+        if not _booking_id(booking):
+            return None
+        return self._call(
+            self._booking_slots_request(booking), self._parse_stylist_slots(stylist)
+        )
+
+    def _scan_day(self, service, stylist, day):
+        if self.salon is not None and self.salon.is_zenoti:
+            booking = self.create_service_booking(service, stylist, date=day)
+            slots = (
+                self._call(
+                    self._booking_slots_request(booking),
+                    self._parse_stylist_slots(stylist),
+                )
+                if _booking_id(booking)
+                else None
+            )
+        else:
+            slots = self._call(
+                self._availability_request(str(service.id), day),
+                self._parse_day_availability(stylist),
+            )
+        return self._fetched_day(service, stylist, day, slots)
 
     def add_check_in(
         self,
@@ -497,8 +1923,7 @@ class RegisSalon:
             emailaddress (str): The email address of the customer.
 
         Returns:
-            checkin_reuslt[Dict[]]: A dict containning the results of the checkin.
-            checkin_id(str): A strin containing a unique checkin_id.
+            CheckIn: The check-in, with its unique id and the apiResult of the request.
 
 
         Raises:
@@ -506,60 +1931,22 @@ class RegisSalon:
 
         This function sends a request to the salon's booking system to add a check-in with the provided details.
         """
-        device_uuid = "SC-W-" + self.device_uuid_str
-        headers = {
-            "x-api-key": self.regis_api_booking_key,
-        }
-        payload = {
-            "firstName": firstname,
-            "lastName": lastname,
-            "phoneNumber": phonenumber,
-            "salonId": int(self.salon_id),
-            "serviceId": serviceid,
-            "services": services,
-            "siteId": "1",
-            "source": "SCWEB",
-            "sourceId": device_uuid,
-            "storeAddress": self.storeaddress,
-            "storeName": self.storename,
-            "storePhone": self.storephone,
-            "stylistId": str(stylistid),
-            "stylistName": stylistname,
-            "time": time,
-            "date": int(datetime.now().strftime("%Y%m%d")),
-            "profileId": None,
-            "emailAddress": emailaddress,
-            "gender": 0,
-        }
-        logging.info("Checking in")
-        request_url = self.base_regis_booking_api_url + "addcheckin"
-        try:
-            response = requests.post(request_url, json=payload, headers=headers)
-            checkin = response.json()
-            checkin_result = response.json().get("apiResult", None)
-            checkin_id = response.json().get("checkinId", None)
-        except Exception as error:
-            logging.error("Error Checking in %s", error)
-            return None
-        return checkin_result, checkin_id
+        request = self._add_check_in_request(
+            firstname,
+            lastname,
+            phonenumber,
+            serviceid,
+            services,
+            stylistid,
+            stylistname,
+            time,
+            emailaddress,
+        )
+        return self._call(request, CheckIn.from_add_check_in)
 
     def get_check_in_by_source(self):
-        headers = {
-            "x-api-key": self.regis_api_booking_key,
-        }
-        payload = {
-            "sourceId": "SC-W-" + self.device_uuid_str,
-            "profileId": None,
-        }
-        logging.info("Getting Checkins")
-        request_url = self.base_regis_booking_api_url + "getcheckinbysource"
-        try:
-            response = requests.post(request_url, json=payload, headers=headers)
-            checkins = response.json()
-        except Exception as error:
-            logging.error("Error Geting Checkins %s", error)
-            return None
-        return checkins
+        """Returns the check-ins (list[CheckIn]) made from this device."""
+        return self._call(self._check_in_by_source_request(), self._parse_check_ins)
 
     def cancel_checkin(self, checkinid):
         """Cancels a checkin using the api-booking regis API
@@ -570,18 +1957,4 @@ class RegisSalon:
         Returns:
             _type_: _description_
         """
-        headers = {
-            "x-api-key": self.regis_api_booking_key,
-        }
-        payload = {
-            "checkinId": checkinid,
-        }
-        logging.info("Cancelling checkin")
-        request_url = self.base_regis_booking_api_url + "cancelcheckin"
-        try:
-            response = requests.post(request_url, json=payload, headers=headers)
-            cancel_checkin = response.json()
-        except Exception as error:
-            logging.error("Error Cancelling Checkin %s", error)
-            return None
-        return cancel_checkin
+        return self._call(self._cancel_checkin_request(checkinid))
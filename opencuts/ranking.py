@@ -0,0 +1,164 @@
+import bisect
+import heapq
+
+from .availability import MINUTES_PER_DAY, _minute
+from .models import Slot, normalize_name, slots_from_regis_availability
+
+""" Ranking open slots across many stylists and salons.
+    - SlotRanker keeps one run of slots per (salon_id, stylist_id), sorted by minute once when they are added
+    - rank() narrows every run to the time window with a binary search and k-way merges the runs with a heap,
+      so a query costs one binary search per run plus k heap operations, whatever the number of slots
+    - Slots come from Slot models, SalonAvailability results, raw getavailabilityofsalon or raw Zenoti slots
+    - Earliest first by default, preferred stylists can win over slightly earlier ones, near= ranks by distance to a time
+"""
+
+DEFAULT_TOP = 5
+
+# A preferred stylist's slot ranks ahead of other slots up to this many minutes earlier
+DEFAULT_PREFER_WITHIN = 30
+
+
+class _Run:
+    __slots__ = ("minutes", "slots", "names")
+
+    def __init__(self, stylist_id, name):
+        self.minutes = []
+        self.slots = []
+        # What stylists= and prefer= match: the id, the full name and the first name, normalized
+        name = normalize_name(name)
+        self.names = {normalize_name(str(stylist_id)), name, name.split(" ", 1)[0]}
+        self.names.discard("")
+
+    def extend(self, slots):
+        merged = sorted(self.slots + slots, key=lambda slot: slot.minute)
+        self.slots = merged
+        self.minutes = [slot.minute for slot in merged]
+
+
+def _cursor(run, number, index, step, stop, bonus, origin):
+    """A heap entry for run.slots[index]: (rank, minute, run number, index, step, stop, bonus, run)."""
+    minute = run.minutes[index]
+    return abs(minute - origin) + bonus, minute, number, index, step, stop, bonus, run
+
+
+def _wanted(values):
+    return None if values is None else {normalize_name(str(value)) for value in values}
+
+
+class SlotRanker:
+    def __init__(self, slots=()):
+        """
+        Open slots of many stylists and salons, ready to be ranked.
+
+        Args:
+            slots (iterable): Slot models to start with, more can be added with add() and the add_* methods.
+        """
+        self._runs = {}
+        self.add(slots)
+
+    def __len__(self):
+        return sum(len(run.slots) for run in self._runs.values())
+
+    def add(self, slots):
+        """Add Slot models, Zenoti and Regis booking alike. Returns self."""
+        new = {}
+        for slot in slots:
+            key = (slot.salon_id, slot.stylist_id)
+            new.setdefault(key, []).append(slot)
+        for key, group in new.items():
+            run = self._runs.get(key)
+            if run is None:
+                run = self._runs[key] = _Run(key[1], group[0].stylist_name)
+            run.extend(group)
+        return self
+
+    def add_results(self, results):
+        """Add the slots of SalonAvailability results, e.g. from SalonFleet.iter_availability or scan_availability. Returns self."""
+        for result in results:
+            self.add(result.slots)
+        return self
+
+    def add_regis(self, availability, salon_id):
+        """Add a raw getavailabilityofsalon answer (times.hours[].h / m[] per stylist). Returns self."""
+        return self.add(slots_from_regis_availability(availability, salon_id))
+
+    def add_zenoti(self, data, salon_id, stylist=None):
+        """Add a raw Zenoti bookings/{id}/slots answer for a stylist, None for next available. Returns self."""
+        return self.add(
+            Slot.from_zenoti(slot, stylist, salon_id) for slot in data["slots"]
+        )
+
+    def rank(
+        self,
+        k=DEFAULT_TOP,
+        after=None,
+        before=None,
+        duration=0,
+        stylists=None,
+        salons=None,
+        prefer=(),
+        prefer_within=DEFAULT_PREFER_WITHIN,
+        near=None,
+    ):
+        """
+        The top k slots, earliest first unless near is given.
+
+        Args:
+            k (int): How many slots to return.
+            after (int or str): Earliest start, minutes after midnight or "HH:MM" / "HHMM".
+            before (int or str): Latest end of the appointment, the slot must start duration minutes before it.
+            duration (int): Length of the service in minutes, e.g. Service.duration.
+            stylists (iterable): Only these stylists, by id, full name or first name.
+            salons (iterable): Only these salon ids.
+            prefer (iterable): Stylists (by id, full name or first name) whose slots rank ahead of others up to prefer_within minutes earlier.
+            near (int or str): Rank by distance to this time instead of earliest first.
+
+        Returns:
+            list[Slot]: At most k slots, best first.
+        """
+        low = 0 if after is None else _minute(after)
+        high = (MINUTES_PER_DAY if before is None else _minute(before)) - (
+            duration or 0
+        )
+        stylists = _wanted(stylists)
+        salons = None if salons is None else set(salons)
+        prefer = _wanted(prefer)
+        # Earliest first is distance to midnight
+        origin = 0 if near is None else _minute(near)
+        heap = []
+        for number, ((salon_id, _), run) in enumerate(self._runs.items()):
+            if salons is not None and salon_id not in salons:
+                continue
+            if stylists is not None and run.names.isdisjoint(stylists):
+                continue
+            start = bisect.bisect_left(run.minutes, low)
+            end = bisect.bisect_right(run.minutes, high)
+            if start >= end:
+                continue
+            bonus = -prefer_within if prefer and not run.names.isdisjoint(prefer) else 0
+            # One cursor walking later from origin, and one walking earlier for near
+            split = bisect.bisect_left(run.minutes, origin, start, end)
+            if split < end:
+                heap.append(_cursor(run, number, split, 1, end, bonus, origin))
+            if split > start:
+                heap.append(
+                    _cursor(run, number, split - 1, -1, start - 1, bonus, origin)
+                )
+        heapq.heapify(heap)
+        ranked = []
+        while heap and len(ranked) < k:
+            _, _, number, index, step, stop, bonus, run = heap[0]
+            ranked.append(run.slots[index])
+            index += step
+            if index == stop:
+                heapq.heappop(heap)
+            else:
+                heapq.heapreplace(
+                    heap, _cursor(run, number, index, step, stop, bonus, origin)
+                )
+        return ranked
+
+
+def top_slots(slots, k=DEFAULT_TOP, **filters):
+    """Rank slots once, see SlotRanker.rank for the filters. Build a SlotRanker to rank the same slots repeatedly."""
+    return SlotRanker(slots).rank(k, **filters)
@@ -0,0 +1,214 @@
+import collections
+import sys
+import threading
+import time
+
+from .cache import DayCache
+from .models import _Model
+from .opencuts import RegisSalon, _read_device_uuid
+from .transport import Transport
+
+""" RegisSalon clients for many salons hosted in one process.
+    - SalonRegistry creates a client the first time a salon is asked for, and hands the same one back afterwards
+    - Every client shares one device identity, Transport, DiskCache and availability DayCache
+    - The least recently used clients are evicted past max_salons, and clients idle longer than idle_ttl
+    - stats() reports how often each salon was asked for and roughly how much memory its client holds
+"""
+
+DEFAULT_MAX_SALONS = 500
+
+
+def _footprint(value, seen):
+    """Approximate bytes held by value and everything it references, each object counted once."""
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(
+            _footprint(key, seen) + _footprint(item, seen)
+            for key, item in value.items()
+        )
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_footprint(item, seen) for item in value)
+    else:
+        for name in getattr(type(value), "__slots__", ()):
+            size += _footprint(getattr(value, name, None), seen)
+    return size
+
+
+def salon_footprint(salon):
+    """
+    Approximate bytes held by one RegisSalon: its snapshot, last good responses and guest ids.
+
+    The shared transport and caches are not counted, they belong to every salon.
+    """
+    seen = set()
+    return sum(
+        _footprint(value, seen)
+        for value in (salon.snapshot, salon._last_good, salon._guests, salon._details)
+    )
+
+
+class SalonStats(_Model):
+    """How one salon's client was used, from SalonRegistry.stats()."""
+
+    __slots__ = ("salon_id", "hits", "created", "last_used", "memory")
+
+    def __init__(self, salon_id, hits=0, created=None, last_used=None, memory=0):
+        self.salon_id = salon_id
+        # get() calls answered with the existing client
+        self.hits = hits
+        self.created = created
+        self.last_used = last_used
+        # Approximate bytes, see salon_footprint
+        self.memory = memory
+
+
+class _Entry:
+    __slots__ = ("salon", "hits", "created", "last_used")
+
+    def __init__(self, salon, now):
+        self.salon = salon
+        self.hits = 0
+        self.created = now
+        self.last_used = now
+
+
+class SalonRegistry:
+    def __init__(
+        self,
+        regis_api_key,
+        regis_boking_api_key,
+        max_salons=DEFAULT_MAX_SALONS,
+        idle_ttl=None,
+        transport=None,
+        cache=None,
+        store=None,
+        device_uuid=None,
+        configure=None,
+    ):
+        """
+        Create RegisSalon clients on demand, sharing one identity, transport and cache.
+
+        Args:
+            max_salons (int): Clients kept at most, the least recently used one is evicted first.
+            idle_ttl (float): Seconds a client may go unused before it is evicted. None keeps it until max_salons pushes it out.
+            transport (Transport): Shared transport. Defaults to one owned (and closed) by the registry.
+            cache (DiskCache): Shared persistent cache, so an evicted salon comes back without refetching its metadata.
+            store (SalonStore): Shared SQLite copy of every salon's catalogs and slots.
+            device_uuid (str): The device id every client checks in with. Defaults to the one in the device_uuid file.
+            configure (callable): Called with every new client, e.g. to point it at another API host.
+        """
+        self.regis_api_key = regis_api_key
+        self.regis_api_booking_key = regis_boking_api_key
+        self.max_salons = max_salons
+        self.idle_ttl = idle_ttl
+        self._owns_transport = transport is None
+        self.transport = transport or Transport()
+        self.cache = cache
+        self.store = store
+        self.device_uuid = device_uuid or _read_device_uuid()
+        self.configure = configure
+        # Open slots are keyed by salon, one DayCache serves every client
+        self.availability_cache = DayCache()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, salon_id):
+        return salon_id in self._entries
+
+    def _create(self, salon_id):
+        salon = RegisSalon(
+            salon_id,
+            self.regis_api_key,
+            self.regis_api_booking_key,
+            transport=self.transport,
+            cache=self.cache,
+            store=self.store,
+            device_uuid=self.device_uuid,
+        )
+        salon.availability_cache = self.availability_cache
+        if self.configure is not None:
+            self.configure(salon)
+        return salon
+
+    def get(self, salon_id):
+        """The client of salon_id, created the first time it is asked for."""
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._entries.get(salon_id)
+            if entry is None:
+                self.misses += 1
+                entry = self._entries[salon_id] = _Entry(self._create(salon_id), now)
+                while len(self._entries) > self.max_salons:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self.hits += 1
+                entry.hits += 1
+                entry.last_used = now
+                self._entries.move_to_end(salon_id)
+            return entry.salon
+
+    __getitem__ = get
+
+    def _evict_idle(self, now):
+        if self.idle_ttl is None:
+            return
+        # Entries are in order of last use, the idle ones are all at the front
+        while self._entries:
+            entry = next(iter(self._entries.values()))
+            if now - entry.last_used < self.idle_ttl:
+                break
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def evict(self, salon_id):
+        """Drop the client of salon_id. Returns whether there was one."""
+        with self._lock:
+            return self._entries.pop(salon_id, None) is not None
+
+    def evict_idle(self):
+        """Drop every client unused for idle_ttl seconds, without waiting for the next get()."""
+        with self._lock:
+            self._evict_idle(time.monotonic())
+
+    def salon_ids(self):
+        """The salons with a client, least recently used first."""
+        with self._lock:
+            return list(self._entries)
+
+    def stats(self):
+        """
+        Usage of every client, least recently used first.
+
+        Returns:
+            dict: salon_id -> SalonStats.
+        """
+        with self._lock:
+            entries = list(self._entries.items())
+        return {
+            salon_id: SalonStats(
+                salon_id,
+                entry.hits,
+                entry.created,
+                entry.last_used,
+                salon_footprint(entry.salon),
+            )
+            for salon_id, entry in entries
+        }
+
+    def close(self):
+        """Drop every client, and close the transport if the registry created it."""
+        with self._lock:
+            self._entries.clear()
+        if self._owns_transport:
+            self.transport.close()
@@ -0,0 +1,209 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+from .instrumentation import Histogram
+
+""" Throttling and retries for the transports.
+    - TokenBucket / RateLimiter: a request rate per API host, shared by every salon on the transport
+    - RetryPolicy: exponential backoff with full jitter for transient failures, honouring Retry-After
+    - Only idempotent ApiRequests are retried unless the policy says otherwise
+    - HedgePolicy: send a second copy of a slow idempotent request and take whichever answers first
+"""
+
+# Responses worth another try: throttled, or the host (or its proxy) had a transient failure
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.25
+DEFAULT_MAX_DELAY = 10.0
+
+
+def _host(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}/"
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=None):
+        """
+        Allow rate requests per second on average, with bursts of up to burst requests.
+
+        Args:
+            rate (float): Tokens added per second.
+            burst (int): Bucket size. Defaults to one second worth of tokens.
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take a token and return how many seconds the caller must wait before using it.
+
+        Tokens may be taken ahead of time, later callers then wait in line behind the earlier ones.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(delay, self._paused_until - now)
+
+    def pause(self, seconds):
+        """Hold every request for seconds, e.g. when the host answered 429 with a Retry-After."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class RateLimiter:
+    def __init__(self, rates=None, default=None):
+        """
+        One TokenBucket per API host.
+
+        Args:
+            rates (dict): URL (only its scheme and host matter) -> requests per second, or a (rate, burst) tuple.
+            default (float): Rate for hosts not in rates. None leaves them unlimited.
+        """
+        self.default = default
+        self._buckets = {}
+        self._lock = threading.Lock()
+        for url, rate in (rates or {}).items():
+            self._buckets[_host(url)] = self._bucket(rate)
+
+    @staticmethod
+    def _bucket(rate):
+        if isinstance(rate, tuple):
+            return TokenBucket(*rate)
+        return TokenBucket(rate)
+
+    def bucket(self, url):
+        """The TokenBucket of url's host, otherwise None if the host is unlimited."""
+        host = _host(url)
+        bucket = self._buckets.get(host)
+        if bucket is None and self.default is not None:
+            with self._lock:
+                bucket = self._buckets.get(host)
+                if bucket is None:
+                    bucket = self._buckets[host] = self._bucket(self.default)
+        return bucket
+
+    def reserve(self, url):
+        """Take a token for url's host and return the seconds to wait before sending."""
+        bucket = self.bucket(url)
+        return bucket.reserve() if bucket is not None else 0.0
+
+    def pause(self, url, seconds):
+        bucket = self.bucket(url)
+        if bucket is not None:
+            bucket.pause(seconds)
+
+
+def retry_after(headers):
+    """The Retry-After header in seconds (it may be a number or an HTTP date), otherwise None."""
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        retries=DEFAULT_RETRIES,
+        backoff=DEFAULT_BACKOFF,
+        max_delay=DEFAULT_MAX_DELAY,
+        statuses=RETRY_STATUSES,
+        retry_unsafe=False,
+    ):
+        """
+        When and how long to wait before trying a request again.
+
+        Args:
+            retries (int): Extra attempts after the first one. 0 disables retries.
+            backoff (float): Base delay in seconds, doubled on every attempt. The actual delay is random between 0 and that (full jitter).
+            max_delay (float): Upper bound on any single delay. A longer Retry-After is not cut short: the request is not retried.
+            statuses (set): Response statuses that are retried. Connection errors always are.
+            retry_unsafe (bool): Also retry requests that are not idempotent (creating bookings, check-ins, accounts).
+        """
+        self.retries = retries
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.statuses = statuses
+        self.retry_unsafe = retry_unsafe
+
+    def should_retry(self, api_request, attempt, status=None):
+        """Whether attempt (1 for the first one) may be followed by another, given its status (None after a connection error)."""
+        if attempt > self.retries:
+            return False
+        if not (api_request.idempotent or self.retry_unsafe):
+            return False
+        return status is None or status in self.statuses
+
+    def delay(self, attempt, retry_after=None):
+        """
+        Seconds to wait before the next attempt. A Retry-After from the server wins over the backoff.
+
+        Returns None when Retry-After is longer than max_delay: retrying any sooner would ignore the server, give up instead.
+        """
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay else None
+        return random.uniform(0, min(self.max_delay, self.backoff * 2 ** (attempt - 1)))
+
+
+# Transports fall back to this when they are not given a policy
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+class HedgePolicy:
+    def __init__(self, percentile=0.95, after=None, min_samples=20, endpoints=None):
+        """
+        When to send a second copy of a slow idempotent request. Whichever copy answers first is used.
+
+        Args:
+            percentile (float): Send the copy once the first one has been running longer than this latency percentile of its endpoint.
+            after (float): Seconds to wait while fewer than min_samples latencies of the endpoint were seen. None does not hedge until then.
+            min_samples (int): Latencies needed before the percentile is trusted.
+            endpoints (set): ApiRequest endpoints to hedge, e.g. {"bookings/slots", "getavailabilityofsalon"}. Defaults to every idempotent request.
+        """
+        self.percentile = percentile
+        self.after = after
+        self.min_samples = min_samples
+        self.endpoints = endpoints
+        self._latency = {}
+        self._lock = threading.Lock()
+
+    def applies(self, api_request):
+        if not api_request.idempotent:
+            return False
+        return self.endpoints is None or api_request.endpoint in self.endpoints
+
+    def delay(self, endpoint):
+        """Seconds to wait for the first copy before sending the second, otherwise None to not hedge."""
+        with self._lock:
+            histogram = self._latency.get(endpoint)
+            if histogram is not None and histogram.count >= self.min_samples:
+                return histogram.percentile(self.percentile) / 1000
+        return self.after
+
+    def observe(self, endpoint, seconds):
+        with self._lock:
+            histogram = self._latency.get(endpoint)
+            if histogram is None:
+                histogram = self._latency[endpoint] = Histogram()
+            histogram.add(seconds * 1000)
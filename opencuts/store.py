@@ -0,0 +1,391 @@
+import contextlib
+import json
+import time
+from datetime import date, timedelta
+
+from .availability import MINUTES_PER_DAY, _minute
+from .cache import _Transaction
+from .models import Salon, Service, Slot, Stylist, normalize_name
+
+""" A local SQLite copy of what RegisSalon fetches, to query without calling the APIs.
+    - Normalized tables of salons, services, stylists and open slots, indexed for the lookups below
+    - Every save is an upsert: unchanged rows are not written, so an hourly refresh only writes what changed
+    - Slots are never overwritten: a slot that disappears is marked removed, keeping the availability history
+    - Queries such as "salons offering Supercut with a slot after 18:00 today" answer from the file in milliseconds
+    - sqlite3 is imported on first use, like the DiskCache
+"""
+
+DEFAULT_STORE_PATH = "opencuts_store.db"
+
+# How many days of slot history prune() keeps
+DEFAULT_HISTORY_DAYS = 30
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS salons ("
+    "salon_id PRIMARY KEY, name TEXT, address TEXT, phone TEXT, pos_type TEXT, "
+    "zenoti_id TEXT, updated REAL)",
+    "CREATE TABLE IF NOT EXISTS services ("
+    "salon_id, service_id, name TEXT, name_key TEXT, category TEXT, duration, price, "
+    "updated REAL, PRIMARY KEY (salon_id, service_id))",
+    "CREATE INDEX IF NOT EXISTS services_name ON services (name_key, salon_id)",
+    "CREATE TABLE IF NOT EXISTS stylists ("
+    "salon_id, stylist_id, name TEXT, first_name TEXT, last_name TEXT, gender, "
+    "updated REAL, PRIMARY KEY (salon_id, stylist_id))",
+    # stylist_id is '' for "next available" slots, a NULL would not be unique in the key
+    "CREATE TABLE IF NOT EXISTS slots ("
+    "salon_id, service_id, day TEXT, stylist_id, minute INTEGER, time TEXT, "
+    "stylist_name TEXT, first_seen REAL, removed REAL, "
+    "PRIMARY KEY (salon_id, service_id, day, stylist_id, minute))",
+    "CREATE INDEX IF NOT EXISTS slots_day ON slots (day, minute) WHERE removed IS NULL",
+)
+
+
+def _day(value):
+    """YYYY-MM-DD from a date, a YYYY-MM-DD string or None for today."""
+    if value is None:
+        return date.today().isoformat()
+    return value if isinstance(value, str) else value.isoformat()
+
+
+def _stylist_key(stylist_id):
+    """How a stylist id is compared in the slots table, as text and '' for "next available"."""
+    return "" if stylist_id is None else str(stylist_id)
+
+
+def _window(after, before):
+    low = 0 if after is None else _minute(after)
+    high = MINUTES_PER_DAY if before is None else _minute(before)
+    return low, high
+
+
+class SalonStore:
+    def __init__(self, path=DEFAULT_STORE_PATH, lock_timeout=10):
+        """
+        An SQLite database of salons, catalogs and open slots, safe to share between threads and processes.
+
+        Args:
+            path (str): The database file.
+            lock_timeout (float): Seconds to wait for another process holding the write lock.
+        """
+        self.path = path
+        self.lock_timeout = lock_timeout
+        with self._write() as db:
+            for statement in _SCHEMA:
+                db.execute(statement)
+        with self._read() as db:
+            # Readers do not wait for a writer, and a writer does not wait for readers
+            db.execute("PRAGMA journal_mode=WAL")
+
+    def _connect(self):
+        import sqlite3
+
+        return sqlite3.connect(
+            self.path, timeout=self.lock_timeout, isolation_level=None
+        )
+
+    def _write(self):
+        return _Transaction(self._connect())
+
+    def _read(self):
+        return contextlib.closing(self._connect())
+
+    # Writes, each returns the number of rows it inserted, changed or removed
+    def save_salon(self, salon):
+        with self._write() as db:
+            return self._upsert_salon(db, salon)
+
+    def save_services(self, salon_id, services):
+        """Replace the catalog of a salon, services missing from it are deleted."""
+        with self._write() as db:
+            return self._upsert_services(db, salon_id, services)
+
+    def save_stylists(self, salon_id, stylists):
+        """Replace the stylists of a salon, stylists missing from it are deleted."""
+        with self._write() as db:
+            return self._upsert_stylists(db, salon_id, stylists)
+
+    def save_availability(self, results, stylists=None):
+        """
+        Record the open slots of SalonAvailability results (or one result) in one transaction.
+
+        Slots no longer open are marked removed, slots that came back are reopened. Results with an error are skipped.
+
+        Args:
+            stylists (iterable): Ids of the stylists the results cover, None for "next available". Only their
+                missing slots are marked removed, e.g. a fetch for one stylist leaves the others' slots open.
+                Defaults to every stylist.
+        """
+        if not isinstance(results, (list, tuple)):
+            results = [results]
+        scope = None
+        if stylists is not None:
+            scope = json.dumps(sorted({_stylist_key(stylist) for stylist in stylists}))
+        with self._write() as db:
+            return sum(self._upsert_slots(db, result, scope) for result in results)
+
+    def save(self, salon):
+        """Record the salon, services and stylists a RegisSalon (or AsyncRegisSalon) holds, in one transaction."""
+        snapshot = salon.snapshot
+        with self._write() as db:
+            written = 0
+            if snapshot.salon is not None:
+                written += self._upsert_salon(db, snapshot.salon)
+            if snapshot.services is not None:
+                written += self._upsert_services(db, salon.salon_id, snapshot.services)
+            if snapshot.stylists:
+                written += self._upsert_stylists(db, salon.salon_id, snapshot.stylists)
+            return written
+
+    @staticmethod
+    def _upsert_salon(db, salon):
+        before = db.total_changes
+        # The Zenoti API key is a credential, it is not copied into the store
+        db.execute(
+            "INSERT INTO salons VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (salon_id) DO UPDATE SET name = excluded.name, "
+            "address = excluded.address, phone = excluded.phone, "
+            "pos_type = excluded.pos_type, zenoti_id = excluded.zenoti_id, "
+            "updated = excluded.updated "
+            "WHERE name IS NOT excluded.name OR address IS NOT excluded.address "
+            "OR phone IS NOT excluded.phone OR pos_type IS NOT excluded.pos_type "
+            "OR zenoti_id IS NOT excluded.zenoti_id",
+            (
+                salon.salon_id,
+                salon.name,
+                salon.address,
+                salon.phone,
+                salon.pos_type,
+                salon.zenoti_id,
+                time.time(),
+            ),
+        )
+        return db.total_changes - before
+
+    @staticmethod
+    def _upsert_services(db, salon_id, services):
+        before = db.total_changes
+        now = time.time()
+        db.executemany(
+            "INSERT INTO services VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (salon_id, service_id) DO UPDATE SET name = excluded.name, "
+            "name_key = excluded.name_key, category = excluded.category, "
+            "duration = excluded.duration, price = excluded.price, "
+            "updated = excluded.updated "
+            "WHERE name IS NOT excluded.name OR category IS NOT excluded.category "
+            "OR duration IS NOT excluded.duration OR price IS NOT excluded.price",
+            [
+                (
+                    salon_id,
+                    service.id,
+                    service.name,
+                    normalize_name(service.name),
+                    service.category,
+                    service.duration,
+                    service.price,
+                    now,
+                )
+                for service in services
+            ],
+        )
+        db.execute(
+            "DELETE FROM services WHERE salon_id = ? "
+            "AND service_id NOT IN (SELECT value FROM json_each(?))",
+            (salon_id, json.dumps([service.id for service in services])),
+        )
+        return db.total_changes - before
+
+    @staticmethod
+    def _upsert_stylists(db, salon_id, stylists):
+        before = db.total_changes
+        now = time.time()
+        db.executemany(
+            "INSERT INTO stylists VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (salon_id, stylist_id) DO UPDATE SET name = excluded.name, "
+            "first_name = excluded.first_name, last_name = excluded.last_name, "
+            "gender = excluded.gender, updated = excluded.updated "
+            "WHERE name IS NOT excluded.name OR first_name IS NOT excluded.first_name "
+            "OR last_name IS NOT excluded.last_name OR gender IS NOT excluded.gender",
+            [
+                (
+                    salon_id,
+                    stylist.id,
+                    stylist.name,
+                    stylist.first_name,
+                    stylist.last_name,
+                    stylist.gender,
+                    now,
+                )
+                for stylist in stylists
+            ],
+        )
+        db.execute(
+            "DELETE FROM stylists WHERE salon_id = ? "
+            "AND stylist_id NOT IN (SELECT value FROM json_each(?))",
+            (salon_id, json.dumps([stylist.id for stylist in stylists])),
+        )
+        return db.total_changes - before
+
+    @staticmethod
+    def _upsert_slots(db, result, scope):
+        if result.error is not None or result.service is None:
+            return 0
+        now = time.time()
+        key = (result.salon_id, result.service.id, _day(result.date))
+        rows = [
+            (
+                *key,
+                "" if slot.stylist_id is None else slot.stylist_id,
+                slot.minute,
+                slot.time,
+                slot.stylist_name,
+                now,
+            )
+            for slot in result.slots
+        ]
+        db.execute("CREATE TEMP TABLE IF NOT EXISTS fresh (stylist_id, minute)")
+        db.execute("DELETE FROM fresh")
+        db.executemany("INSERT INTO fresh VALUES (?, ?)", [row[3:5] for row in rows])
+        # Only count the slots table, not the scratch rows above
+        before = db.total_changes
+        query = (
+            "UPDATE slots SET removed = ? WHERE salon_id = ? AND service_id = ? "
+            "AND day = ? AND removed IS NULL "
+            "AND (stylist_id, minute) NOT IN (SELECT stylist_id, minute FROM fresh)"
+        )
+        params = [now, *key]
+        if scope is not None:
+            query += " AND CAST(stylist_id AS TEXT) IN (SELECT value FROM json_each(?))"
+            params.append(scope)
+        db.execute(query, params)
+        db.executemany(
+            "INSERT INTO slots VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL) "
+            "ON CONFLICT (salon_id, service_id, day, stylist_id, minute) "
+            "DO UPDATE SET removed = NULL, time = excluded.time, "
+            "stylist_name = excluded.stylist_name WHERE removed IS NOT NULL",
+            rows,
+        )
+        return db.total_changes - before
+
+    def prune(self, keep_days=DEFAULT_HISTORY_DAYS):
+        """Delete the slots of days more than keep_days ago. Returns how many were deleted."""
+        oldest = (date.today() - timedelta(days=keep_days)).isoformat()
+        with self._write() as db:
+            return db.execute("DELETE FROM slots WHERE day < ?", (oldest,)).rowcount
+
+    # Reads
+    def salon(self, salon_id):
+        with self._read() as db:
+            row = db.execute(
+                "SELECT salon_id, name, address, phone, pos_type, zenoti_id "
+                "FROM salons WHERE salon_id = ?",
+                (salon_id,),
+            ).fetchone()
+        return None if row is None else Salon(*row)
+
+    def services(self, salon_id):
+        with self._read() as db:
+            rows = db.execute(
+                "SELECT service_id, name, category, duration, price FROM services "
+                "WHERE salon_id = ? ORDER BY rowid",
+                (salon_id,),
+            ).fetchall()
+        return [Service(*row) for row in rows]
+
+    def stylists(self, salon_id):
+        with self._read() as db:
+            rows = db.execute(
+                "SELECT stylist_id, name, first_name, last_name, gender FROM stylists "
+                "WHERE salon_id = ? ORDER BY rowid",
+                (salon_id,),
+            ).fetchall()
+        return [Stylist(*row) for row in rows]
+
+    def open_slots(
+        self, service_name, after=None, before=None, day=None, salon_ids=None
+    ):
+        """
+        The open slots of a service (by name, ignoring case) in every salon offering it, earliest first.
+
+        Args:
+            after (int or str): Earliest start, minutes after midnight or "HH:MM" / "HHMM".
+            before (int or str): Start before this time.
+            day (date or str): The day, a datetime.date or YYYY-MM-DD. Defaults to today.
+            salon_ids (iterable): Only these salons.
+
+        Returns:
+            list[Slot]: Slots carrying their salon_id.
+        """
+        low, high = _window(after, before)
+        query = (
+            "SELECT slots.time, slots.minute, slots.stylist_id, slots.stylist_name, "
+            "slots.salon_id FROM services JOIN slots "
+            "ON slots.salon_id = services.salon_id "
+            "AND slots.service_id = services.service_id "
+            "WHERE services.name_key = ? AND slots.day = ? "
+            "AND slots.minute >= ? AND slots.minute < ? AND slots.removed IS NULL"
+        )
+        params = [normalize_name(service_name), _day(day), low, high]
+        if salon_ids is not None:
+            query += " AND services.salon_id IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps(list(salon_ids)))
+        with self._read() as db:
+            rows = db.execute(query + " ORDER BY slots.minute", params).fetchall()
+        return [
+            Slot(time, minute, stylist_id if stylist_id != "" else None, name, salon)
+            for time, minute, stylist_id, name, salon in rows
+        ]
+
+    def salons_offering(self, service_name, after=None, before=None, day=None):
+        """
+        The salons offering a service with an open slot in the time window, the earliest one first.
+
+        e.g. salons_offering("Supercut", after="18:00") for "Supercut after 18:00 today".
+
+        Returns:
+            list[tuple]: (Salon, earliest Slot) pairs. Salons saved without their details have only salon_id set.
+        """
+        earliest = {}
+        for slot in self.open_slots(service_name, after, before, day):
+            earliest.setdefault(slot.salon_id, slot)
+        if not earliest:
+            return []
+        with self._read() as db:
+            rows = db.execute(
+                "SELECT salon_id, name, address, phone, pos_type, zenoti_id FROM salons "
+                "WHERE salon_id IN (SELECT value FROM json_each(?))",
+                (json.dumps(list(earliest)),),
+            ).fetchall()
+        salons = {row[0]: Salon(*row) for row in rows}
+        return [
+            (salons.get(salon_id) or Salon(salon_id), slot)
+            for salon_id, slot in earliest.items()
+        ]
+
+    def history(self, salon_id, service_id, day=None):
+        """
+        Every slot ever seen for a salon, service and day, with when it appeared and when it was taken.
+
+        Returns:
+            list[tuple]: (Slot, first_seen, removed) with unix times, removed is None while the slot is open.
+        """
+        with self._read() as db:
+            rows = db.execute(
+                "SELECT time, minute, stylist_id, stylist_name, first_seen, removed "
+                "FROM slots WHERE salon_id = ? AND service_id = ? AND day = ? "
+                "ORDER BY minute, first_seen",
+                (salon_id, service_id, _day(day)),
+            ).fetchall()
+        return [
+            (
+                Slot(
+                    time,
+                    minute,
+                    stylist_id if stylist_id != "" else None,
+                    name,
+                    salon_id,
+                ),
+                first_seen,
+                removed,
+            )
+            for time, minute, stylist_id, name, first_seen, removed in rows
+        ]
@@ -0,0 +1,444 @@
+import datetime
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+""" A local stand-in for the Regis and Zenoti APIs, for tests and benchmarks.
+    - Serves /sis/api/salon, the api-booking endpoints under /v1/ and the Zenoti endpoints under /zenoti/v1/
+    - Every salon is generated from its id, salon ids listed in zenoti_salons are Zenoti stores
+    - latency adds a fixed delay to every response, hits counts the requests per endpoint
+    - guests holds the accounts created through the API, appointments of unknown guests answer 404
+    - fail() makes the next requests to an endpoint answer an error status, to exercise retries
+    - stall() makes the next requests to an endpoint answer late, to exercise timeouts and hedging
+    - taken holds minutes of the day that are booked for every stylist, add to it to close slots
+    - skills limits what Zenoti therapists perform, bookings for anything else answer 400
+    - days_off leaves Zenoti therapists out of the therapists list and attendance of the days they do not work
+"""
+
+
+class FakeRegisServer:
+    def __init__(
+        self,
+        zenoti_salons=("1000",),
+        latency=0.0,
+        services=5,
+        stylists=4,
+        slots=8,
+        skills=None,
+        days_off=None,
+        host="127.0.0.1",
+        port=0,
+    ):
+        """
+        Create the server, call start() (or use it as a context manager) to serve.
+
+        Args:
+            zenoti_salons (tuple): Salon ids that report "Zenoti" as pos_type, every other id is a "Supersalon".
+            latency (float): Seconds to wait before answering each request.
+            services (int): Number of services in every catalog.
+            stylists (int): Number of stylists working in every salon.
+            slots (int): Number of open slots per stylist.
+            skills (dict): Zenoti therapist number -> numbers of the services they perform. Unlisted therapists perform every service.
+            days_off (dict): Zenoti therapist number -> YYYY-MM-DD days they do not work. Unlisted therapists work every day.
+        """
+        self.zenoti_salons = set(zenoti_salons)
+        self.latency = latency
+        self.services = services
+        self.stylists = stylists
+        self.slots = slots
+        self.skills = skills or {}
+        self.days_off = days_off or {}
+        self.hits = {}
+        self.guests = {}
+        self.checkins = {}
+        self.bookings = {}
+        self.taken = set()
+        self.failures = {}
+        self.stalls = {}
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._server = _Server((host, port), _Handler)
+        self._server.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def configure(self, salon):
+        """Point a RegisSalon (or AsyncRegisSalon) at this server."""
+        salon.base_regis_api_url = self.url
+        salon.base_regis_booking_api_url = self.url + "/v1/"
+        salon.zenoti_api_url = self.url + "/zenoti/v1/"
+        return salon
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def new_id(self, prefix):
+        with self._lock:
+            self._next_id += 1
+            return f"{prefix}-{self._next_id}"
+
+    def fail(self, endpoint, status=503, times=1, retry_after=None):
+        """Answer the next times requests to endpoint with status (and a Retry-After header) instead of the payload."""
+        with self._lock:
+            self.failures.setdefault(endpoint, []).extend(
+                [(status, retry_after)] * times
+            )
+
+    def next_failure(self, endpoint):
+        with self._lock:
+            pending = self.failures.get(endpoint)
+            return pending.pop(0) if pending else None
+
+    def stall(self, endpoint, seconds, times=1):
+        """Wait seconds (on top of latency) before answering the next times requests to endpoint."""
+        with self._lock:
+            self.stalls.setdefault(endpoint, []).extend([seconds] * times)
+
+    def next_stall(self, endpoint):
+        with self._lock:
+            pending = self.stalls.get(endpoint)
+            return pending.pop(0) if pending else 0.0
+
+    def count(self, endpoint):
+        with self._lock:
+            self.hits[endpoint] = self.hits.get(endpoint, 0) + 1
+
+    def refuses(self, booking):
+        """Whether a Zenoti booking asks a therapist for a service outside their skills."""
+        item = booking["guests"][0]["items"][0]
+        therapist = str(item["therapist"]["id"] or "")
+        if not therapist.startswith("therapist-"):
+            return False
+        skills = self.skills.get(int(therapist.split("-", 1)[1]))
+        if skills is None:
+            return False
+        return int(str(item["item"]["id"]).split("-", 1)[1]) not in skills
+
+    def has_guest(self, guest_id):
+        return any(guest["id"] == guest_id for guest in self.guests.values())
+
+    # Payloads
+    def sis_salon(self, salon_id):
+        zenoti = salon_id in self.zenoti_salons
+        return {
+            "zenoti_api_key": "fake-zenoti-key" if zenoti else None,
+            "zenoti_id": f"center-{salon_id}" if zenoti else None,
+            "pos_type": "Zenoti" if zenoti else "Supersalon",
+            "name": f"Salon {salon_id}",
+            "address2": f"{salon_id} Main St",
+            "phone_number": "5558675309",
+        }
+
+    def salon_details(self, salon_id):
+        return {
+            "Salon": {
+                "address": f"{salon_id} Main St",
+                "name": f"Salon {salon_id}",
+                "phonenumber": "555-867-5309",
+            },
+            "Services": [
+                {
+                    "category": "Haircuts",
+                    "services": [
+                        {"id": 100 + number, "service": self.service_name(number)}
+                        for number in range(self.services)
+                    ],
+                }
+            ],
+            "Stylists": [
+                {"name": f"Stylist {number}", "employeeID": 500 + number}
+                for number in range(self.stylists)
+            ],
+        }
+
+    @staticmethod
+    def service_name(number):
+        return "Supercut" if number == 0 else f"Service {number}"
+
+    def minutes(self, stylist):
+        """Open minutes of the day for a stylist, every 15 minutes from 9:00 on."""
+        start = 9 * 60 + stylist * 15
+        minutes = (start + slot * 15 for slot in range(self.slots))
+        return [minute for minute in minutes if minute not in self.taken]
+
+    def availability(self):
+        stylists = []
+        for number in range(self.stylists):
+            hours = {}
+            for minute in self.minutes(number):
+                hours.setdefault(minute // 60, []).append(minute % 60)
+            stylists.append(
+                {
+                    "name": f"Stylist {number}",
+                    "employeeID": 500 + number,
+                    "times": {
+                        "hours": [{"h": hour, "m": m} for hour, m in hours.items()]
+                    },
+                }
+            )
+        return stylists
+
+    @staticmethod
+    def page(key, items, query):
+        """One page of a Zenoti list, from the page and size query parameters."""
+        page = int(query.get("page", 1))
+        size = int(query.get("size", 100))
+        return {
+            key: items[(page - 1) * size : page * size],
+            "page_info": {"total": len(items), "page": page, "size": size},
+        }
+
+    def zenoti_services(self, expand=()):
+        services = []
+        for number in range(self.services):
+            service = {
+                "id": f"service-{number}",
+                "name": self.service_name(number),
+                "duration": 30,
+                "price_info": {"sale_price": 25.0},
+            }
+            if "catalog_info" in expand:
+                service["catalog_info"] = {"display_name": self.service_name(number)}
+            if "additional_info" in expand:
+                service["additional_info"] = {"html_description": "x" * 200}
+            services.append(service)
+        return services
+
+    def zenoti_therapists(self, day=None):
+        therapists = [
+            {
+                "id": f"therapist-{number}",
+                "personal_info": {
+                    "name": f"Stylist {number}",
+                    "first_name": "Stylist",
+                    "last_name": str(number),
+                    "gender": 1,
+                },
+            }
+            for number in range(self.stylists)
+        ]
+        if day is None:
+            return therapists
+        return [
+            therapist for therapist in therapists if self.works(therapist["id"], day)
+        ]
+
+    def works(self, therapist, day):
+        """Whether Zenoti therapist (its id) works on day (YYYY-MM-DD)."""
+        number = (
+            int(therapist.split("-", 1)[1])
+            if therapist.startswith("therapist-")
+            else None
+        )
+        return day not in self.days_off.get(number, ())
+
+    def attendance(self, therapist, start_date, end_date):
+        """A 9:00 to 17:00 shift on every day from start_date to end_date the therapist works."""
+        first = datetime.date.fromisoformat(start_date)
+        days = (datetime.date.fromisoformat(end_date) - first).days + 1
+        records = []
+        for offset in range(days):
+            day = (first + datetime.timedelta(days=offset)).isoformat()
+            if not self.works(therapist, day):
+                continue
+            records.append(
+                {
+                    "date": day,
+                    "check_in_time": f"{day}T09:00:00",
+                    "check_out_time": f"{day}T17:00:00",
+                }
+            )
+        return {"attendance": records, "total_records": len(records)}
+
+    def zenoti_slots(self, date):
+        return {
+            "slots": [
+                {"Time": f"{date}T{minute // 60:02d}:{minute % 60:02d}:00"}
+                for minute in self.minutes(0)
+            ]
+        }
+
+
+_ROUTES = [
+    ("GET", r"/sis/api/salon", "salon"),
+    ("POST", r"/v1/getsalondetails", "getsalondetails"),
+    ("POST", r"/v1/getavailabilityofsalon", "getavailabilityofsalon"),
+    ("POST", r"/v1/addcheckin", "addcheckin"),
+    ("POST", r"/v1/getcheckinbysource", "getcheckinbysource"),
+    ("POST", r"/v1/cancelcheckin", "cancelcheckin"),
+    ("GET", r"/zenoti/v1/centers/[^/]+/services", "centers/services"),
+    ("GET", r"/zenoti/v1/centers/[^/]+/therapists", "centers/therapists"),
+    ("GET", r"/zenoti/v1/employees/([^/]+)/attendance", "employees/attendance"),
+    ("POST", r"/zenoti/v1/bookings", "bookings"),
+    ("GET", r"/zenoti/v1/bookings/([^/]+)/slots", "bookings/slots"),
+    ("POST", r"/zenoti/v1/bookings/[^/]+/slots/reserve", "bookings/slots/reserve"),
+    ("POST", r"/zenoti/v1/bookings/[^/]+/slots/confirm", "bookings/slots/confirm"),
+    ("GET", r"/zenoti/v1/guests/search", "guests/search"),
+    ("POST", r"/zenoti/v1/guests", "guests"),
+    ("GET", r"/zenoti/v1/guests/([^/]+)/appointments", "guests/appointments"),
+    ("PUT", r"/zenoti/v1/invoices/[^/]+/cancel", "invoices/cancel"),
+]
+_ROUTES = [(method, re.compile(path + "$"), name) for method, path, name in _ROUTES]
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections when a fleet opens many at once
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # Clients that timed out or lost a hedge hang up before the answer, that is expected here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes, without TCP_NODELAY every keep-alive response waits on a delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _handle(self, method):
+        fake = self.server.fake
+        parts = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else {}
+        for route_method, pattern, endpoint in _ROUTES:
+            match = pattern.match(parts.path)
+            if route_method == method and match:
+                break
+        else:
+            return self._reply(404, {"error": "not found"})
+        fake.count(endpoint)
+        delay = fake.latency + fake.next_stall(endpoint)
+        if delay:
+            time.sleep(delay)
+        failure = fake.next_failure(endpoint)
+        if failure is not None:
+            status, retry_after = failure
+            headers = {} if retry_after is None else {"Retry-After": str(retry_after)}
+            return self._reply(status, {"error": "injected failure"}, headers)
+        if endpoint == "guests/appointments" and not fake.has_guest(match.group(1)):
+            return self._reply(404, {"error": "guest not found"})
+        if endpoint == "bookings" and fake.refuses(body):
+            return self._reply(
+                400,
+                {"id": None, "error": {"message": "Therapist cannot perform service"}},
+            )
+        self._reply(200, self._payload(fake, endpoint, match, query, body))
+
+    def _payload(self, fake, endpoint, match, query, body):
+        if endpoint == "salon":
+            return fake.sis_salon(query["salon-number"])
+        if endpoint == "getsalondetails":
+            return fake.salon_details(str(body["salonId"]))
+        if endpoint == "getavailabilityofsalon":
+            return fake.availability()
+        if endpoint == "addcheckin":
+            checkin_id = fake.new_id("checkin")
+            fake.checkins[checkin_id] = {
+                "checkinId": checkin_id,
+                "date": body["date"],
+                "time": body["time"],
+                "services": body["services"],
+                "stylistName": body["stylistName"],
+                "sourceId": body["sourceId"],
+            }
+            return {"apiResult": "Success", "checkinId": checkin_id}
+        if endpoint == "getcheckinbysource":
+            return [
+                checkin
+                for checkin in fake.checkins.values()
+                if checkin["sourceId"] == body["sourceId"]
+            ]
+        if endpoint == "cancelcheckin":
+            fake.checkins.pop(body["checkinId"], None)
+            return {"apiResult": "Success"}
+        if endpoint == "centers/services":
+            expand = parse_qs(urlsplit(self.path).query).get("expand", [])
+            return fake.page("services", fake.zenoti_services(expand), query)
+        if endpoint == "centers/therapists":
+            return fake.page(
+                "therapists", fake.zenoti_therapists(query.get("date")), query
+            )
+        if endpoint == "employees/attendance":
+            return fake.attendance(
+                match.group(1), query["start_date"], query["end_date"]
+            )
+        if endpoint == "bookings":
+            booking_id = fake.new_id("booking")
+            fake.bookings[booking_id] = body.get("date") or time.strftime("%Y-%m-%d")
+            return {"id": booking_id, "error": None}
+        if endpoint == "bookings/slots":
+            return fake.zenoti_slots(
+                fake.bookings.get(match.group(1), time.strftime("%Y-%m-%d"))
+            )
+        if endpoint == "bookings/slots/reserve":
+            return {"is_reserved": True, "reservation_id": fake.new_id("reservation")}
+        if endpoint == "bookings/slots/confirm":
+            return {"is_confirmed": True, "invoice": {"id": fake.new_id("invoice")}}
+        if endpoint == "guests/search":
+            key = (query.get("first_name"), query.get("last_name"), query.get("phone"))
+            guest = fake.guests.get(key)
+            return {"guests": [guest] if guest else []}
+        if endpoint == "guests":
+            info = body["personal_info"]
+            guest = {"id": fake.new_id("guest"), "personal_info": info}
+            key = (
+                info["first_name"],
+                info["last_name"],
+                info["mobile_phone"]["number"],
+            )
+            fake.guests[key] = guest
+            return guest
+        if endpoint == "guests/appointments":
+            return {"appointments": []}
+        if endpoint == "invoices/cancel":
+            return {"success": True}
+
+    def _reply(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
@@ -0,0 +1,378 @@
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+from . import deadline
+from .breaker import Breakers, CircuitOpenError
+from .instrumentation import Instrumentation
+from .retry import DEFAULT_RETRY_POLICY, retry_after
+
+""" HTTP transport shared by RegisSalon instances.
+    - Keeps one keep-alive connection pool per API host
+    - Optionally pre-warms connections so the first real call skips the TCP+TLS handshake
+    - Safe to share between many RegisSalon instances (and threads)
+    - Reports every request to the observers attached to its instrumentation
+    - requests is only imported when the first request is sent
+    - Throttles requests per host with an optional RateLimiter and retries transient failures of idempotent requests
+    - Fails fast through a circuit breaker per endpoint while an API is degraded
+    - Every request has a timeout, shortened to the current Deadline, and slow reads can be hedged
+"""
+
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 10
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (3.05, 15)
+
+# Methods that are safe to send twice, other requests have to opt in with idempotent=True
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class ApiError(Exception):
+    """Raised instead of returning the body when a request sent with raise_errors=True is answered an error status."""
+
+    def __init__(self, endpoint, status, body):
+        super().__init__(f"{endpoint} answered {status}")
+        self.endpoint = endpoint
+        self.status = status
+        # The decoded JSON body, None if it was not JSON
+        self.body = body
+
+
+class ApiRequest:
+    """One API call: the endpoint it hits, a description for the logs and everything needed to send it."""
+
+    __slots__ = (
+        "endpoint",
+        "description",
+        "method",
+        "url",
+        "headers",
+        "params",
+        "json",
+        "idempotent",
+        "raise_errors",
+    )
+
+    def __init__(
+        self,
+        endpoint,
+        description,
+        method,
+        url,
+        headers=None,
+        params=None,
+        json=None,
+        idempotent=None,
+        raise_errors=False,
+    ):
+        self.endpoint = endpoint
+        self.description = description
+        self.method = method
+        self.url = url
+        self.headers = headers
+        self.params = params
+        self.json = json
+        # Reads sent as POST (getsalondetails, getavailabilityofsalon) pass idempotent=True
+        self.idempotent = (
+            method in IDEMPOTENT_METHODS if idempotent is None else idempotent
+        )
+        # Callers that tell error statuses apart set this to get an ApiError for 4xx and 5xx answers
+        self.raise_errors = raise_errors
+
+    def kwargs(self):
+        """The keyword arguments to hand to an HTTP client, leaving out the unset ones."""
+        kwargs = {"headers": self.headers}
+        if self.params is not None:
+            kwargs["params"] = self.params
+        if self.json is not None:
+            kwargs["json"] = self.json
+        return kwargs
+
+    def key(self):
+        """Identifies the request by everything that changes its response, to remember the last good one."""
+        return (
+            self.method,
+            self.url,
+            repr(sorted((self.params or {}).items())),
+            repr(self.json),
+        )
+
+
+def _host_prefix(url):
+    """Return the scheme://host/ prefix used to mount a per-host adapter."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}/"
+
+
+def _close_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class Transport:
+    def __init__(
+        self,
+        hosts=None,
+        pool_connections=DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize=DEFAULT_POOL_MAXSIZE,
+        session=None,
+        rate_limiter=None,
+        retry=None,
+        breakers=None,
+        timeout=DEFAULT_TIMEOUT,
+        hedge=None,
+    ):
+        """
+        Create a pooled HTTP transport.
+
+        Args:
+            hosts (list): Base URLs that get a dedicated connection pool. Any other host falls back to the session's default adapter.
+            pool_connections (int): Number of per-host pools the adapters keep.
+            pool_maxsize (int): Maximum number of keep-alive connections per host. Raise this when many threads share the transport.
+            session (requests.Session): An existing session to use instead of creating one.
+            rate_limiter (RateLimiter): Requests per second allowed for each host. Unlimited by default.
+            retry (RetryPolicy): When to retry transient failures. By default idempotent requests are retried twice with jittered backoff.
+            breakers (Breakers): Circuit breakers per endpoint. Defaults to Breakers() with its default thresholds.
+            timeout (tuple): (connect, read) timeout in seconds of every request, shortened to the current Deadline.
+            hedge (HedgePolicy): Send a second copy of slow idempotent requests. Off by default.
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self._session = session
+        self._mounted = set()
+        self._mount_lock = threading.Lock()
+        self.instrumentation = Instrumentation()
+        self.rate_limiter = rate_limiter
+        self.retry = retry or DEFAULT_RETRY_POLICY
+        self.breakers = breakers if breakers is not None else Breakers()
+        self.timeout = timeout
+        self.hedge = hedge
+        self._hedge_pool = None
+        for host in hosts or []:
+            self.mount(host)
+
+    @property
+    def session(self):
+        """The requests.Session, created with an adapter for every mounted host on first use."""
+        if self._session is None:
+            with self._mount_lock:
+                if self._session is None:
+                    import requests
+
+                    session = requests.Session()
+                    for prefix in self._mounted:
+                        session.mount(prefix, self._adapter())
+                    self._session = session
+        return self._session
+
+    def _adapter(self):
+        from requests.adapters import HTTPAdapter
+
+        return HTTPAdapter(
+            pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize
+        )
+
+    def mount(self, url):
+        """Give the host of url its own keep-alive pool (no-op if already mounted)."""
+        prefix = _host_prefix(url)
+        if prefix in self._mounted:
+            return
+        with self._mount_lock:
+            if prefix in self._mounted:
+                return
+            if self._session is not None:
+                self._session.mount(prefix, self._adapter())
+            self._mounted.add(prefix)
+
+    def prewarm(self, urls=None):
+        """
+        Open a connection to each host so later calls reuse a warm TLS session.
+
+        Args:
+            urls (list): URLs to warm up. Defaults to every mounted host.
+
+        Returns:
+            list: The host prefixes that were reached.
+        """
+        import requests
+
+        warmed = []
+        for url in urls or sorted(self._mounted):
+            prefix = _host_prefix(url)
+            self.mount(prefix)
+            try:
+                # The status does not matter, only that the connection is now pooled.
+                self.session.head(prefix, timeout=5).close()
+                warmed.append(prefix)
+            except requests.exceptions.RequestException as error:
+                logging.warning("Could not pre-warm %s %s", prefix, error)
+        return warmed
+
+    def request(self, method, url, **kwargs):
+        self.mount(url)
+        kwargs.setdefault("timeout", deadline.clamp(self.timeout))
+        return self.session.request(method, url, **kwargs)
+
+    def send(self, api_request):
+        """
+        Send an ApiRequest and return its decoded JSON body.
+
+        The request waits for its host's rate limiter. Connection errors and retryable statuses (429, 5xx) of
+        idempotent requests are retried per the retry policy, after Retry-After or a jittered backoff.
+
+        Hedged requests send a second copy when the first is slow and use whichever answers first.
+
+        Raises:
+            DeadlineExceeded: Without sending anything, when the current Deadline has passed.
+            CircuitOpenError: Without sending anything, while the endpoint's circuit breaker is open.
+            ApiError: When api_request.raise_errors is set and the answer has an error status.
+        """
+        deadline.check(api_request.description)
+        breaker = self.breakers.get(api_request)
+        if not breaker.allow():
+            raise CircuitOpenError(api_request.endpoint, breaker.retry_in())
+        try:
+            if self.hedge is not None and self.hedge.applies(api_request):
+                response = self._hedged(api_request)
+            else:
+                response = self._send(api_request)
+        except Exception:
+            breaker.record(False)
+            raise
+        breaker.record(response.status_code < 500 and response.status_code != 429)
+        if api_request.raise_errors and response.status_code >= 400:
+            try:
+                body = response.json()
+            except ValueError:
+                body = None
+            raise ApiError(api_request.endpoint, response.status_code, body)
+        return response.json()
+
+    def _send(self, api_request):
+        attempt = 1
+        while True:
+            if self.rate_limiter is not None:
+                wait = self.rate_limiter.reserve(api_request.url)
+                if wait > 0:
+                    time.sleep(wait)
+            try:
+                response = self._attempt(api_request, attempt)
+            except OSError:
+                # requests' connection errors and timeouts are OSErrors
+                if not self.retry.should_retry(api_request, attempt):
+                    raise
+                delay = self.retry.delay(attempt)
+                if not deadline.fits(delay):
+                    raise
+            else:
+                status = response.status_code
+                if not self.retry.should_retry(api_request, attempt, status):
+                    return response
+                after = retry_after(response.headers)
+                delay = self.retry.delay(attempt, after)
+                if status == 429 and self.rate_limiter is not None:
+                    # Hold every request to this host, not just this one, for as long as the server asked
+                    self.rate_limiter.pause(
+                        api_request.url, delay if after is None else after
+                    )
+                if delay is None or not deadline.fits(delay):
+                    return response
+            logging.warning(
+                "Retrying %s in %.2fs (attempt %s)",
+                api_request.description,
+                delay,
+                attempt,
+            )
+            time.sleep(delay)
+            attempt += 1
+
+    def _timed_send(self, api_request):
+        start = time.monotonic()
+        response = self._send(api_request)
+        self.hedge.observe(api_request.endpoint, time.monotonic() - start)
+        return response
+
+    def _hedged(self, api_request):
+        """Send api_request, plus a second copy if the first is slower than the hedge delay. The first good response wins."""
+        delay = self.hedge.delay(api_request.endpoint)
+        if delay is None:
+            return self._timed_send(api_request)
+        pool = self._hedges()
+        # copy_context carries the current Deadline into the worker threads
+        pending = {
+            pool.submit(contextvars.copy_context().run, self._timed_send, api_request)
+        }
+        done, _ = wait(pending, timeout=delay)
+        if not done:
+            logging.info("Hedging %s after %.3fs", api_request.description, delay)
+            pending.add(
+                pool.submit(
+                    contextvars.copy_context().run, self._timed_send, api_request
+                )
+            )
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                # A thread cannot be interrupted, the loser finishes and its response is dropped
+                for loser in pending:
+                    loser.add_done_callback(_close_response)
+                return future.result()
+        raise error
+
+    def _hedges(self):
+        if self._hedge_pool is None:
+            with self._mount_lock:
+                if self._hedge_pool is None:
+                    self._hedge_pool = ThreadPoolExecutor(
+                        max_workers=self.pool_maxsize,
+                        thread_name_prefix="opencuts-hedge",
+                    )
+        return self._hedge_pool
+
+    def _attempt(self, api_request, attempt):
+        """Send api_request once, reporting it to the observers if there are any."""
+        if not self.instrumentation.observers:
+            return self.request(
+                api_request.method, api_request.url, **api_request.kwargs()
+            )
+        event = self.instrumentation.start(api_request, attempt)
+        try:
+            response = self.request(
+                api_request.method, api_request.url, **api_request.kwargs()
+            )
+            event.status = response.status_code
+            event.bytes_received = len(response.content)
+            return response
+        except Exception as error:
+            event.error = error
+            raise
+        finally:
+            self.instrumentation.finish(event)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def close(self):
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+        if self._session is not None:
+            self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,114 @@
+import time
+from datetime import datetime
+
+from .availability import _minute
+from .models import SlotChanges
+
+""" Polling for slots that open up, used by RegisSalon.watch and AsyncRegisSalon.watch.
+    - PollSchedule: polls faster near the target times and after changes, backs off while nothing changes
+    - SlotDiff: compares each answer with the previous one, only a changed answer is parsed and diffed
+"""
+
+DEFAULT_INTERVAL = 30
+DEFAULT_MIN_INTERVAL = 5
+DEFAULT_MAX_INTERVAL = 120
+# How close (minutes) the clock must be to a target time for the fastest polling
+DEFAULT_TARGET_WINDOW = 60
+# Growth of the interval after every poll without changes
+BACKOFF = 1.5
+
+
+class PollSchedule:
+    def __init__(
+        self,
+        interval=DEFAULT_INTERVAL,
+        min_interval=DEFAULT_MIN_INTERVAL,
+        max_interval=DEFAULT_MAX_INTERVAL,
+        targets=(),
+        window=DEFAULT_TARGET_WINDOW,
+        now=None,
+        day=None,
+    ):
+        """
+        Seconds to wait between polls.
+
+        Args:
+            interval (float): The wait after a poll that found changes.
+            min_interval (float): The wait while the clock is within window minutes before a target time.
+            max_interval (float): The longest wait, reached after polls without changes.
+            targets (iterable): Times of day the caller hopes to book ("HH:MM", "HHMM" or minutes after midnight).
+            window (int): Minutes before a target time in which polling is fastest.
+            now (callable): Returns the current datetime. Defaults to datetime.now.
+            day (date): The day being watched. The target times only speed up polling on that day, None for whatever today is.
+        """
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.targets = sorted(_minute(target) for target in targets)
+        self.window = window
+        self.now = now or datetime.now
+        self.day = day
+        self._delay = interval
+
+    def near_target(self):
+        now = self.now()
+        # The targets are times of the watched day, the clock only nears them on that day
+        if self.day is not None and self.day != now.date():
+            return False
+        minute = now.hour * 60 + now.minute
+        return any(0 <= target - minute <= self.window for target in self.targets)
+
+    def next_delay(self, changed):
+        """The wait before the next poll, given whether the last one found changes."""
+        if changed:
+            self._delay = self.interval
+        else:
+            self._delay = min(self._delay * BACKOFF, self.max_interval)
+        if self.near_target():
+            return self.min_interval
+        return max(self._delay, self.min_interval)
+
+
+class SlotDiff:
+    def __init__(self, parse):
+        """
+        Tracks the open slots between polls.
+
+        Args:
+            parse (callable): Turns a decoded answer into a list of Slot models.
+        """
+        self.parse = parse
+        self.polls = 0
+        self._answer = None
+        self._slots = {}
+
+    def update(self, answer):
+        """
+        Compare an answer with the previous one.
+
+        Returns:
+            SlotChanges: The slots added and removed since the last poll, otherwise None if nothing changed.
+        """
+        self.polls += 1
+        if answer is None:
+            return None
+        first = self._answer is None
+        # An identical answer is the common case, skip parsing it altogether
+        if not first and answer == self._answer:
+            return None
+        self._answer = answer
+        slots = {(slot.stylist_id, slot.time): slot for slot in self.parse(answer)}
+        added = [slot for key, slot in slots.items() if key not in self._slots]
+        removed = [slot for key, slot in self._slots.items() if key not in slots]
+        self._slots = slots
+        if not first and not added and not removed:
+            return None
+        return SlotChanges(added, removed, slots.values(), self.polls)
+
+
+def sleep(seconds, stop=None):
+    """Wait seconds, or until the stop Event is set. Returns True when stopped."""
+    if stop is not None:
+        return stop.wait(seconds)
+    time.sleep(seconds)
+    return False
@@ -1,11 +1,19 @@
 import configparser
+import logging
 import opencuts.opencuts as opencuts
+from concurrent.futures import ThreadPoolExecutor
+from opencuts.cache import DiskCache
+from opencuts.ranking import SlotRanker
 import os
 import sys
 
 """ A CLI for Regis Salons.
 """
 DRY_RUN = False
+# Slots offered when no stylist is configured, earliest first across every stylist
+EARLIEST_SLOTS = 10
+# Pass --refresh to ignore the cached salon, services and stylists
+REFRESH = "--refresh" in sys.argv
 
 # Check to make sure the config exists
 if not os.path.exists("config.ini"):
@@ -61,6 +69,26 @@ def get_choice(first_number: int, last_number: int):
             print("Invalid input. Please enter a number.")
 
 
+def wait_for_catalog():
+    """Wait for the services and stylists loading in the background."""
+    for future in catalog:
+        future.result()
+
+
+def choose_slot(booking_slots):
+    print(
+        "\n--------------------\n",
+        "Choose an open slot:",
+        "\n--------------------\n",
+    )
+    # Using enumerate with its default start value (0)
+    for slot_num, slot in enumerate(booking_slots):
+        print(f"[{slot_num}] - Time Slot {slot.time} Available\n")
+    selected_slot = booking_slots[get_choice(0, len(booking_slots))]
+    print("Selected Slot: " + selected_slot.time)
+    return selected_slot
+
+
 # Our menu function and logic for each action
 def main_menu():
     while True:
@@ -76,6 +104,8 @@ def main_menu():
             MY_SERVICE + "\n" "MY_STYLIST:",
             MY_STYLIST + "\n",
         )
+        if mySalon.stale:
+            print("The salon API is not answering, showing saved results\n")
         print("\nMain Menu:\n")
         print("1. Book an Appointment")
         print("2. View My Appointments")
@@ -87,123 +117,58 @@ def main_menu():
         choice = get_choice(1, 7)
 
         if choice == 1:
+            wait_for_catalog()
             if mySalon.pos_type.lower() == "zenoti":
                 # look up the ID for the stylist and service
                 selected_stylist = mySalon.find_stylist_by_name(MY_STYLIST)
                 selected_service = mySalon.find_service_by_name(MY_SERVICE)
 
-                # get some booking slots for the stylist and service selected
-                booking_id = mySalon.create_service_booking(
-                    selected_service, selected_stylist
+                print("Looking up account information and open slots")
+                # The guest lookup runs alongside slot discovery, the chosen slot is reserved and confirmed right away
+                result = mySalon.book(
+                    selected_service,
+                    selected_stylist,
+                    FIRST_NAME,
+                    LAST_NAME,
+                    PHONE_NUMBER,
+                    choose=choose_slot,
+                    dry_run=DRY_RUN,
                 )
-                booking_slots = mySalon.get_booking_slot(booking_id)
-                # Present and select a slot if there are any slots available
-                # TODO Perhaps move this to a method
-                if len(booking_slots) > 0:
+                if result.error:
+                    print(f"Could not book: {result.error}")
+                elif result.confirmed:
                     print(
-                        "\n--------------------\n",
-                        "Choose an open slot:",
-                        "\n--------------------\n",
+                        f"Booked {result.slot.time} - confirmed in {result.slot_to_confirm:.2f}s"
                     )
-                    # Using enumerate with its default start value (0)
-                    for slot_num, slot in enumerate(booking_slots["slots"]):
-                        print(f"[{slot_num}] - Time Slot {slot['Time']} Available\n")
-                    selected_slot = None
-                    while selected_slot is None:
-                        selected_slot_num = get_choice(0, len(booking_slots["slots"]))
-                        # Directly use the input number as the index
-                        selected_slot = booking_slots["slots"][selected_slot_num]
-                    print("Selected Slot: " + selected_slot["Time"])
-                    # If you select a slot, continue the rest of the booking flow
-                    # TODO - Refactor this to a method
-                    print("Looking up account information")
-                    try:
-                        account_id = mySalon.retrive_guest_detail(
-                            first_name=FIRST_NAME,
-                            last_name=LAST_NAME,
-                            phone=PHONE_NUMBER,
-                        )
-                        account_id = account_id["id"]
-                    except:
-                        print("Coud not look up account information")
-                    # Flow to handle creating an account if none exists
-                    if not account_id:
-                        print("You neeed to make an account - Creating one")
-                        account_id = mySalon.create_account(
-                            first_name=FIRST_NAME,
-                            last_name=LAST_NAME,
-                            phone_number=PHONE_NUMBER,
-                        )
-                        account_id = account_id["id"]
-                    # Get another unique booking_ID passing in the user information this time
-                    booking_id = mySalon.create_service_booking(
-                        selected_service, selected_stylist, account_id
-                    )
-                    # Logic to actually reserve and confirm your slot
-                    if not DRY_RUN:
-                        print("Reserving slot")
-                        try:
-                            mySalon.reserve_selected_slot(selected_slot, booking_id)
-                        except:
-                            print("Could not reserve slot")
-                            sys.exit()
-                        print("Confirming Slot")
-                        try:
-                            mySalon.confirm_selected_slot(booking_id)
-                        except:
-                            print("Could not confirm slot")
-                else:
-                    print("No booking slots available")
             else:
-                selected_service = str(mySalon.find_service_by_name(MY_SERVICE))
+                selected_service = str(mySalon.find_service_by_name(MY_SERVICE).id)
                 booking_slots = mySalon.get_availability_of_salon(selected_service)
-                # TODO Present and select a slot if there are any slots available
-                # TODO Perhaps move this to a method
-                if len(booking_slots) > 0:
+                if booking_slots:
+                    # Without a stylist, offer the earliest slots of everyone working
                     if MY_STYLIST == "":
-                        # Logic to choose a name since we don't have one defined
-                        print(
-                            "\n--------------------\n",
-                            "Choose a name:",
-                            "\n--------------------\n",
-                        )
-                        # Using enumerate with its default start value (0)
-                        for slot_num, slot in enumerate(booking_slots):
-                            print(f"[{slot_num}] Name: {slot['name']}\n")
-                        selected_slot = None
-                        while selected_slot is None:
-                            selected_slot_num = get_choice(0, len(booking_slots))
-                            # Directly use the input number as the index
-                            selected_slot = booking_slots[selected_slot_num]
-                    # We already have a name defined
+                        timeslots = SlotRanker(booking_slots).rank(EARLIEST_SLOTS)
                     else:
-                        # Find the object containing the name we want to search for
-                        for name in booking_slots:
-                            if name["name"] == MY_STYLIST:
-                                selected_slot = name
+                        timeslots = SlotRanker(booking_slots).rank(
+                            len(booking_slots), stylists=[MY_STYLIST]
+                        )
                     print("Available Timeslots: ")
-                    timeslots = []
-                    for hour_block in selected_slot["times"]["hours"]:
-                        hour = hour_block["h"]
-                        for slot, minute in enumerate(hour_block["m"]):
-                            # Format the time as HH:MM
-                            formatted_time = f"{hour:02d}:{minute:02d}"
-                            timeslots.append(formatted_time)
                     if len(timeslots) > 0:
-                        for slot, time in enumerate(timeslots):
-                            print(f"[{slot}] - Time {time}")
+                        for slot_num, slot in enumerate(timeslots):
+                            print(
+                                f"[{slot_num}] - Time {slot.label} - {slot.stylist_name}"
+                            )
                         selected_time = get_choice(0, len(timeslots))
-                        time = timeslots[selected_time]
-                        selected_stylist = selected_slot["name"]
-                        selected_stylist_id = selected_slot["employeeID"]
-                        time = time.replace(
-                            ":", ""
-                        )  # format time to match what the API expects
+                        selected_slot = timeslots[selected_time]
+                        selected_stylist = selected_slot.stylist_name
+                        selected_stylist_id = selected_slot.stylist_id
+                        time = (
+                            selected_slot.time
+                        )  # already formatted as the API expects
                         # Create a list to send my service in
                         formatted_service = []
                         formatted_service.append(MY_SERVICE)
                         clear_screen()
-                        print(f"Selected time: {timeslots[selected_time]}")
+                        print(f"Selected time: {selected_slot.label}")
                         print(
                             f"Selected Stylist: {selected_stylist} - ID: {selected_stylist_id}  "
                         )
@@ -234,22 +199,9 @@ def main_menu():
             # TODO - Refactor this to a method
             if mySalon.pos_type.lower() == "zenoti":
                 print("Looking up account information")
-                try:
-                    account_id = mySalon.retrive_guest_detail(
-                        first_name=FIRST_NAME, last_name=LAST_NAME, phone=PHONE_NUMBER
-                    )
-                    account_id = account_id["id"]
-                except:
-                    print("Coud not look up account information")
-                # Flow to handle creating an account if none exists
+                account_id = mySalon.resolve_guest(FIRST_NAME, LAST_NAME, PHONE_NUMBER)
                 if not account_id:
-                    print("You neeed to make an account - Creating one")
-                    account_id = mySalon.create_account(
-                        first_name=FIRST_NAME,
-                        last_name=LAST_NAME,
-                        phone_number=PHONE_NUMBER,
-                    )
-                    account_id = account_id["id"]
+                    print("Coud not look up account information")
                 appointments = mySalon.get_appointments(account_id)
                 if not appointments:
                     print("No Appointments today")
@@ -264,33 +216,18 @@ def main_menu():
                 else:
                     print("Your Appointments Today:")
                     for apt in appointments:
-                        print(
-                            f"{apt['date']} - {apt['time']} - service {apt['services'][0]}"
-                        )
+                        print(f"{apt.date} - {apt.time} - service {apt.services[0]}")
             input("Press any key to continue")
         elif choice == 3:
             # TODO - Make this call a method.
             if mySalon.pos_type.lower() == "zenoti":
                 print("Looking up account information")
-                try:
-                    account_id = mySalon.retrive_guest_detail(
-                        first_name=FIRST_NAME, last_name=LAST_NAME, phone=PHONE_NUMBER
-                    )
-                    account_id = account_id["id"]
-                except:
-                    print("Coud not look up account information")
-                # Flow to handle creating an account if none exists
+                account_id = mySalon.resolve_guest(FIRST_NAME, LAST_NAME, PHONE_NUMBER)
                 if not account_id:
-                    print("You neeed to make an account - Creating one")
-                    account_id = mySalon.create_account(
-                        first_name=FIRST_NAME,
-                        last_name=LAST_NAME,
-                        phone_number=PHONE_NUMBER,
-                    )
-                    account_id = account_id["id"]
+                    print("Coud not look up account information")
                 appointments = mySalon.get_appointments(account_id)
                 print(appointments)
-                if len(appointments) > 0:
+                if appointments:
                     print("Appointment List:")
                     # Using enumerate with its default start value (0)
                     for slot_num, ap in enumerate(appointments):
@@ -313,47 +250,47 @@ def main_menu():
             else:
                 print("Looking up appointments")
                 appointments = mySalon.get_check_in_by_source()
-                if len(appointments) > 0:
+                if appointments:
                     # Using enumerate with its default start value (0)
                     for slot_num, ap in enumerate(appointments):
-                        print(f"[{slot_num}] - Time Slot {ap['time']} \n")
+                        print(f"[{slot_num}] - Time Slot {ap.time} \n")
                     selected_slot_num = None
                     while selected_slot_num is None:
                         selected_slot_num = get_choice(0, len(appointments))
                         # Directly use the input number as the index
                         selected_appointment = appointments[selected_slot_num]
-                    print("Selected Appointment: " + selected_appointment["time"])
+                    print("Selected Appointment: " + selected_appointment.time)
                     print("Cancelling Appointment")
-                    mySalon.cancel_checkin(selected_appointment["checkinId"])
+                    mySalon.cancel_checkin(selected_appointment.id)
             input("Press any key to continue")
 
         elif choice == 4:
+            wait_for_catalog()
             print("\nStore Services:\n")
             # TODO -  move logic to a method
             if mySalon.pos_type.lower() == "zenoti":
                 for service in mySalon.store_services:
-                    print(
-                        f"Service Name: {service['catalog_info']['display_name']}, ID: {service['id']}\n"
-                    )
+                    print(f"Service Name: {service.name}, ID: {service.id}\n")
             else:
-                for category in mySalon.store_services:
-                    print(f"Category: {category['category']}\n")
-                    for service in category["services"]:
-                        print("  Service ID:", service["id"])
-                        print("  Service Name:", service["service"])
+                category = None
+                for service in mySalon.store_services:
+                    if service.category != category:
+                        category = service.category
+                        print(f"Category: {category}\n")
+                    print("  Service ID:", service.id)
+                    print("  Service Name:", service.name)
             input("Press any key to continue")
 
         elif choice == 5:
+            wait_for_catalog()
             print("\nStore Stylists:\n")
             # TODO - move logic to a method
             if mySalon.pos_type.lower() == "zenoti":
                 for therapist in mySalon.therapists:
-                    print(
-                        f"Stylist Name: {therapist['personal_info']['name']}, ID: {therapist['id']}\n"
-                    )
+                    print(f"Stylist Name: {therapist.name}, ID: {therapist.id}\n")
             else:
                 for therapist in mySalon.therapists:
-                    print(f"Stylist Name: {therapist['name']}\n")
+                    print(f"Stylist Name: {therapist.name}\n")
             input("Press any key to continue")
 
         elif choice == 6:
@@ -364,10 +301,22 @@ def main_menu():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
     # Instantiate the class and get some information about the salon
-    mySalon = opencuts.RegisSalon(SALON_ID, REGIS_API_KEY, REGIS_API_BOOKING_KEY)
-    mySalon.get_salon()  # get salon information
-    mySalon.get_salon_services()  # get all the services the salon offers
-    mySalon.get_therapists_working()  # get the stylist information
+    mySalon = opencuts.RegisSalon(
+        SALON_ID,
+        REGIS_API_KEY,
+        REGIS_API_BOOKING_KEY,
+        cache=DiskCache(bypass=REFRESH),
+    )
+    mySalon.get_salon()  # get salon information, the only call before the menu
+    # Services and stylists load in the background, the menu waits for them only when it needs them
+    background = ThreadPoolExecutor(max_workers=2)
+    catalog = [
+        background.submit(mySalon.get_salon_services),
+        background.submit(mySalon.get_therapists_working),
+    ]
     # start the menu mainu
     main_menu()
@@ -0,0 +1,241 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from opencuts import AsyncRegisSalon, AsyncTransport
+from opencuts.cache import DiskCache
+from opencuts.store import SalonStore
+from opencuts.instrumentation import Metrics
+from opencuts.testing import FakeRegisServer
+
+
+class TestAsyncRegisSalon(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = FakeRegisServer(zenoti_salons=("1000",)).start()
+        self.addCleanup(self.server.stop)
+
+    async def asyncSetUp(self):
+        self.transport = AsyncTransport(max_concurrency=4)
+
+    async def asyncTearDown(self):
+        await self.transport.close()
+
+    def salon(self, salon_id):
+        return self.server.configure(
+            AsyncRegisSalon(salon_id, "key", "booking_key", transport=self.transport)
+        )
+
+    async def test_zenoti_booking_flow(self):
+        salon = self.salon("1000")
+        api_key, store_id, pos_type = await salon.get_salon()
+        self.assertEqual(pos_type, "Zenoti")
+        await asyncio.gather(salon.get_salon_services(), salon.get_therapists_working())
+        service = salon.find_service_by_name("Supercut")
+        stylist = salon.find_stylist_by_name("Stylist 1")
+        booking_id = await salon.create_service_booking(service, stylist)
+        slots = await salon.get_booking_slot(booking_id)
+        self.assertGreater(len(slots), 0)
+        guest = await salon.create_account("Edward", "Hands", "5558675309")
+        self.assertEqual(
+            (await salon.retrive_guest_detail("Edward", "Hands", "5558675309"))["id"],
+            guest["id"],
+        )
+        reserved = await salon.reserve_selected_slot(slots[0], booking_id)
+        confirmed = await salon.confirm_selected_slot(booking_id)
+        self.assertTrue(reserved["is_reserved"])
+        self.assertTrue(confirmed["is_confirmed"])
+        self.assertEqual(await salon.get_appointments(guest["id"]), {})
+
+    async def test_book(self):
+        salon = self.salon("1000")
+        await salon.get_salon()
+        await salon.get_salon_services()
+        service = salon.find_service_by_name("Supercut")
+        result = await salon.book(service, None, "Edward", "Hands", "5558675309")
+        self.assertTrue(result.confirmed)
+        again = await salon.book(service, None, "Edward", "Hands", "5558675309")
+        self.assertEqual(again.guest_id, result.guest_id)
+        self.assertEqual(self.server.hits["guests/search"], 1)
+        self.assertEqual(self.server.hits["bookings"], 3)
+
+    async def test_failed_booking_fails_the_booking(self):
+        salon = self.salon("1000")
+        await salon.get_salon()
+        await salon.get_salon_services()
+        service = salon.find_service_by_name("Supercut")
+        self.server.fail("bookings", status=503, times=2)
+        result = await salon.book(service, None, "Edward", "Hands", "5558675309")
+        self.assertEqual(result.error, "booking failed")
+        self.assertNotIn("bookings/slots", self.server.hits)
+
+    async def test_metrics(self):
+        salon = self.salon("1000")
+        metrics = salon.instrumentation.attach(Metrics())
+        await salon.get_salon()
+        await salon.get_appointments("guest-unknown")
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["salon"]["statuses"], {200: 1})
+        self.assertEqual(snapshot["guests/appointments"]["errors"], 1)
+
+    async def test_regis_check_in_flow(self):
+        salon = self.salon("2000")
+        await salon.get_salon()
+        services, stylists = await asyncio.gather(
+            salon.get_salon_services(), salon.get_therapists_working()
+        )
+        self.assertEqual(self.server.hits["getsalondetails"], 1)
+        slots = await salon.get_availability_of_salon(str(services[0].id))
+        checkin = await salon.add_check_in(
+            "Edward",
+            "Hands",
+            "5558675309",
+            str(services[0].id),
+            [services[0].name],
+            slots[0].stylist_id,
+            slots[0].stylist_name,
+            slots[0].time,
+            "edward@example.com",
+        )
+        checkins = await salon.get_check_in_by_source()
+        self.assertIn(checkin.id, [entry.id for entry in checkins])
+        await salon.cancel_checkin(checkin.id)
+
+    async def test_salons_share_details_request(self):
+        salons = [self.salon("3000") for _ in range(3)]
+        await asyncio.gather(*(salon.get_salon() for salon in salons))
+        self.assertEqual(self.server.hits["getsalondetails"], 1)
+
+    async def test_scan_availability(self):
+        salon = self.salon("1000")
+        await salon.get_salon()
+        await salon.get_salon_services()
+        service = salon.find_service_by_name("Supercut")
+        days = await salon.scan_availability(service, days=3)
+        self.assertEqual([day.error for day in days], [None] * 3)
+        self.assertEqual(len({day.date for day in days}), 3)
+        await salon.scan_availability(service, days=3)
+        self.assertEqual(self.server.hits["bookings"], 3)
+
+    async def test_a_failed_day_does_not_abort_the_scan(self):
+        salon = self.salon("1000")
+        await salon.get_salon()
+        await salon.get_salon_services()
+        service = salon.find_service_by_name("Supercut")
+        self.server.fail("bookings", status=503)
+        days = await salon.scan_availability(service, days=3)
+        self.assertEqual(
+            sorted(day.error or "" for day in days),
+            ["", "", "availability lookup failed"],
+        )
+
+    async def test_scan_availability_caps_days_in_flight(self):
+        salon = self.salon("1000")
+        await salon.get_salon()
+        await salon.get_salon_services()
+        service = salon.find_service_by_name("Supercut")
+        create = salon.create_service_booking
+        in_flight = peak = 0
+
+        async def counted(*args, **kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            try:
+                await asyncio.sleep(0.01)
+                return await create(*args, **kwargs)
+            finally:
+                in_flight -= 1
+
+        salon.create_service_booking = counted
+        with patch("opencuts.aio.SCAN_CONCURRENCY", 2):
+            days = await salon.scan_availability(service, days=6)
+        self.assertEqual([day.error for day in days], [None] * 6)
+        self.assertEqual(peak, 2)
+
+    async def test_get_schedule(self):
+        salon = self.salon("1000")
+        await salon.get_salon()
+        schedule = await salon.get_schedule(days=2, concurrency=2)
+        self.assertEqual(len(schedule.shifts), len(salon.therapists))
+        self.assertEqual(schedule.errors, {})
+        self.assertIs(await salon.get_schedule(days=2), schedule)
+
+    async def test_find_slots_skips_refused_stylists(self):
+        self.server.skills = {0: {1}}
+        salon = self.salon("1000")
+        await salon.get_salon()
+        await salon.get_salon_services()
+        service = salon.find_service_by_name("Supercut")
+        result = await salon.find_slots(service, concurrency=2)
+        self.assertEqual(len({slot.stylist_id for slot in result.slots}), 3)
+        await salon.find_slots(service)
+        self.assertEqual(self.server.hits["bookings"], 7)
+
+    async def test_find_slots_failures_exclude_nobody(self):
+        salon = self.salon("1000")
+        await salon.get_salon()
+        await salon.get_salon_services()
+        service = salon.find_service_by_name("Supercut")
+        self.server.fail("bookings", 503, times=4)
+        result = await salon.find_slots(service)
+        self.assertEqual(result.error, "availability lookup failed")
+        self.assertEqual(salon.eligibility.excluded, [])
+
+    async def test_disk_cache_stays_off_the_loop(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "cache.db")
+        salon = self.server.configure(
+            AsyncRegisSalon(
+                "1000",
+                "key",
+                "booking_key",
+                transport=self.transport,
+                cache=DiskCache(path, lock_timeout=5),
+            )
+        )
+        # Another process holding the write lock does not stall the coroutines
+        writer = sqlite3.connect(path, isolation_level=None)
+        writer.execute("BEGIN IMMEDIATE")
+        start = time.monotonic()
+        await salon.get_salon()
+        await salon.get_salon_services()
+        self.assertLess(time.monotonic() - start, 2)
+        writer.execute("COMMIT")
+        writer.close()
+        await salon.flush()
+        self.assertEqual(DiskCache(path).get("salon", "1000")["salon_id"], "1000")
+
+    async def test_store_writes_stay_off_the_loop(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        store = SalonStore(os.path.join(directory.name, "store.db"))
+        threads = []
+        save = store.save_availability
+
+        def recording(*args):
+            threads.append(threading.current_thread())
+            return save(*args)
+
+        store.save_availability = recording
+        salon = self.server.configure(
+            AsyncRegisSalon(
+                "2000", "key", "booking_key", transport=self.transport, store=store
+            )
+        )
+        await salon.get_salon()
+        await salon.get_salon_services()
+        await salon.scan_availability(salon.find_service_by_name("Supercut"), days=2)
+        await salon.flush()
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.main_thread(), threads)
+        self.assertEqual(store.salon("2000").name, "Salon 2000")
+        self.assertEqual(len(store.open_slots("Supercut")), 32)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from opencuts.availability import AvailabilityIndex, label
+from opencuts.models import Slot, Stylist, slots_from_regis_availability
+
+REGIS = [
+    {
+        "name": "Ann",
+        "employeeID": 1,
+        "times": {"hours": [{"h": 14, "m": [0, 30]}, {"h": 17, "m": [15]}]},
+    },
+    {"name": "Bo", "employeeID": 2, "times": {"hours": [{"h": 14, "m": [30, 45]}]}},
+]
+ZENOTI = {"slots": [{"Time": "2024-03-04T14:30:00"}, {"Time": "2024-03-04T18:00:00"}]}
+
+
+class TestAvailabilityIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = AvailabilityIndex()
+        self.index.add_regis(REGIS, "2000")
+        self.index.add_zenoti(ZENOTI, "1000", Stylist(7, "Cy"))
+
+    def test_free_at(self):
+        self.assertEqual(
+            self.index.free_at("14:30"), [("2000", 1), ("2000", 2), ("1000", 7)]
+        )
+        self.assertEqual(self.index.free_at(14 * 60), [("2000", 1)])
+        self.assertEqual(self.index.free_at("0300"), [])
+        self.assertTrue(self.index.is_free(("1000", 7), "18:00"))
+        self.assertEqual(self.index.names[("2000", 2)], "Bo")
+
+    def test_first_after(self):
+        self.assertEqual(self.index.first_after("17:00"), (17 * 60 + 15, [("2000", 1)]))
+        self.assertEqual(self.index.first_after("17:16"), (18 * 60, [("1000", 7)]))
+        self.assertEqual(
+            self.index.first_after("14:31", ("2000", 2)), (14 * 60 + 45, [("2000", 2)])
+        )
+        self.assertIsNone(self.index.first_after("18:01"))
+
+    def test_common_minutes_across_salons(self):
+        self.assertEqual(self.index.common_minutes(), [14 * 60 + 30])
+        self.assertEqual(self.index.common_minutes(["2000", "9999"]), [])
+        self.assertEqual(label(self.index.common_minutes()[0]), "14:30")
+
+    def test_slots_and_raw_payloads_agree(self):
+        from_slots = AvailabilityIndex.from_slots(
+            slots_from_regis_availability(REGIS, "2000")
+        )
+        for key in from_slots.keys():
+            self.assertEqual(from_slots.bitmap(key), self.index.bitmap(key))
+
+    def test_replace_clears_old_minutes(self):
+        self.index.replace("2000", 1, ["09:00"])
+        self.assertEqual(self.index.minutes(("2000", 1)), [9 * 60])
+        self.assertNotIn(("2000", 1), self.index.free_at("14:30"))
+        self.assertEqual(self.index.first_after("00:00"), (9 * 60, [("2000", 1)]))
+
+    def test_add_slots_merges(self):
+        self.index.add_slots([Slot("0800", 8 * 60, 2, "Bo", "2000")])
+        self.assertEqual(
+            self.index.minutes(("2000", 2)), [8 * 60, 14 * 60 + 30, 14 * 60 + 45]
+        )
+        self.assertEqual(len(self.index), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import time
+import unittest
+from opencuts import RegisSalon, Transport
+from opencuts.breaker import CLOSED, HALF_OPEN, OPEN, Breakers, CircuitBreaker
+from opencuts.retry import RetryPolicy
+from opencuts.testing import FakeRegisServer
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_on_failure_rate_and_probes(self):
+        breaker = CircuitBreaker(
+            failure_rate=0.5, window=4, min_calls=4, reset_timeout=0.05
+        )
+        for success in (True, False, True):
+            breaker.record(success)
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.record(False)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow())
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, HALF_OPEN)
+        # Only one probe at a time
+        self.assertFalse(breaker.allow())
+        breaker.record(True)
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker(min_calls=1, reset_timeout=0.01)
+        breaker.record(False)
+        time.sleep(0.02)
+        self.assertTrue(breaker.allow())
+        breaker.record(False)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow())
+
+
+class TestStaleWhileRevalidate(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRegisServer(zenoti_salons=()).start()
+        self.addCleanup(self.server.stop)
+        self.transport = Transport(
+            retry=RetryPolicy(retries=0),
+            breakers=Breakers(min_calls=2, reset_timeout=0.2),
+        )
+        self.salon = self.server.configure(
+            RegisSalon("2000", "key", "booking_key", transport=self.transport)
+        )
+        self.salon.get_salon()
+
+    def test_serves_last_good_response_and_recovers(self):
+        slots = self.salon.get_availability_of_salon("100")
+        self.server.fail("getavailabilityofsalon", 503, times=100)
+        for _ in range(5):
+            self.assertEqual(self.salon.get_availability_of_salon("100"), slots)
+        self.assertIn("getavailabilityofsalon", self.salon.stale)
+        # One success and one failure reach the 50% failure rate, the other calls failed fast
+        self.assertEqual(self.server.hits["getavailabilityofsalon"], 2)
+        self.server.failures.clear()
+        time.sleep(0.4)
+        # The background probe refreshed the response and closed the breaker
+        self.assertNotIn("getavailabilityofsalon", self.salon.stale)
+        self.assertEqual(self.server.hits["getavailabilityofsalon"], 3)
+        self.assertEqual(self.salon.get_availability_of_salon("100"), slots)
+
+    def test_writes_are_not_served_stale(self):
+        def check_in():
+            return self.salon.add_check_in(
+                "Edward",
+                "Hands",
+                "5558675309",
+                "100",
+                ["Supercut"],
+                "500",
+                "Stylist 0",
+                "0900",
+                "",
+            )
+
+        self.assertIsNotNone(check_in().id)
+        self.server.fail("addcheckin", 503)
+        self.assertIsNone(check_in().id)
+        self.assertEqual(self.salon.stale, {})
@@ -0,0 +1,168 @@
+import datetime
+import os
+import tempfile
+import threading
+import time
+import unittest
+from opencuts import RegisSalon
+from opencuts.cache import DayCache, DiskCache, SingleFlight
+from opencuts.testing import FakeRegisServer
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_callers_share_one_call(self):
+        flights = SingleFlight()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.05)
+            return "details"
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(flights.do("1234", fetch)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["details"] * 5)
+
+    def test_errors_are_not_cached(self):
+        flights = SingleFlight()
+        with self.assertRaises(ValueError):
+            flights.do("1234", lambda: (_ for _ in ()).throw(ValueError()))
+        self.assertEqual(flights.do("1234", lambda: "ok"), "ok")
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "cache.db")
+
+    def test_round_trip_and_ttl(self):
+        cache = DiskCache(self.path, ttls={"salon": 60, "services": -1})
+        cache.set("salon", "1234", {"name": "Main"})
+        cache.set("services", "1234", [1, 2])
+        self.assertEqual(cache.get("salon", "1234"), {"name": "Main"})
+        self.assertIsNone(cache.get("services", "1234"))
+        # Another instance (or process) on the same file sees the entry
+        self.assertEqual(DiskCache(self.path).get("salon", "1234"), {"name": "Main"})
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = DiskCache(self.path, max_entries=2)
+        cache.set("salon", "1", 1)
+        time.sleep(0.01)
+        cache.set("salon", "2", 2)
+        time.sleep(0.01)
+        cache.get("salon", "1")
+        time.sleep(0.01)
+        cache.set("salon", "3", 3)
+        self.assertIsNone(cache.get("salon", "2"))
+        self.assertEqual(cache.get("salon", "1"), 1)
+        self.assertEqual(len(cache), 2)
+
+    def test_reads_do_not_wait_for_a_writer(self):
+        import sqlite3
+
+        cache = DiskCache(self.path, lock_timeout=5)
+        cache.set("salon", "1", "Main")
+        writer = sqlite3.connect(self.path, isolation_level=None)
+        self.addCleanup(writer.close)
+        writer.execute("BEGIN IMMEDIATE")
+        start = time.monotonic()
+        self.assertEqual(cache.get("salon", "1"), "Main")
+        self.assertLess(time.monotonic() - start, 1)
+        writer.execute("COMMIT")
+
+    def test_the_file_is_private(self):
+        DiskCache(self.path)
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+        other = os.path.join(os.path.dirname(self.path), "shared.db")
+        DiskCache(other, mode=0o640)
+        self.assertEqual(os.stat(other).st_mode & 0o777, 0o640)
+
+    def test_bypass_skips_reads_but_writes(self):
+        DiskCache(self.path, bypass=True).set("salon", "1", "fresh")
+        self.assertIsNone(DiskCache(self.path, bypass=True).get("salon", "1"))
+        self.assertEqual(DiskCache(self.path).get("salon", "1"), "fresh")
+
+    def test_salon_metadata_survives_restarts(self):
+        with FakeRegisServer(zenoti_salons=("1000",)) as server:
+            for _ in range(2):
+                salon = server.configure(
+                    RegisSalon("1000", "key", "booking_key", cache=DiskCache(self.path))
+                )
+                self.assertEqual(salon.get_salon()[2], "Zenoti")
+                self.assertEqual(len(salon.get_salon_services()), server.services)
+                self.assertEqual(len(salon.get_therapists_working()), server.stylists)
+            self.assertEqual(server.hits["salon"], 1)
+            self.assertEqual(server.hits["centers/services"], 1)
+            self.assertEqual(server.hits["centers/therapists"], 1)
+            salon.get_salon(refresh=True)
+            self.assertEqual(server.hits["salon"], 2)
+
+
+class TestDayCache(unittest.TestCase):
+    def test_entries_expire_and_roll_over_at_midnight(self):
+        today = [datetime.date(2024, 3, 1)]
+        cache = DayCache(ttl=0.05, today=lambda: today[0])
+        tomorrow = datetime.date(2024, 3, 2)
+        cache.set("slots", today[0], (1, 2))
+        cache.set("slots", tomorrow, (3,))
+        self.assertEqual(cache.get("slots", today[0]), (1, 2))
+        today[0] = tomorrow
+        # Yesterday is gone and the rollover dropped every cached day
+        self.assertIsNone(cache.get("slots", datetime.date(2024, 3, 1)))
+        self.assertIsNone(cache.get("slots", tomorrow))
+        cache.set("slots", tomorrow, (4,))
+        self.assertEqual(cache.get("slots", tomorrow), (4,))
+        time.sleep(0.06)
+        self.assertIsNone(cache.get("slots", tomorrow))
+
+
+class TestGuestCache(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRegisServer(zenoti_salons=("1000",)).start()
+        self.addCleanup(self.server.stop)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "cache.db")
+
+    def salon(self):
+        salon = self.server.configure(
+            RegisSalon("1000", "key", "booking_key", cache=DiskCache(self.path))
+        )
+        salon.get_salon()
+        return salon
+
+    def test_repeat_lookups_skip_the_search(self):
+        salon = self.salon()
+        guest_id = salon.resolve_guest("Edward", "Hands", "555-867-5309")
+        self.assertEqual(self.server.hits["guests"], 1)
+        self.assertEqual(
+            salon.resolve_guest("edward", " Hands", "5558675309"), guest_id
+        )
+        # A new process reads the id from the disk cache
+        self.assertEqual(
+            self.salon().resolve_guest("Edward", "Hands", "5558675309"), guest_id
+        )
+        self.assertEqual(self.server.hits["guests/search"], 1)
+
+    def test_failed_call_forgets_the_guest(self):
+        salon = self.salon()
+        guest_id = salon.resolve_guest("Edward", "Hands", "5558675309")
+        self.server.guests.clear()
+        self.assertIsNone(salon.get_appointments(guest_id))
+        new_id = self.salon().resolve_guest("Edward", "Hands", "5558675309")
+        self.assertNotEqual(new_id, guest_id)
+        self.assertEqual(self.server.hits["guests/search"], 2)
+        self.assertEqual(salon.get_appointments(new_id), {})
@@ -0,0 +1,96 @@
+import time
+import unittest
+from opencuts import RegisSalon, Transport
+from opencuts import deadline
+from opencuts.deadline import Deadline, DeadlineExceeded
+from opencuts.retry import HedgePolicy, RetryPolicy
+from opencuts.testing import FakeRegisServer
+
+
+class TestDeadline(unittest.TestCase):
+    def test_clamps_timeouts_to_the_time_left(self):
+        self.assertEqual(deadline.clamp((3.05, 15)), (3.05, 15))
+        with Deadline(1.0):
+            connect, read = deadline.clamp((3.05, 15))
+            self.assertLessEqual(read, 1.0)
+            self.assertEqual(connect, read)
+            self.assertEqual(deadline.clamp(0.5), 0.5)
+
+    def test_nested_deadline_never_extends_the_outer_one(self):
+        with Deadline(0.5) as outer:
+            with Deadline(10) as inner:
+                self.assertEqual(inner.expires, outer.expires)
+                self.assertIs(deadline.current_deadline(), inner)
+            self.assertIs(deadline.current_deadline(), outer)
+        self.assertIsNone(deadline.remaining())
+
+    def test_check_raises_once_expired(self):
+        with Deadline(0.01):
+            deadline.check("get salon")
+            time.sleep(0.02)
+            with self.assertRaises(DeadlineExceeded):
+                deadline.check("get salon")
+
+
+class TestTimeouts(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRegisServer(zenoti_salons=("1000",)).start()
+        self.addCleanup(self.server.stop)
+
+    def salon(self, transport):
+        self.addCleanup(transport.close)
+        salon = self.server.configure(
+            RegisSalon("1000", "key", "booking_key", transport=transport)
+        )
+        salon.get_salon()
+        salon.get_salon_services()
+        return salon
+
+    def test_read_timeout_bounds_a_stuck_call(self):
+        salon = self.salon(Transport(retry=RetryPolicy(retries=0), timeout=(1, 0.1)))
+        self.server.stall("bookings", 1.0)
+        start = time.monotonic()
+        self.assertIsNone(
+            salon.create_service_booking(salon.find_service_by_name("Supercut"), None)
+        )
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_booking_deadline_covers_the_whole_flow(self):
+        salon = self.salon(Transport(retry=RetryPolicy(retries=0)))
+        self.server.stall("bookings/slots", 1.0, times=2)
+        start = time.monotonic()
+        result = salon.book(
+            salon.find_service_by_name("Supercut"),
+            None,
+            "Edward",
+            "Hands",
+            "5558675309",
+            deadline=0.3,
+        )
+        self.assertLess(time.monotonic() - start, 0.8)
+        self.assertEqual(result.error, "slot lookup failed")
+        self.assertFalse(result.confirmed)
+
+    def test_hedged_read_takes_the_faster_copy(self):
+        salon = self.salon(Transport(hedge=HedgePolicy(after=0.05)))
+        booking = salon.create_service_booking(
+            salon.find_service_by_name("Supercut"), None
+        )
+        self.server.stall("bookings/slots", 1.0)
+        start = time.monotonic()
+        slots = salon.get_booking_slot(booking)
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertGreater(len(slots), 0)
+        self.assertEqual(self.server.hits["bookings/slots"], 2)
+
+    def test_writes_are_not_hedged(self):
+        salon = self.salon(Transport(hedge=HedgePolicy(after=0.01)))
+        self.server.stall("bookings", 0.1)
+        self.assertIsNotNone(
+            salon.create_service_booking(salon.find_service_by_name("Supercut"), None)
+        )
+        self.assertEqual(self.server.hits["bookings"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
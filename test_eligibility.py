@@ -0,0 +1,39 @@
+import unittest
+from opencuts.eligibility import EligibilityMatrix
+from opencuts.models import Service, Stylist
+
+STYLISTS = [Stylist("t1", "Ann"), Stylist("t2", "Bo"), Stylist("t3", "Cy")]
+SERVICES = [Service("s1", "Supercut"), Service("s2", "Color")]
+
+
+class TestEligibilityMatrix(unittest.TestCase):
+    def setUp(self):
+        self.matrix = EligibilityMatrix(STYLISTS, SERVICES, [("t2", "s2")])
+
+    def test_everyone_is_eligible_until_excluded(self):
+        self.assertEqual(self.matrix.eligible(SERVICES[0]), STYLISTS)
+        self.assertEqual(
+            [stylist.name for stylist in self.matrix.eligible("s2")], ["Ann", "Cy"]
+        )
+        self.assertFalse(self.matrix.can(STYLISTS[1], SERVICES[1]))
+        self.assertEqual(self.matrix.services_of("t2"), [SERVICES[0]])
+
+    def test_exclude_and_allow(self):
+        self.matrix.exclude(STYLISTS[0], SERVICES[1])
+        self.assertEqual(self.matrix.eligible("s2", STYLISTS[:2]), [])
+        self.matrix.allow("t2", "s2")
+        self.assertEqual(self.matrix.eligible("s2"), [STYLISTS[1], STYLISTS[2]])
+        self.assertEqual(self.matrix.excluded, [("t1", "s2")])
+
+    def test_unknown_pairs_keep_their_exclusions(self):
+        self.matrix.exclude("t9", "s1")
+        self.assertFalse(self.matrix.can("t9", "s1"))
+        self.assertTrue(self.matrix.can("t9", "s3"))
+        rebuilt = EligibilityMatrix(
+            STYLISTS + [Stylist("t9", "Di")], SERVICES, self.matrix.excluded
+        )
+        self.assertEqual(len(rebuilt.eligible("s1")), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from opencuts.fleet import SalonFleet
+from opencuts.testing import FakeRegisServer
+
+
+class TestSalonFleet(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRegisServer(zenoti_salons=("1000", "1001")).start()
+        self.addCleanup(self.server.stop)
+        self.fleet = SalonFleet(
+            ["1000", "1001", "2000", "2001"], "key", "booking_key", concurrency=3
+        )
+        for salon in self.fleet.salons.values():
+            self.server.configure(salon)
+
+    def test_iter_availability_covers_every_salon(self):
+        results = list(self.fleet.iter_availability("Supercut"))
+        self.assertEqual(
+            sorted(result.salon_id for result in results),
+            ["1000", "1001", "2000", "2001"],
+        )
+        self.assertTrue(all(result.error is None for result in results))
+        self.assertTrue(all(result.slots for result in results))
+
+    def test_earliest_is_merged_earliest_first(self):
+        slots = self.fleet.earliest("Supercut")
+        minutes = [slot.minute for slot in slots]
+        self.assertEqual(minutes, sorted(minutes))
+        self.assertEqual({slot.salon_id for slot in slots}, set(self.fleet.salons))
+        self.assertEqual(len(self.fleet.earliest("Supercut", limit=3)), 3)
+
+    def test_index_covers_every_salon(self):
+        index = self.fleet.index("Supercut")
+        self.assertEqual({salon for salon, _ in index.keys()}, set(self.fleet.salons))
+        first, keys = index.first_after(0)
+        self.assertEqual(first, self.fleet.earliest("Supercut", limit=1)[0].minute)
+        self.assertTrue(all(index.is_free(key, first) for key in keys))
+
+    def test_unknown_service_is_reported(self):
+        results = list(self.fleet.iter_availability("Perm"))
+        self.assertTrue(all("not offered" in result.error for result in results))
+
+    def test_unknown_stylist_is_reported(self):
+        results = {
+            result.salon_id: result
+            for result in self.fleet.iter_availability("Supercut", "Nobody")
+        }
+        for salon_id in ("1000", "1001"):
+            self.assertEqual(results[salon_id].error, "stylist Nobody not found")
+            self.assertEqual(results[salon_id].slots, ())
+        self.assertEqual(results["2000"].slots, ())
+
+    def test_stylist_filter(self):
+        for result in self.fleet.iter_availability("Supercut", "Stylist 1"):
+            self.assertIsNone(result.error)
+            self.assertEqual(
+                {slot.stylist_name for slot in result.slots}, {"Stylist 1"}
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
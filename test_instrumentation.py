@@ -0,0 +1,64 @@
+import json
+import unittest
+from opencuts import RegisSalon
+from opencuts.instrumentation import Histogram, Metrics, Observer
+from opencuts.testing import FakeRegisServer
+
+
+class Recorder(Observer):
+    def __init__(self):
+        self.started = []
+        self.finished = []
+
+    def request_started(self, event):
+        self.started.append(event.endpoint)
+
+    def request_finished(self, event):
+        self.finished.append(event)
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRegisServer(zenoti_salons=("1000",)).start()
+        self.addCleanup(self.server.stop)
+        self.salon = self.server.configure(RegisSalon("1000", "key", "booking_key"))
+
+    def test_metrics_per_endpoint(self):
+        metrics = self.salon.instrumentation.attach(Metrics())
+        self.salon.get_salon()
+        self.salon.get_salon_services()
+        for _ in range(3):
+            self.salon.retrive_guest_detail("Edward", "Hands", "5558675309")
+        self.assertIsNone(self.salon.get_appointments("guest-unknown"))
+        snapshot = metrics.snapshot()
+        json.dumps(snapshot)
+        self.assertEqual(snapshot["guests/search"]["requests"], 3)
+        self.assertEqual(snapshot["guests/search"]["latency_ms"]["count"], 3)
+        self.assertGreater(snapshot["centers/services"]["bytes_received"], 0)
+        self.assertEqual(snapshot["guests/appointments"]["errors"], 1)
+        self.assertEqual(snapshot["guests/appointments"]["statuses"], {404: 1})
+        self.assertEqual(snapshot["salon"]["errors"], 0)
+
+    def test_observers_see_start_and_end(self):
+        recorder = self.salon.instrumentation.attach(Recorder())
+        self.salon.get_salon()
+        self.salon.create_account("Edward", "Hands", "5558675309")
+        self.assertEqual(recorder.started, ["salon", "guests"])
+        event = recorder.finished[-1]
+        self.assertEqual(event.status, 200)
+        self.assertGreater(event.bytes_sent, 0)
+        self.assertGreater(event.seconds, 0)
+        self.salon.instrumentation.detach(recorder)
+        self.salon.get_salon(refresh=True)
+        self.assertEqual(len(recorder.finished), 2)
+
+
+class TestHistogram(unittest.TestCase):
+    def test_percentiles_within_a_bucket(self):
+        histogram = Histogram()
+        for milliseconds in range(1, 101):
+            histogram.add(milliseconds)
+        self.assertAlmostEqual(histogram.percentile(0.5), 50, delta=50 * 0.2)
+        self.assertAlmostEqual(histogram.percentile(0.99), 99, delta=99 * 0.2)
+        self.assertEqual(histogram.percentile(1.0), 100)
+        self.assertIsNone(Histogram().percentile(0.5))
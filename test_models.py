@@ -0,0 +1,67 @@
+import unittest
+from opencuts.models import (
+    CheckIn,
+    Salon,
+    Service,
+    Slot,
+    Stylist,
+    services_from_regis,
+    slots_from_regis_availability,
+)
+
+
+class TestModels(unittest.TestCase):
+    def test_salon_from_sis_and_booking(self):
+        salon = Salon.from_sis(
+            "1234",
+            {"zenoti_api_key": "key", "zenoti_id": "center", "pos_type": "Supersalon"},
+        )
+        self.assertFalse(salon.is_zenoti)
+        salon.update_from_booking(
+            {"address": "1 Main St", "name": "Main", "phonenumber": "555-867-5309"}
+        )
+        self.assertEqual(salon.phone, "5558675309")
+
+    def test_zenoti_and_regis_services_normalize(self):
+        zenoti = Service.from_zenoti(
+            {"id": "s1", "name": "SC", "catalog_info": {"display_name": "Supercut"}}
+        )
+        regis = services_from_regis(
+            [{"category": "Haircuts", "services": [{"id": 7, "service": "Supercut"}]}]
+        )
+        self.assertEqual(zenoti.name, "Supercut")
+        self.assertEqual(regis, [Service(7, "Supercut", category="Haircuts")])
+
+    def test_stylists_normalize(self):
+        zenoti = Stylist.from_zenoti(
+            {
+                "id": "t1",
+                "personal_info": {"name": "Sweeney T", "first_name": "Sweeney"},
+            }
+        )
+        regis = Stylist.from_regis({"name": "Sweeney T", "employeeID": 42})
+        self.assertEqual(zenoti.first_name, regis.first_name)
+        self.assertEqual(regis.id, 42)
+
+    def test_slots(self):
+        zenoti = Slot.from_zenoti({"Time": "2024-05-01T14:30:00"})
+        regis = slots_from_regis_availability(
+            [
+                {
+                    "name": "Sweeney",
+                    "employeeID": 42,
+                    "times": {"hours": [{"h": 14, "m": [0, 30]}]},
+                }
+            ]
+        )
+        self.assertEqual(zenoti.minute, 14 * 60 + 30)
+        self.assertEqual([slot.time for slot in regis], ["1400", "1430"])
+        self.assertEqual(regis[1].label, "14:30")
+
+    def test_models_are_slotted(self):
+        for model in (Salon("1"), Service(1, "a"), Stylist(1, "a"), CheckIn(1)):
+            self.assertFalse(hasattr(model, "__dict__"))
+
+
+if __name__ == "__main__":
+    unittest.main()
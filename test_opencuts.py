@@ -1,38 +1,487 @@
+import datetime
+import threading
+import time
 import unittest
-from unittest.mock import patch
-from opencuts import RegisSalon
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+from opencuts import RegisSalon, Service, Stylist, Transport
+from opencuts import opencuts
+from opencuts.opencuts import PageError
+from opencuts.testing import FakeRegisServer
 import requests
 
 
+def fake_response(payload):
+    response = MagicMock()
+    response.status_code = 200
+    response.json.return_value = payload
+    return response
+
+
 class TestSalon(unittest.TestCase):
     def setUp(self):
         self.salon = RegisSalon(
             salon_id="1234",
             regis_api_key="12345678abc",
+            regis_boking_api_key="abc12345678",
         )
 
-    @patch("opencuts.requests.get")
-    def test_get_salon(self, mock_get):
-        mock_get.return_value.json.return_value = {
-            "zenoti_api_key": "dummy_api_key",
-            "zenoti_id": "dummy_id",
-            "pos_type": "any_pos",
-        }
+    @patch("opencuts.transport.Transport.request")
+    def test_get_salon(self, mock_request):
+        mock_request.side_effect = lambda method, url, **kwargs: fake_response(
+            {
+                "zenoti_api_key": "dummy_api_key",
+                "zenoti_id": "dummy_id",
+                "pos_type": "any_pos",
+            }
+            if method == "GET"
+            else {
+                "Salon": {
+                    "address": "1 Main St",
+                    "name": "Main",
+                    "phonenumber": "555-867-5309",
+                }
+            }
+        )
         api_key, zenoti_id, pos_type = self.salon.get_salon()
         # Assertions to verify that the response is processed correctly
         self.assertEqual(api_key, "dummy_api_key")
         self.assertEqual(zenoti_id, "dummy_id")
         self.assertEqual(pos_type, "any_pos")
+        self.assertEqual(self.salon.storephone, "5558675309")
+
+    @patch("opencuts.transport.Transport.request")
+    def test_get_salon_decodes_each_response_once(self, mock_request):
+        response = fake_response(
+            {"zenoti_api_key": "key", "zenoti_id": "center", "pos_type": "Zenoti"}
+        )
+        mock_request.return_value = response
+        self.salon.get_salon()
+        response.json.assert_called_once_with()
 
-    @patch("opencuts.requests.get")
-    def test_get_salon_api_error(self, mock_get):
-        mock_get.side_effect = requests.exceptions.RequestException
+    @patch("opencuts.transport.Transport.request")
+    def test_get_salon_api_error(self, mock_request):
+        mock_request.side_effect = requests.exceptions.RequestException
 
         result = self.salon.get_salon()
         self.assertIsNone(result)
 
+    def test_find_by_name_and_id(self):
+        self.salon.therapists = [
+            Stylist(1, "Sweeney Todd", first_name="Sweeney"),
+            Stylist(2, "Edward Hands", first_name="Edward"),
+        ]
+        self.salon.store_services = [Service("s1", "Supercut")]
+        self.assertEqual(self.salon.find_stylist_by_name(" edward ").id, 2)
+        self.assertEqual(self.salon.find_stylist_by_name("Sweeney Todd").id, 1)
+        self.assertEqual(self.salon.find_stylist_by_id("2").name, "Edward Hands")
+        self.assertEqual(self.salon.find_service_by_name("SUPERCUT").id, "s1")
+        self.assertIsNone(self.salon.find_service_by_name("Shave"))
+
+    def test_indexes_follow_refresh(self):
+        self.salon.store_services = [Service("s1", "Supercut")]
+        self.salon.store_services = [Service("s2", "Beard Trim")]
+        self.assertIsNone(self.salon.find_service_by_name("Supercut"))
+        self.assertEqual(self.salon.find_service_by_id("s2").name, "Beard Trim")
+
+    @patch("opencuts.transport.Transport.request")
+    def test_salon_details_fetched_once(self, mock_request):
+        mock_request.side_effect = lambda method, url, **kwargs: fake_response(
+            {"pos_type": "Supersalon"}
+            if method == "GET"
+            else {
+                "Salon": {"address": "1 Main", "name": "Main", "phonenumber": "5"},
+                "Services": [
+                    {"category": "Cuts", "services": [{"id": 1, "service": "Supercut"}]}
+                ],
+                "Stylists": [{"name": "Sweeney Todd", "employeeID": 42}],
+            }
+        )
+        self.salon.get_salon()
+        services = self.salon.get_salon_services()
+        stylists = self.salon.get_therapists_working()
+        posts = [call for call in mock_request.call_args_list if call.args[0] == "POST"]
+        self.assertEqual(len(posts), 1)
+        self.assertEqual(services[0].name, "Supercut")
+        self.assertEqual(stylists[0].id, 42)
+
     # Additional tests for other methods like find_stylist_by_name, get_therapists_working, etc.
 
 
+class TestBook(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRegisServer(zenoti_salons=("1000",), latency=0.05).start()
+        self.addCleanup(self.server.stop)
+        self.salon = self.server.configure(RegisSalon("1000", "key", "booking_key"))
+        self.salon.get_salon()
+        self.salon.get_salon_services()
+        self.service = self.salon.find_service_by_name("Supercut")
+
+    def test_new_guest_lookup_runs_alongside_slots(self):
+        result = self.salon.book(self.service, None, "Edward", "Hands", "5558675309")
+        self.assertIsNone(result.error)
+        self.assertTrue(result.confirmed)
+        self.assertEqual(result.slot, min(result.slots, key=lambda slot: slot.minute))
+        self.assertIsNotNone(result.invoice_id)
+        self.assertEqual(self.server.hits["bookings"], 2)
+        # search + create + booking ran while the guestless booking and slots ran
+        self.assertLess(
+            result.timings["total"],
+            result.timings["guest"] + result.timings["slots"] + result.slot_to_confirm,
+        )
+
+    def test_known_guest_reuses_one_booking(self):
+        guest_id = self.salon.resolve_guest("Edward", "Hands", "5558675309")
+        result = self.salon.book(
+            self.service,
+            None,
+            "Edward",
+            "Hands",
+            "5558675309",
+            choose=lambda slots: slots[-1],
+        )
+        self.assertEqual(result.guest_id, guest_id)
+        self.assertEqual(result.slot, result.slots[-1])
+        self.assertEqual(self.server.hits["bookings"], 1)
+        self.assertNotIn("guest", result.timings)
+
+    def test_failed_bookings_fail_the_booking(self):
+        self.server.fail("bookings", status=503, times=2)
+        result = self.salon.book(self.service, None, "Edward", "Hands", "5558675309")
+        self.assertEqual(result.error, "booking failed")
+        self.assertIsNone(result.booking_id)
+        # A known guest's single booking
+        self.salon.resolve_guest("Edward", "Hands", "5558675309")
+        self.server.fail("bookings", status=503)
+        result = self.salon.book(self.service, None, "Edward", "Hands", "5558675309")
+        self.assertEqual(result.error, "booking failed")
+        self.assertNotIn("bookings/slots", self.server.hits)
+
+    def test_dry_run_stops_before_reserving(self):
+        result = self.salon.book(
+            self.service, None, "Edward", "Hands", "5558675309", dry_run=True
+        )
+        self.assertIsNotNone(result.slot)
+        self.assertFalse(result.reserved)
+        self.assertNotIn("bookings/slots/reserve", self.server.hits)
+
+
+class TestScanAvailability(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRegisServer(zenoti_salons=("1000",), latency=0.05).start()
+        self.addCleanup(self.server.stop)
+        self.start = datetime.date.today() + datetime.timedelta(days=1)
+
+    def salon(self, salon_id):
+        salon = self.server.configure(RegisSalon(salon_id, "key", "booking_key"))
+        salon.get_salon()
+        salon.get_salon_services()
+        return salon
+
+    def test_zenoti_week_is_fetched_in_parallel_and_cached(self):
+        salon = self.salon("1000")
+        service = salon.find_service_by_name("Supercut")
+        started = datetime.datetime.now()
+        week = salon.scan_availability(service, start=self.start)
+        # Seven days of two sequential requests each would take at least 0.7s
+        self.assertLess((datetime.datetime.now() - started).total_seconds(), 0.5)
+        self.assertEqual(
+            [day.date for day in week],
+            [(self.start + datetime.timedelta(days=n)).isoformat() for n in range(7)],
+        )
+        for day in week:
+            self.assertIsNone(day.error)
+            self.assertTrue(day.slots[0].time.startswith(day.date))
+        self.assertEqual(self.server.hits["bookings"], 7)
+        self.assertEqual(salon.scan_availability(service, start=self.start), week)
+        self.assertEqual(self.server.hits["bookings"], 7)
+        salon.scan_availability(service, start=self.start, days=1, refresh=True)
+        self.assertEqual(self.server.hits["bookings"], 8)
+
+    def test_a_failed_day_does_not_abort_the_scan(self):
+        salon = self.salon("1000")
+        service = salon.find_service_by_name("Supercut")
+        self.server.fail("bookings", status=503)
+        days = salon.scan_availability(service, start=self.start, days=3)
+        self.assertEqual(len(days), 3)
+        failed = [day for day in days if day.error]
+        self.assertEqual([day.error for day in failed], ["availability lookup failed"])
+        self.assertEqual(failed[0].slots, ())
+        self.assertEqual(sum(1 for day in days if day.slots), 2)
+
+    def test_regis_services_and_stylist_filter(self):
+        salon = self.salon("2000")
+        services = salon.store_services[:2]
+        days = salon.scan_availability(
+            services, start=self.start, days=3, stylist=Stylist(501, "Stylist 1")
+        )
+        self.assertEqual(
+            [(day.date, day.service) for day in days],
+            [
+                ((self.start + datetime.timedelta(days=n)).isoformat(), service)
+                for n in range(3)
+                for service in services
+            ],
+        )
+        self.assertEqual(self.server.hits["getavailabilityofsalon"], 6)
+        self.assertEqual({slot.stylist_name for slot in days[0].slots}, {"Stylist 1"})
+
+
+class TestTransport(unittest.TestCase):
+    def test_mounts_one_pool_per_host(self):
+        transport = Transport(
+            hosts=["https://api.zenoti.com/v1/", "https://api.zenoti.com/v1/guests"]
+        )
+        self.assertEqual(transport._mounted, {"https://api.zenoti.com/"})
+        self.assertIs(
+            transport.session.get_adapter("https://api.zenoti.com/v1/bookings"),
+            transport.session.adapters["https://api.zenoti.com/"],
+        )
+
+    def test_salons_share_transport(self):
+        transport = Transport()
+        first = RegisSalon("1", "key", "booking_key", transport=transport)
+        second = RegisSalon("2", "key", "booking_key", transport=transport)
+        self.assertIs(first.transport, second.transport)
+        self.assertEqual(len(transport._mounted), 3)
+
+
 if __name__ == "__main__":
     unittest.main()
+
+
+class TestSchedule(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRegisServer(
+            zenoti_salons=("1000",), stylists=8, latency=0.05
+        ).start()
+        self.addCleanup(self.server.stop)
+        self.salon = self.server.configure(RegisSalon("1000", "key", "booking_key"))
+        self.salon.get_salon()
+        self.salon.get_therapists_working()
+
+    def test_every_therapist_fetched_concurrently_and_cached(self):
+        start = datetime.date.today()
+        started = datetime.datetime.now()
+        schedule = self.salon.get_schedule(start, days=3, concurrency=4)
+        # Eight sequential requests would take at least 0.4s
+        self.assertLess((datetime.datetime.now() - started).total_seconds(), 0.3)
+        self.assertEqual(schedule.errors, {})
+        self.assertEqual(len(schedule.shifts), 8)
+        day = (start + datetime.timedelta(days=2)).isoformat()
+        self.assertEqual(len(schedule.working_on(day)), 8)
+        stylist = self.salon.therapists[0]
+        self.assertEqual(len(schedule.days(stylist.id)), 3)
+        self.assertEqual(schedule.names[stylist.id], stylist.name)
+        self.assertIs(self.salon.get_schedule(start, days=3), schedule)
+        self.assertEqual(self.server.hits["employees/attendance"], 8)
+
+    def test_failed_lookups_are_reported_and_not_cached(self):
+        self.server.fail("employees/attendance", 500, times=3)
+        schedule = self.salon.get_schedule(concurrency=1)
+        self.assertEqual(len(schedule.errors), 1)
+        self.assertEqual(self.server.hits["employees/attendance"], 10)
+        self.assertEqual(self.salon.get_schedule().errors, {})
+
+    def test_therapists_off_today_are_scheduled_on_their_days(self):
+        today = datetime.date.today()
+        tomorrow = today + datetime.timedelta(days=1)
+        self.server.days_off = {0: {today.isoformat()}}
+        self.salon.get_therapists_working(refresh=True)
+        self.assertEqual(len(self.salon.therapists), 7)
+        schedule = self.salon.get_schedule(today, days=2)
+        self.assertEqual(len(schedule.shifts), 8)
+        self.assertEqual(schedule.days("therapist-0"), [tomorrow.isoformat()])
+        self.assertEqual(len(schedule.working_on(today.isoformat())), 7)
+        # A day whose therapists could not be listed is reported, and not cached
+        self.server.fail("centers/therapists", 500, times=3)
+        schedule = self.salon.get_schedule(today, days=2, refresh=True)
+        self.assertEqual(
+            schedule.errors, {tomorrow.isoformat(): "therapists lookup failed"}
+        )
+        self.assertEqual(len(self.salon.get_schedule(today, days=2).shifts), 8)
+
+    def test_regis_salons_have_no_attendance(self):
+        salon = self.server.configure(RegisSalon("2000", "key", "booking_key"))
+        salon.get_salon()
+        self.assertIsNone(salon.get_schedule())
+
+
+class TestCatalogPages(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRegisServer(
+            zenoti_salons=("1000",), services=250, stylists=30
+        ).start()
+        self.addCleanup(self.server.stop)
+        self.salon = self.server.configure(RegisSalon("1000", "key", "booking_key"))
+        self.salon.get_salon()
+
+    def test_large_catalogs_are_not_truncated(self):
+        services = self.salon.get_salon_services()
+        self.assertEqual(len(services), 250)
+        self.assertEqual(len({service.id for service in services}), 250)
+        self.assertEqual(self.server.hits["centers/services"], 3)
+        self.assertEqual(services[0].name, "Supercut")
+        stylists = list(self.salon.iter_therapists(page_size=10))
+        self.assertEqual(len(stylists), 30)
+        self.assertEqual(self.server.hits["centers/therapists"], 3)
+
+    def test_next_page_is_prefetched(self):
+        services = self.salon.iter_services(page_size=100)
+        next(services)
+        # The second page is requested before the first one is consumed
+        for _ in range(50):
+            if self.server.hits["centers/services"] == 2:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.server.hits["centers/services"], 2)
+        services.close()
+        lazy = self.salon.iter_services(page_size=100, prefetch=False)
+        next(lazy)
+        self.assertEqual(self.server.hits["centers/services"], 3)
+        lazy.close()
+
+    def test_projection_skips_unneeded_fields(self):
+        services = list(self.salon.iter_services(fields=("duration",)))
+        self.assertEqual(services[0].duration, 30)
+        self.assertIsNone(services[0].price)
+        # Without the catalog_info expansion the name is not projected either
+        self.assertIsNone(services[0].name)
+        self.assertTrue(services[0].id)
+
+    def test_failed_page_fails_the_whole_catalog(self):
+        self.server.fail("centers/services", 404)
+        with self.assertRaises(PageError):
+            list(self.salon.iter_services(page_size=100))
+        self.server.fail("centers/services", 404)
+        self.assertIsNone(self.salon.get_salon_services(refresh=True))
+
+
+class TestSharedSalon(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRegisServer(zenoti_salons=("1000",)).start()
+        self.addCleanup(self.server.stop)
+        self.salon = self.server.configure(RegisSalon("1000", "key", "booking_key"))
+        self.salon.get_salon()
+        self.salon.get_salon_services()
+
+    def test_snapshots_are_immutable(self):
+        snapshot = self.salon.snapshot
+        self.assertIsInstance(snapshot.services, tuple)
+        with self.assertRaises(AttributeError):
+            snapshot.services = ()
+        self.salon.store_services = [Service("s1", "Supercut")]
+        # The old snapshot is untouched by the refresh
+        self.assertEqual(len(snapshot.services), 5)
+        self.assertIsNot(self.salon.snapshot, snapshot)
+        self.assertIs(self.salon.snapshot.stylist_index, snapshot.stylist_index)
+
+    def test_readers_never_see_a_half_refreshed_salon(self):
+        stop = threading.Event()
+
+        def refresh():
+            while not stop.is_set():
+                self.salon.get_salon(refresh=True)
+                self.salon.get_salon_services(refresh=True)
+
+        def read():
+            for _ in range(2000):
+                snapshot = self.salon.snapshot
+                for service in snapshot.services:
+                    # The index always belongs to the very list it was built from
+                    if snapshot.service_index.find_by_id(service.id) is not service:
+                        return False
+            return True
+
+        with ThreadPoolExecutor(6) as pool:
+            refreshers = [pool.submit(refresh) for _ in range(2)]
+            readers = [pool.submit(read) for _ in range(4)]
+            results = [reader.result() for reader in readers]
+            stop.set()
+            for refresher in refreshers:
+                refresher.result()
+        self.assertEqual(results, [True] * 4)
+        self.assertEqual(self.salon.storename, self.salon.snapshot.salon.name)
+
+    def test_regis_details_do_not_touch_the_shared_salon(self):
+        salon = self.server.configure(RegisSalon("2000", "key", "booking_key"))
+        salon.get_salon()
+        first = salon.salon
+        salon.get_salon(refresh=True)
+        self.assertIsNot(salon.salon, first)
+        self.assertEqual(first.name, "Salon 2000")
+
+    def test_device_uuid_read_once_per_process(self):
+        device_uuid = self.salon.device_uuid_str
+        with patch("opencuts.opencuts.open", side_effect=AssertionError, create=True):
+            salon = RegisSalon("1000", "key", "booking_key")
+        self.assertEqual(salon.device_uuid_str, device_uuid)
+        self.assertIs(opencuts._read_device_uuid(), device_uuid)
+
+
+class TestFindSlots(unittest.TestCase):
+    def setUp(self):
+        # Stylist 0 only cuts, stylist 1 only colors, stylists 2 and 3 do everything
+        self.server = FakeRegisServer(
+            zenoti_salons=("1000",), skills={0: {0}, 1: {1}}
+        ).start()
+        self.addCleanup(self.server.stop)
+        self.salon = self.server.configure(RegisSalon("1000", "key", "booking_key"))
+        self.salon.get_salon()
+        self.salon.get_salon_services()
+        self.salon.get_therapists_working()
+        self.color = self.salon.find_service_by_name("Service 1")
+
+    def test_refused_stylists_are_skipped_afterwards(self):
+        result = self.salon.find_slots(self.color)
+        self.assertIsNone(result.error)
+        self.assertEqual(
+            {slot.stylist_name for slot in result.slots},
+            {"Stylist 1", "Stylist 2", "Stylist 3"},
+        )
+        minutes = [slot.minute for slot in result.slots]
+        self.assertEqual(minutes, sorted(minutes))
+        self.assertEqual(self.server.hits["bookings"], 4)
+        self.salon.find_slots(self.color)
+        # Stylist 0 is not asked again
+        self.assertEqual(self.server.hits["bookings"], 7)
+        self.assertEqual(self.server.hits["bookings/slots"], 6)
+        self.assertEqual(len(self.salon.eligibility.eligible(self.color)), 3)
+
+    def test_exclusions_survive_a_refresh(self):
+        self.salon.find_slots(self.color)
+        self.salon.get_therapists_working(refresh=True)
+        self.assertNotIn(
+            "Stylist 0",
+            [stylist.name for stylist in self.salon.eligibility.eligible(self.color)],
+        )
+
+    def test_failed_bookings_exclude_nobody(self):
+        stylist = self.salon.find_stylist_by_id("therapist-0")
+        supercut = self.salon.find_service_by_name("Supercut")
+        for status in (503, 429, 401):
+            self.server.fail("bookings", status)
+            result = self.salon.find_slots(supercut, stylists=[stylist])
+            self.assertEqual(result.error, "availability lookup failed")
+        self.assertEqual(self.salon.eligibility.excluded, [])
+        self.assertTrue(self.salon.find_slots(supercut, stylists=[stylist]).slots)
+
+    def test_nobody_eligible(self):
+        stylist = self.salon.find_stylist_by_id("therapist-0")
+        self.salon.eligibility.exclude(stylist, self.color)
+        result = self.salon.find_slots(self.color, stylists=[stylist])
+        self.assertEqual(result.error, "no eligible stylist")
+        self.assertNotIn("bookings", self.server.hits)
+
+    def test_regis_salons_ask_once(self):
+        salon = self.server.configure(RegisSalon("2000", "key", "booking_key"))
+        salon.get_salon()
+        salon.get_salon_services()
+        service = salon.find_service_by_name("Supercut")
+        salon.eligibility.exclude(500, service)
+        result = salon.find_slots(service)
+        self.assertEqual(self.server.hits["getavailabilityofsalon"], 1)
+        self.assertEqual(
+            {slot.stylist_name for slot in result.slots},
+            {"Stylist 1", "Stylist 2", "Stylist 3"},
+        )
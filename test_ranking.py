@@ -0,0 +1,97 @@
+import random
+import unittest
+from opencuts.models import SalonAvailability, Slot, Stylist
+from opencuts.ranking import SlotRanker, top_slots
+
+REGIS = [
+    {
+        "name": "Ann Lee",
+        "employeeID": 1,
+        "times": {"hours": [{"h": 14, "m": [0, 30]}, {"h": 17, "m": [15]}]},
+    },
+    {"name": "Bo", "employeeID": 2, "times": {"hours": [{"h": 14, "m": [15, 45]}]}},
+]
+ZENOTI = {"slots": [{"Time": "2024-03-04T13:30:00"}, {"Time": "2024-03-04T18:00:00"}]}
+
+
+def labels(slots):
+    return [(slot.salon_id, slot.stylist_id, slot.label) for slot in slots]
+
+
+class TestSlotRanker(unittest.TestCase):
+    def setUp(self):
+        self.ranker = SlotRanker()
+        self.ranker.add_regis(REGIS, "2000")
+        self.ranker.add_zenoti(ZENOTI, "1000", Stylist(7, "Cy"))
+
+    def test_earliest_across_salons(self):
+        self.assertEqual(
+            labels(self.ranker.rank(3)),
+            [("1000", 7, "13:30"), ("2000", 1, "14:00"), ("2000", 2, "14:15")],
+        )
+        self.assertEqual(len(self.ranker.rank(100)), len(self.ranker))
+
+    def test_time_window_and_duration(self):
+        ranked = self.ranker.rank(10, after="14:10", before="17:45", duration=30)
+        self.assertEqual(
+            labels(ranked),
+            [
+                ("2000", 2, "14:15"),
+                ("2000", 1, "14:30"),
+                ("2000", 2, "14:45"),
+                ("2000", 1, "17:15"),
+            ],
+        )
+        self.assertEqual(
+            self.ranker.rank(10, before="17:44", duration=30)[-1].label, "14:45"
+        )
+
+    def test_stylist_and_salon_filters(self):
+        self.assertEqual(
+            [slot.label for slot in self.ranker.rank(5, stylists=["ann"])],
+            ["14:00", "14:30", "17:15"],
+        )
+        self.assertEqual(len(self.ranker.rank(5, stylists=[2, "Cy"])), 4)
+        self.assertEqual(len(self.ranker.rank(5, salons=["1000"])), 2)
+
+    def test_preferred_stylist_wins_close_calls(self):
+        self.assertEqual(
+            self.ranker.rank(1, prefer=["Bo"], prefer_within=60)[0].label, "14:15"
+        )
+        # Bo's first slot is 45 minutes after Cy's, too late with the default 30
+        self.assertEqual(self.ranker.rank(1, prefer=["Bo"])[0].label, "13:30")
+
+    def test_near_ranks_by_distance(self):
+        self.assertEqual(
+            [slot.label for slot in self.ranker.rank(3, near="14:20")],
+            ["14:15", "14:30", "14:00"],
+        )
+
+    def test_matches_sorting_everything(self):
+        rng = random.Random(7)
+        slots = [
+            Slot("t", minute, stylist, f"S{stylist}", str(salon))
+            for salon in range(20)
+            for stylist in range(5)
+            for minute in rng.sample(range(540, 1140), 30)
+        ]
+        ranked = top_slots(slots, 50, after="12:00", before="18:00", duration=20)
+        expected = sorted(
+            (slot for slot in slots if 720 <= slot.minute <= 1060),
+            key=lambda slot: slot.minute,
+        )[:50]
+        self.assertEqual(
+            [slot.minute for slot in ranked], [slot.minute for slot in expected]
+        )
+
+    def test_results_are_combined(self):
+        results = [
+            SalonAvailability("3000", slots=[Slot("0900", 540, 1, "Di", "3000")]),
+            SalonAvailability("3001", error="availability lookup failed"),
+        ]
+        ranker = SlotRanker().add_results(results)
+        self.assertEqual(labels(ranker.rank()), [("3000", 1, "09:00")])
+
+
+if __name__ == "__main__":
+    unittest.main()
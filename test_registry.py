@@ -0,0 +1,64 @@
+import time
+import unittest
+from unittest.mock import patch
+from opencuts.registry import SalonRegistry
+from opencuts.testing import FakeRegisServer
+
+
+class TestSalonRegistry(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRegisServer(zenoti_salons=("1000",)).start()
+        self.addCleanup(self.server.stop)
+        self.registry = SalonRegistry(
+            "key",
+            "booking_key",
+            max_salons=3,
+            device_uuid="shared-device",
+            configure=self.server.configure,
+        )
+        self.addCleanup(self.registry.close)
+
+    def test_clients_are_created_once_and_share_everything(self):
+        first = self.registry.get("1000")
+        self.assertIs(self.registry.get("1000"), first)
+        second = self.registry["2000"]
+        self.assertIs(second.transport, first.transport)
+        self.assertIs(second.availability_cache, first.availability_cache)
+        self.assertEqual(second.device_uuid_str, "shared-device")
+        self.assertEqual((self.registry.hits, self.registry.misses), (1, 2))
+
+    def test_a_given_device_id_skips_the_device_uuid_file(self):
+        with patch("opencuts.opencuts._read_device_uuid") as read:
+            self.registry.get("1000")
+        read.assert_not_called()
+
+    def test_least_recently_used_salon_is_evicted(self):
+        for salon_id in ("1000", "2000", "2001"):
+            self.registry.get(salon_id)
+        self.registry.get("1000")
+        self.registry.get("2002")
+        self.assertEqual(self.registry.salon_ids(), ["2001", "1000", "2002"])
+        self.assertNotIn("2000", self.registry)
+        self.assertEqual(self.registry.evictions, 1)
+
+    def test_idle_salons_are_evicted(self):
+        self.registry.idle_ttl = 0.05
+        self.registry.get("1000")
+        time.sleep(0.06)
+        self.registry.get("2000")
+        self.assertEqual(self.registry.salon_ids(), ["2000"])
+
+    def test_stats_report_hits_and_memory(self):
+        salon = self.registry.get("1000")
+        empty = self.registry.stats()["1000"].memory
+        salon.get_salon()
+        salon.get_salon_services()
+        self.registry.get("1000")
+        stats = self.registry.stats()["1000"]
+        self.assertEqual(stats.hits, 1)
+        self.assertGreater(stats.memory, empty)
+        self.assertLessEqual(stats.created, stats.last_used)
+
+
+if __name__ == "__main__":
+    unittest.main()
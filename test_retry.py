@@ -0,0 +1,104 @@
+import time
+import unittest
+from opencuts import RegisSalon, Transport
+from opencuts.instrumentation import Metrics
+from opencuts.retry import RateLimiter, RetryPolicy, TokenBucket, retry_after
+from opencuts.testing import FakeRegisServer
+from opencuts.transport import ApiRequest
+
+
+class TestRateLimiting(unittest.TestCase):
+    def test_token_bucket_spaces_requests(self):
+        bucket = TokenBucket(rate=100, burst=2)
+        delays = [bucket.reserve() for _ in range(4)]
+        self.assertEqual(delays[:2], [0.0, 0.0])
+        self.assertAlmostEqual(delays[3], 0.02, delta=0.005)
+
+    def test_rates_per_host(self):
+        limiter = RateLimiter({"https://api.zenoti.com/v1/": (10, 1)})
+        limiter.reserve("https://api.zenoti.com/v1/bookings")
+        self.assertGreater(limiter.reserve("https://api.zenoti.com/v1/guests"), 0)
+        self.assertEqual(limiter.reserve("https://api.regiscorp.com/sis"), 0.0)
+
+    def test_pause_holds_the_host(self):
+        limiter = RateLimiter(default=1000)
+        limiter.pause("https://api.zenoti.com/", 1)
+        self.assertGreater(limiter.reserve("https://api.zenoti.com/v1/guests"), 0.9)
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_only_idempotent_requests_are_retried(self):
+        policy = RetryPolicy(retries=2)
+        read = ApiRequest("salon", "", "GET", "https://x/")
+        write = ApiRequest("bookings", "", "POST", "https://x/")
+        self.assertTrue(policy.should_retry(read, 1, 503))
+        self.assertTrue(policy.should_retry(read, 2, None))
+        self.assertFalse(policy.should_retry(read, 3, 503))
+        self.assertFalse(policy.should_retry(read, 1, 404))
+        self.assertFalse(policy.should_retry(write, 1, 503))
+        self.assertTrue(RetryPolicy(retry_unsafe=True).should_retry(write, 1, 503))
+
+    def test_delay(self):
+        policy = RetryPolicy(backoff=1, max_delay=3)
+        for attempt in range(1, 6):
+            self.assertLessEqual(policy.delay(attempt), min(3, 2 ** (attempt - 1)))
+        self.assertEqual(policy.delay(1, retry_after=2), 2)
+        # Retrying before a longer Retry-After would ignore the server
+        self.assertIsNone(policy.delay(1, retry_after=10))
+        self.assertEqual(retry_after({"Retry-After": "2"}), 2.0)
+        self.assertIsNone(retry_after({}))
+        self.assertAlmostEqual(
+            retry_after(
+                {
+                    "Retry-After": time.strftime(
+                        "%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 60)
+                    )
+                }
+            ),
+            60,
+            delta=2,
+        )
+
+
+class TestTransportRetries(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRegisServer(zenoti_salons=("1000",)).start()
+        self.addCleanup(self.server.stop)
+        self.transport = Transport(retry=RetryPolicy(retries=2, backoff=0.01))
+        self.metrics = self.transport.instrumentation.attach(Metrics())
+        self.salon = self.server.configure(
+            RegisSalon("1000", "key", "booking_key", transport=self.transport)
+        )
+        self.salon.get_salon()
+
+    def test_transient_failures_are_retried(self):
+        self.server.fail("centers/services", 503)
+        self.server.fail("centers/services", 429, retry_after=0)
+        self.assertEqual(len(self.salon.get_salon_services()), self.server.services)
+        stats = self.metrics.snapshot()["centers/services"]
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["retries"], 2)
+
+    def test_gives_up_after_the_last_retry(self):
+        self.server.fail("centers/services", 503, times=3)
+        self.salon.get_salon_services()
+        self.assertEqual(self.server.hits["centers/services"], 3)
+        self.assertEqual(self.metrics.snapshot()["centers/services"]["errors"], 3)
+
+    def test_a_long_retry_after_is_not_cut_short(self):
+        limiter = RateLimiter(default=100)
+        self.transport.rate_limiter = limiter
+        self.server.fail("centers/services", 429, retry_after=30)
+        start = time.monotonic()
+        self.assertIsNone(self.salon.get_salon_services())
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(self.server.hits["centers/services"], 1)
+        # Every later request to the host waits out the Retry-After
+        self.assertGreater(limiter.reserve(self.salon.zenoti_api_url), 25)
+
+    def test_bookings_are_not_retried(self):
+        self.salon.get_salon_services()
+        self.server.fail("bookings", 503)
+        service = self.salon.find_service_by_name("Supercut")
+        self.assertIn("error", self.salon.create_service_booking(service, None))
+        self.assertEqual(self.server.hits["bookings"], 1)
@@ -0,0 +1,217 @@
+import os
+import tempfile
+import time
+import unittest
+from opencuts import RegisSalon
+from opencuts.fleet import SalonFleet
+from opencuts.models import Salon, SalonAvailability, Service, Slot
+from opencuts.store import SalonStore
+from opencuts.testing import FakeRegisServer
+
+SUPERCUT = Service("s1", "Supercut", "Cuts", 30, 25.0)
+
+
+def slots(salon_id, *labels, stylist_id=1):
+    return [
+        Slot(
+            label.replace(":", ""),
+            int(label[:2]) * 60 + int(label[3:]),
+            stylist_id,
+            "Ann",
+            salon_id,
+        )
+        for label in labels
+    ]
+
+
+class TestSalonStore(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = SalonStore(os.path.join(directory.name, "store.db"))
+
+    def test_upserts_only_write_changes(self):
+        services = [SUPERCUT, Service("s2", "Beard Trim")]
+        self.assertEqual(self.store.save_services("1000", services), 2)
+        self.assertEqual(self.store.save_services("1000", services), 0)
+        changed = [Service("s1", "Supercut", "Cuts", 30, 27.0)]
+        # One price changed, one service dropped from the catalog
+        self.assertEqual(self.store.save_services("1000", changed), 2)
+        self.assertEqual(self.store.services("1000"), changed)
+        self.store.save_salon(Salon("1000", name="Main", zenoti_api_key="secret"))
+        self.assertEqual(self.store.save_salon(Salon("1000", name="Main")), 0)
+        self.assertIsNone(self.store.salon("1000").zenoti_api_key)
+
+    def test_salons_offering_a_service_after_a_time(self):
+        for salon_id, times in (
+            ("1000", ("17:00", "18:30")),
+            ("2000", ("18:15",)),
+            ("3000", ("12:00",)),
+        ):
+            self.store.save_services(salon_id, [SUPERCUT])
+            self.store.save_availability(
+                SalonAvailability(salon_id, SUPERCUT, slots(salon_id, *times))
+            )
+        self.store.save_salon(Salon("2000", name="Uptown"))
+        offering = self.store.salons_offering("supercut", after="18:00")
+        self.assertEqual(
+            [(salon.salon_id, salon.name, slot.label) for salon, slot in offering],
+            [("2000", "Uptown", "18:15"), ("1000", None, "18:30")],
+        )
+        self.assertEqual(self.store.salons_offering("Perm"), [])
+        self.assertEqual(
+            len(self.store.open_slots("Supercut", salon_ids=["1000", "3000"])), 3
+        )
+
+    def test_taken_slots_are_kept_as_history(self):
+        self.store.save_services("1000", [SUPERCUT])
+        first = SalonAvailability("1000", SUPERCUT, slots("1000", "09:00", "09:30"))
+        self.assertEqual(self.store.save_availability(first), 2)
+        self.assertEqual(self.store.save_availability(first), 0)
+        taken = SalonAvailability("1000", SUPERCUT, slots("1000", "09:30"))
+        self.assertEqual(self.store.save_availability(taken), 1)
+        self.assertEqual(
+            [slot.label for slot in self.store.open_slots("Supercut")], ["09:30"]
+        )
+        history = self.store.history("1000", "s1")
+        self.assertEqual([slot.label for slot, _, _ in history], ["09:00", "09:30"])
+        self.assertIsNotNone(history[0][2])
+        self.assertIsNone(history[1][2])
+        # A slot that comes back is reopened, not duplicated
+        self.assertEqual(self.store.save_availability(first), 1)
+        self.assertEqual(len(self.store.history("1000", "s1")), 2)
+        failed = SalonAvailability("1000", SUPERCUT, error="availability lookup failed")
+        self.assertEqual(self.store.save_availability(failed), 0)
+
+    def test_a_fetch_only_removes_the_slots_of_its_stylists(self):
+        self.store.save_services("1000", [SUPERCUT])
+        both = slots("1000", "09:00") + slots("1000", "10:00", stylist_id=2)
+        self.store.save_availability(SalonAvailability("1000", SUPERCUT, both))
+        ann = SalonAvailability("1000", SUPERCUT, slots("1000", "11:00"))
+        self.assertEqual(self.store.save_availability(ann, stylists=[1]), 2)
+        self.assertEqual(
+            [slot.label for slot in self.store.open_slots("Supercut")],
+            ["10:00", "11:00"],
+        )
+        # "Next available" slots are their own stylist
+        self.store.save_availability(SalonAvailability("1000", SUPERCUT), [None])
+        self.assertEqual(len(self.store.open_slots("Supercut")), 2)
+
+    def test_queries_answer_in_milliseconds(self):
+        services = [SUPERCUT, Service("s2", "Beard Trim")]
+        results = []
+        for number in range(300):
+            salon_id = str(5000 + number)
+            self.store.save_services(salon_id, services)
+            for service in services:
+                minutes = [9 * 60 + (number + step * 15) % 600 for step in range(20)]
+                results.append(
+                    SalonAvailability(
+                        salon_id,
+                        service,
+                        [Slot("t", minute, 1, "Ann", salon_id) for minute in minutes],
+                    )
+                )
+        self.store.save_availability(results)
+        start = time.perf_counter()
+        offering = self.store.salons_offering("Supercut", after="18:00")
+        self.assertLess(time.perf_counter() - start, 0.1)
+        self.assertTrue(all(slot.minute >= 18 * 60 for _, slot in offering))
+
+
+class TestSalonWithStore(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = SalonStore(os.path.join(directory.name, "store.db"))
+        self.server = FakeRegisServer(zenoti_salons=("1000",)).start()
+        self.addCleanup(self.server.stop)
+
+    def test_fetched_catalogs_and_slots_are_stored(self):
+        salon = self.server.configure(
+            RegisSalon("2000", "key", "booking_key", store=self.store)
+        )
+        salon.get_salon()
+        salon.get_salon_services()
+        supercut = salon.find_service_by_name("Supercut")
+        salon.scan_availability(supercut, days=1)
+        self.assertEqual(self.store.salon("2000").name, "Salon 2000")
+        self.assertEqual(len(self.store.services("2000")), 5)
+        self.assertEqual(len(self.store.stylists("2000")), 4)
+        self.assertEqual(
+            [salon.salon_id for salon, _ in self.store.salons_offering("Supercut")],
+            ["2000"],
+        )
+        self.assertEqual(self.store.save(salon), 0)
+
+    def test_a_scan_for_one_stylist_keeps_the_others_open(self):
+        salon = self.server.configure(
+            RegisSalon("2000", "key", "booking_key", store=self.store)
+        )
+        salon.get_salon()
+        salon.get_salon_services()
+        supercut = salon.find_service_by_name("Supercut")
+        salon.scan_availability(supercut, days=1)
+        everyone = len(self.store.open_slots("Supercut"))
+        stylist = salon.therapists[0]
+        salon.scan_availability(supercut, days=1, stylist=stylist, refresh=True)
+        salon.find_slots(supercut, stylists=[stylist])
+        self.assertEqual(len(self.store.open_slots("Supercut")), everyone)
+        self.assertTrue(
+            all(
+                removed is None
+                for _, _, removed in self.store.history("2000", supercut.id)
+            )
+        )
+
+    def test_zenoti_stylists_only_cover_themselves(self):
+        salon = self.server.configure(
+            RegisSalon("1000", "key", "booking_key", store=self.store)
+        )
+        salon.get_salon()
+        salon.get_salon_services()
+        salon.get_therapists_working()
+        supercut = salon.find_service_by_name("Supercut")
+        salon.find_slots(supercut)
+        everyone = len(self.store.open_slots("Supercut"))
+        salon.scan_availability(supercut, days=1, stylist=salon.therapists[0])
+        salon.scan_availability(supercut, days=1)
+        self.assertGreater(len(self.store.open_slots("Supercut")), everyone)
+        self.assertFalse(
+            [
+                slot
+                for slot, _, removed in self.store.history("1000", supercut.id)
+                if removed
+            ]
+        )
+
+    def test_lookups_watches_and_fleets_are_stored(self):
+        regis = self.server.configure(
+            RegisSalon("2000", "key", "booking_key", store=self.store)
+        )
+        regis.get_salon()
+        regis.get_salon_services()
+        supercut = regis.find_service_by_name("Supercut")
+        regis.get_availability_of_salon(str(supercut.id))
+        self.assertEqual(len(self.store.open_slots("Supercut")), 32)
+        zenoti = self.server.configure(
+            RegisSalon("1000", "key", "booking_key", store=self.store)
+        )
+        zenoti.get_salon()
+        zenoti.get_salon_services()
+        list(zenoti.watch(zenoti.find_service_by_name("Supercut"), polls=1))
+        self.assertEqual(len(self.store.open_slots("Supercut", salon_ids=["1000"])), 8)
+        fleet = SalonFleet(["1001", "2001"], "key", "booking_key", store=self.store)
+        for salon in fleet.salons.values():
+            self.server.configure(salon)
+        list(fleet.iter_availability("Supercut"))
+        self.assertEqual(
+            sorted(
+                salon.salon_id for salon, _ in self.store.salons_offering("Supercut")
+            ),
+            ["1000", "1001", "2000", "2001"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import datetime
+import threading
+import unittest
+from opencuts import RegisSalon
+from opencuts.testing import FakeRegisServer
+from opencuts.watch import PollSchedule, SlotDiff
+
+
+class TestPollSchedule(unittest.TestCase):
+    def test_backs_off_and_speeds_up_near_targets(self):
+        now = [datetime.datetime(2024, 3, 4, 12, 0)]
+        schedule = PollSchedule(
+            interval=10,
+            min_interval=2,
+            max_interval=30,
+            targets=["14:30"],
+            now=lambda: now[0],
+        )
+        self.assertEqual(schedule.next_delay(False), 15)
+        self.assertEqual(schedule.next_delay(False), 22.5)
+        self.assertEqual(schedule.next_delay(False), 30)
+        self.assertEqual(schedule.next_delay(True), 10)
+        now[0] = datetime.datetime(2024, 3, 4, 14, 0)
+        self.assertEqual(schedule.next_delay(False), 2)
+        now[0] = datetime.datetime(2024, 3, 4, 14, 31)
+        self.assertEqual(schedule.next_delay(False), 22.5)
+
+    def test_targets_only_apply_on_the_watched_day(self):
+        now = [datetime.datetime(2024, 3, 4, 14, 0)]
+        schedule = PollSchedule(
+            interval=10,
+            min_interval=2,
+            targets=["14:30"],
+            now=lambda: now[0],
+            day=datetime.date(2024, 3, 5),
+        )
+        self.assertFalse(schedule.near_target())
+        self.assertEqual(schedule.next_delay(False), 15)
+        now[0] = datetime.datetime(2024, 3, 5, 14, 0)
+        self.assertTrue(schedule.near_target())
+
+
+class TestSlotDiff(unittest.TestCase):
+    def test_identical_answers_are_not_parsed(self):
+        parsed = []
+
+        def parse(answer):
+            parsed.append(answer)
+            return []
+
+        diff = SlotDiff(parse)
+        self.assertIsNotNone(diff.update([]))
+        self.assertIsNone(diff.update([]))
+        self.assertIsNone(diff.update(None))
+        self.assertEqual(len(parsed), 1)
+        self.assertEqual(diff.polls, 3)
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRegisServer(zenoti_salons=("1000",)).start()
+        self.addCleanup(self.server.stop)
+
+    def watch(self, salon_id):
+        salon = self.server.configure(RegisSalon(salon_id, "key", "booking_key"))
+        salon.get_salon()
+        salon.get_salon_services()
+        return salon.watch(
+            salon.find_service_by_name("Supercut"),
+            interval=0.01,
+            min_interval=0.01,
+            max_interval=0.01,
+        )
+
+    def test_regis_yields_only_changes(self):
+        changes = self.watch("2000")
+        first = next(changes)
+        self.assertEqual(len(first.added), len(first.slots))
+        self.assertEqual(first.removed, ())
+        self.server.taken.add(9 * 60 + 15)
+        closed = next(changes)
+        self.assertEqual({slot.label for slot in closed.removed}, {"09:15"})
+        self.assertEqual(closed.added, ())
+        self.server.taken.clear()
+        reopened = next(changes)
+        self.assertEqual([slot.label for slot in reopened.added], ["09:15"] * 2)
+        changes.close()
+
+    def test_zenoti_reuses_one_booking(self):
+        changes = self.watch("1000")
+        next(changes)
+        self.server.taken.add(9 * 60)
+        self.assertEqual([slot.label for slot in next(changes).removed], ["09:00"])
+        changes.close()
+        self.assertEqual(self.server.hits["bookings"], 1)
+        self.assertGreaterEqual(self.server.hits["bookings/slots"], 2)
+
+    def test_zenoti_survives_a_failed_booking(self):
+        changes = self.watch("1000")
+        next(changes)
+        # The booking's slots fail, and so does the booking replacing it
+        self.server.fail("bookings/slots", status=404)
+        self.server.fail("bookings", status=503)
+        self.server.taken.add(9 * 60)
+        self.assertEqual([slot.label for slot in next(changes).removed], ["09:00"])
+        changes.close()
+        self.assertEqual(self.server.hits["bookings"], 3)
+
+    def test_stop_event_and_poll_limit(self):
+        salon = self.server.configure(RegisSalon("2000", "key", "booking_key"))
+        salon.get_salon()
+        salon.get_salon_services()
+        service = salon.find_service_by_name("Supercut")
+        self.assertEqual(
+            len(list(salon.watch(service, polls=3, interval=0, min_interval=0))), 1
+        )
+        self.assertEqual(self.server.hits["getavailabilityofsalon"], 3)
+        stop = threading.Event()
+        stop.set()
+        self.assertEqual(len(list(salon.watch(service, stop=stop))), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()